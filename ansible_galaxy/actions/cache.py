@@ -0,0 +1,71 @@
+import datetime
+import logging
+
+from ansible_galaxy import artifact_cache
+from ansible_galaxy import exceptions
+from ansible_galaxy import negative_cache
+
+log = logging.getLogger(__name__)
+
+CACHE_SUBCOMMANDS = ('list', 'prune', 'clear')
+
+
+def _display_entries(store, display_callback):
+    entries = store.entries()
+
+    # most recently used first
+    for entry in reversed(entries):
+        last_used = datetime.datetime.fromtimestamp(entry.last_used).strftime('%Y-%m-%d %H:%M:%S')
+        display_callback('%s %12s %s' % (entry.sha256, entry.size, last_used))
+
+    display_callback('%s artifacts, %s bytes in %s (max size %s bytes)' %
+                     (len(entries), sum([entry.size for entry in entries]), store.path, store.max_size))
+
+
+def cache(galaxy_context,
+          subcommand='list',
+          max_size=None,
+          display_callback=None):
+    '''Show or prune the artifact cache
+
+    'list' shows each stored artifact, 'prune' removes the least recently used
+    artifacts until the store fits in max_size bytes (the configured
+    'artifacts_max_size' if not given), and 'clear' removes all of them.
+
+    'clear' also forgets the remembered collection lookup failures (see
+    negative_cache), so the next install asks the server again.'''
+    if subcommand not in CACHE_SUBCOMMANDS:
+        raise exceptions.GalaxyClientError('Unknown cache command "%s", expected one of: %s' %
+                                           (subcommand, ', '.join(CACHE_SUBCOMMANDS)))
+
+    if subcommand == 'clear':
+        forgotten = negative_cache.clear_disk(galaxy_context.cache)
+        display_callback('Forgot %s remembered collection lookup failures' % forgotten)
+
+    store = artifact_cache.from_cache_config(galaxy_context.cache)
+
+    if not store:
+        display_callback('There is no artifact cache, since no cache path is configured')
+        return 0
+
+    log.debug('artifact cache: %s', store)
+
+    if subcommand == 'list':
+        _display_entries(store, display_callback)
+        return 0
+
+    if subcommand == 'clear':
+        max_size = 0
+    elif max_size is None:
+        max_size = store.max_size
+
+    if max_size is None:
+        display_callback('No artifacts_max_size is configured, nothing to prune')
+        return 0
+
+    removed = store.prune(max_size)
+
+    display_callback('Removed %s artifacts, %s bytes from %s' %
+                     (len(removed), sum([entry.size for entry in removed]), store.path))
+
+    return 0
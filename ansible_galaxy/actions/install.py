@@ -1,22 +1,29 @@
 import logging
 import pprint
 
+from ansible_galaxy import artifact_cache
 from ansible_galaxy import collection_artifact
 from ansible_galaxy import collections_lockfile
 from ansible_galaxy import display
 from ansible_galaxy import download
 from ansible_galaxy import exceptions
+from ansible_galaxy import http_pool
 from ansible_galaxy import install
+from ansible_galaxy import install_fingerprint
+from ansible_galaxy import install_plan
 from ansible_galaxy import installed_repository_db
 from ansible_galaxy import matchers
 from ansible_galaxy import repository
 from ansible_galaxy import repository_spec_parse
 from ansible_galaxy import requirements
+from ansible_galaxy import resolver
 from ansible_galaxy.fetch import fetch_factory
 from ansible_galaxy.models.collections_lock import CollectionsLock
+from ansible_galaxy.models.install_plan import InstallPlan, InstallPlanItem
 from ansible_galaxy.models.repository_spec import FetchMethods
 from ansible_galaxy.models.requirement import Requirement, RequirementOps
 from ansible_galaxy.models.requirement_spec import RequirementSpec
+from ansible_galaxy.utils import concurrency
 
 log = logging.getLogger(__name__)
 
@@ -59,7 +66,8 @@ def install_repositories_matching_repository_specs(galaxy_context,
                                                    # TODO: error handling callback ?
                                                    ignore_errors=False,
                                                    no_deps=False,
-                                                   force_overwrite=False):
+                                                   force_overwrite=False,
+                                                   find_results_by_requirement=None):
     '''Install a set of repositories specified by repository_specs if they are not already installed'''
 
     # log.debug('editable: %s', editable)
@@ -96,7 +104,8 @@ def install_repositories_matching_repository_specs(galaxy_context,
                                 display_callback=display_callback,
                                 ignore_errors=ignore_errors,
                                 no_deps=no_deps,
-                                force_overwrite=force_overwrite)
+                                force_overwrite=force_overwrite,
+                                find_results_by_requirement=find_results_by_requirement)
 
 
 def load_collections_lockfile(lockfile_path):
@@ -114,26 +123,34 @@ def load_collections_lockfile(lockfile_path):
         raise exceptions.GalaxyClientError(msg)
 
 
-# FIXME: probably pass the point where passing around all the data to methods makes sense
-#        so probably needs a stateful class here
-def install_repository_specs_loop(galaxy_context,
-                                  repository_spec_strings=None,
-                                  requirements_list=None,
-                                  collections_lockfile_path=None,
-                                  editable=False,
-                                  namespace_override=None,
-                                  display_callback=None,
-                                  # TODO: error handling callback ?
-                                  ignore_errors=False,
-                                  no_deps=False,
-                                  force_overwrite=False):
-
-    requirements_list = requirements_list or []
-
-    for repository_spec_string in repository_spec_strings:
-        fetch_method = \
-            repository_spec_parse.choose_repository_fetch_method(repository_spec_string,
-                                                                 editable=editable)
+def requirements_from_spec_strings(galaxy_context,
+                                   repository_spec_strings,
+                                   editable=False,
+                                   namespace_override=None):
+    '''Build a list of Requirements from the collection spec strings given on the command line'''
+    requirements_list = []
+
+    spec_strings_and_fetch_methods = \
+        [(repository_spec_string,
+          repository_spec_parse.choose_repository_fetch_method(repository_spec_string,
+                                                               editable=editable))
+         for repository_spec_string in repository_spec_strings]
+
+    # Download all of the remote url artifacts at once, since we need to look inside them
+    # to know what they are.
+    remote_urls = sorted(set([spec_string for spec_string, fetch_method in spec_strings_and_fetch_methods
+                              if fetch_method == FetchMethods.REMOTE_URL]))
+
+    tmp_downloaded_paths = dict(zip(remote_urls,
+                                    download.fetch_urls(remote_urls,
+                                                        # Note: ignore_certs is meant for galaxy server,
+                                                        # overloaded to apply for arbitrary http[s] downloads here
+                                                        validate_certs=not galaxy_context.server['ignore_certs'],
+                                                        http_config=galaxy_context.http,
+                                                        cache_config=galaxy_context.cache,
+                                                        spool_path=galaxy_context.spool_path)))
+
+    for repository_spec_string, fetch_method in spec_strings_and_fetch_methods:
         log.debug('fetch_method: %s', fetch_method)
 
         if fetch_method == FetchMethods.LOCAL_FILE:
@@ -144,15 +161,12 @@ def install_repository_specs_loop(galaxy_context,
             spec_data = collection_artifact.load_data_from_collection_artifact(repository_spec_string)
             spec_data['fetch_method'] = fetch_method
         elif fetch_method == FetchMethods.REMOTE_URL:
-            # download the url
+            # the url was downloaded above
             # hope it is a collection artifact and use load_data_from_collection_artifact() for the
             # rest of the repo_spec data
             log.debug('repository_spec_string: %s', repository_spec_string)
 
-            tmp_downloaded_path = download.fetch_url(repository_spec_string,
-                                                     # Note: ignore_certs is meant for galaxy server,
-                                                     # overloaded to apply for arbitrary http[s] downloads here
-                                                     validate_certs=not galaxy_context.server['ignore_certs'])
+            tmp_downloaded_path = tmp_downloaded_paths[repository_spec_string]
             spec_data = collection_artifact.load_data_from_collection_artifact(tmp_downloaded_path)
 
             # pretend like this is a local_file install now
@@ -172,18 +186,78 @@ def install_repository_specs_loop(galaxy_context,
 
         requirements_list.append(req)
 
+    return requirements_list
+
+
+def requirements_from_collections_lockfile(collections_lockfile_path):
+    '''Return (a list of Requirements, the find() results of the pinned ones) for a collections lockfile'''
     log.debug('collections_lockfile_path: %s', collections_lockfile_path)
 
-    if collections_lockfile_path:
-        # load collections lockfile as if the 'dependencies' dict from a collection_info
-        collections_lockfile = load_collections_lockfile(collections_lockfile_path)
+    requirements_list = []
+    find_results_by_requirement = {}
+
+    # load collections lockfile as if the 'dependencies' dict from a collection_info
+    lockfile = load_collections_lockfile(collections_lockfile_path)
+
+    # pinned entries have everything needed to fetch and verify the artifact, so they
+    # skip find() and resolving, and need no Galaxy API requests at all
+    for pinned_requirement, pinned_find_results in collections_lockfile.pinned_requirements(lockfile):
+        requirements_list.append(pinned_requirement)
+        find_results_by_requirement[pinned_requirement] = pinned_find_results
 
-        dependencies_list = requirements.from_dependencies_dict(collections_lockfile.dependencies)
+    dependencies_list = requirements.from_dependencies_dict(collections_lockfile.version_spec_dependencies(lockfile))
 
-        # Create the CollectionsLock for the validators
-        collections_lock = CollectionsLock(dependencies=dependencies_list)
+    # Create the CollectionsLock for the validators
+    collections_lock = CollectionsLock(dependencies=dependencies_list)
 
-        requirements_list.extend(collections_lock.dependencies)
+    requirements_list.extend(collections_lock.dependencies)
+
+    return requirements_list, find_results_by_requirement
+
+
+# FIXME: probably pass the point where passing around all the data to methods makes sense
+#        so probably needs a stateful class here
+def install_repository_specs_loop(galaxy_context,
+                                  repository_spec_strings=None,
+                                  requirements_list=None,
+                                  collections_lockfile_path=None,
+                                  editable=False,
+                                  namespace_override=None,
+                                  display_callback=None,
+                                  # TODO: error handling callback ?
+                                  ignore_errors=False,
+                                  no_deps=False,
+                                  force_overwrite=False):
+
+    requirements_list = requirements_list or []
+    repository_spec_strings = repository_spec_strings or []
+
+    # requirements_list is only used for installing dependencies, which is not fingerprinted
+    fingerprint_inputs = None
+    if not requirements_list and not editable:
+        fingerprint_inputs = \
+            install_fingerprint.inputs_digest(galaxy_context,
+                                              repository_spec_strings=repository_spec_strings,
+                                              input_file_paths=[path for path in [collections_lockfile_path] if path],
+                                              options={'namespace_override': namespace_override,
+                                                       'no_deps': no_deps})
+
+    if _already_installed(galaxy_context, fingerprint_inputs, force_overwrite, display_callback):
+        return 0
+
+    requirements_list.extend(requirements_from_spec_strings(galaxy_context,
+                                                            repository_spec_strings,
+                                                            editable=editable,
+                                                            namespace_override=namespace_override))
+
+    # The find() results of requirements that are already known, so they do not need to be found again
+    find_results_by_requirement = {}
+
+    if collections_lockfile_path:
+        lockfile_requirements, find_results_by_requirement = \
+            requirements_from_collections_lockfile(collections_lockfile_path)
+
+        requirements_list.extend(lockfile_requirements)
 
     log.debug('requirements_list: %s', requirements_list)
 
@@ -191,16 +265,31 @@ def install_repository_specs_loop(galaxy_context,
         if not requirements_list:
             break
 
+        # One requirement per collection, no matter how many things require it
+        coalesced_requirements = requirements.coalesce(requirements_list)
+        requirements_list = [req for req, dummy in coalesced_requirements]
+
         display_callback('', level='info')
         display_callback('Collection specs to install:', level='info')
 
-        for req in requirements_list:
-            if req.repository_spec:
-                msg = '  %s (required by %s)' % (req.requirement_spec.label, req.repository_spec)
+        for req, required_by in coalesced_requirements:
+            requirers = [str(required_by_req.repository_spec) for required_by_req in required_by
+                         if required_by_req.repository_spec]
+            if requirers:
+                msg = '  %s (required by %s)' % (req.requirement_spec.label, ', '.join(requirers))
             else:
                 msg = '  %s' % req.requirement_spec.label
             display_callback(msg, level='info')
 
+        # Pick the versions of everything needed from Galaxy before downloading anything
+        requirements_list = resolve_requirements(galaxy_context,
+                                                 requirements_list,
+                                                 display_callback=display_callback,
+                                                 ignore_errors=ignore_errors,
+                                                 no_deps=no_deps,
+                                                 force_overwrite=force_overwrite,
+                                                 find_results_by_requirement=find_results_by_requirement)
+
         just_installed_repositories = \
             install_repositories_matching_repository_specs(galaxy_context,
                                                            requirements_list,
@@ -209,7 +298,8 @@ def install_repository_specs_loop(galaxy_context,
                                                            display_callback=display_callback,
                                                            ignore_errors=ignore_errors,
                                                            no_deps=no_deps,
-                                                           force_overwrite=force_overwrite)
+                                                           force_overwrite=force_overwrite,
+                                                           find_results_by_requirement=find_results_by_requirement)
 
         for just_installed_repo in just_installed_repositories:
             display_callback('  Installed: %s (to %s)' %
@@ -223,10 +313,268 @@ def install_repository_specs_loop(galaxy_context,
                                                          just_installed_repositories,
                                                          no_deps=no_deps)
 
+    # once per run, not after every download
+    artifact_cache.prune_after_install(galaxy_context.cache)
+
+    _save_fingerprint(galaxy_context, fingerprint_inputs, ignore_errors)
+
     # FIXME: what results to return?
     return 0
 
 
+def _already_installed(galaxy_context, fingerprint_inputs, force_overwrite, display_callback):
+    '''Return True if the last install into the collections path had the same inputs and is still installed'''
+    if force_overwrite or not install_fingerprint.matches(galaxy_context.collections_path, fingerprint_inputs):
+        return False
+
+    log.debug('The install fingerprint for %s matches, skipping the install', galaxy_context.collections_path)
+
+    display_callback('Nothing to install, the collections in %s are already installed '
+                     '(use --force to reinstall them)' % galaxy_context.collections_path,
+                     level='info')
+    return True
+
+
+def _save_fingerprint(galaxy_context, fingerprint_inputs, ignore_errors):
+    # With ignore_errors, anything that failed was skipped so the install may be incomplete
+    if not fingerprint_inputs or ignore_errors:
+        return
+
+    install_fingerprint.save(galaxy_context.collections_path, fingerprint_inputs)
+
+
+def load_install_plan(plan_path):
+    try:
+        log.debug('Opening the install plan %s', plan_path)
+        with open(plan_path, 'r') as plan_fd:
+            return install_plan.load(plan_fd)
+
+    except EnvironmentError as exc:
+        log.exception(exc)
+
+        msg = 'Error opening the install plan "%s": %s' % (plan_path, exc)
+        log.error(msg)
+
+        raise exceptions.GalaxyClientError(msg)
+
+
+def save_install_plan(plan, plan_path):
+    try:
+        log.debug('Writing the install plan %s', plan_path)
+        with open(plan_path, 'w') as plan_fd:
+            install_plan.save(plan, plan_fd)
+
+    except EnvironmentError as exc:
+        log.exception(exc)
+
+        msg = 'Error writing the install plan "%s": %s' % (plan_path, exc)
+        log.error(msg)
+
+        raise exceptions.GalaxyClientError(msg)
+
+
+def plan_repository_specs(galaxy_context,
+                          plan_path,
+                          repository_spec_strings=None,
+                          requirements_list=None,
+                          collections_lockfile_path=None,
+                          namespace_override=None,
+                          display_callback=None,
+                          no_deps=False):
+    '''Resolve the requirements and save the InstallPlan to plan_path, without installing anything
+
+    Nothing is downloaded or installed. Since the plan is meant to be applied
+    somewhere else (see install_from_plan()), every collection needed is in the
+    plan, even if it is already installed here.
+
+    Only collections from Galaxy can be in a plan.'''
+
+    display_callback = display_callback or display.display_callback
+
+    requirements_list = requirements_list or []
+    repository_spec_strings = repository_spec_strings or []
+
+    requirements_list.extend(requirements_from_spec_strings(galaxy_context,
+                                                            repository_spec_strings,
+                                                            namespace_override=namespace_override))
+
+    find_results_by_requirement = {}
+
+    if collections_lockfile_path:
+        lockfile_requirements, find_results_by_requirement = \
+            requirements_from_collections_lockfile(collections_lockfile_path)
+
+        requirements_list.extend(lockfile_requirements)
+
+    _verify_requirements_repository_spec_have_namespaces(requirements_list)
+
+    not_plannable = [req for req in requirements_list if not resolver.is_resolvable(req)]
+    if not_plannable:
+        raise exceptions.GalaxyClientError('Only collections from Galaxy can be in an install plan, not: %s' %
+                                           ', '.join([req.requirement_spec.label for req in not_plannable]))
+
+    requirements_list = [req for req, dummy in requirements.coalesce(requirements_list)]
+
+    # pinned lockfile entries go in the plan as is
+    plan_items = [InstallPlanItem(requirement=req,
+                                  find_results=find_results_by_requirement[req],
+                                  required_by=[req])
+                  for req in requirements_list if req in find_results_by_requirement]
+
+    pinned_labels = set([plan_item.label for plan_item in plan_items])
+
+    requirements_to_resolve = [req for req in requirements_list if req not in find_results_by_requirement]
+
+    if requirements_to_resolve:
+        resolved_plan = resolver.resolve(galaxy_context, requirements_to_resolve,
+                                         no_deps=no_deps,
+                                         force_overwrite=True)
+
+        for plan_item in resolved_plan.items:
+            if plan_item.label in pinned_labels:
+                log.warning('%s is pinned in the collections lockfile, not adding %s,%s to the install plan',
+                            plan_item.label, plan_item.label, plan_item.version)
+                continue
+
+            plan_items.append(plan_item)
+
+    plan = InstallPlan(items=plan_items)
+
+    display_callback('', level='info')
+    display_callback('Install plan:', level='info')
+
+    for plan_item in plan.items:
+        display_callback('  %s,%s' % (plan_item.label, plan_item.version), level='info')
+
+    save_install_plan(plan, plan_path)
+
+    display_callback('', level='info')
+    display_callback('Wrote the install plan to %s' % plan_path, level='info')
+
+    return 0
+
+
+def install_from_plan(galaxy_context,
+                      plan_path,
+                      display_callback=None,
+                      ignore_errors=False,
+                      force_overwrite=False):
+    '''Install the collections in the InstallPlan saved to plan_path by plan_repository_specs()
+
+    The plan already has the exact versions of every collection, including the
+    dependencies, and where to download them from, so nothing is resolved or found
+    and the Galaxy API is not used.'''
+
+    display_callback = display_callback or display.display_callback
+
+    fingerprint_inputs = install_fingerprint.inputs_digest(galaxy_context,
+                                                           input_file_paths=[plan_path],
+                                                           options={'from_plan': True})
+
+    if _already_installed(galaxy_context, fingerprint_inputs, force_overwrite, display_callback):
+        return 0
+
+    plan = load_install_plan(plan_path)
+
+    find_results_by_requirement = dict([(plan_item.requirement, plan_item.find_results) for plan_item in plan.items])
+
+    display_callback('', level='info')
+    display_callback('Collection specs to install (from the install plan %s):' % plan_path, level='info')
+
+    for plan_item in plan.items:
+        display_callback('  %s,%s' % (plan_item.label, plan_item.version), level='info')
+
+    just_installed_repositories = \
+        install_repositories_matching_repository_specs(galaxy_context,
+                                                       plan.requirements,
+                                                       display_callback=display_callback,
+                                                       ignore_errors=ignore_errors,
+                                                       no_deps=True,
+                                                       force_overwrite=force_overwrite,
+                                                       find_results_by_requirement=find_results_by_requirement)
+
+    for just_installed_repo in just_installed_repositories:
+        display_callback('  Installed: %s (to %s)' %
+                         (just_installed_repo.repository_spec,
+                          just_installed_repo.path),
+                         level='info')
+
+    # once per run, not after every download
+    artifact_cache.prune_after_install(galaxy_context.cache)
+
+    _save_fingerprint(galaxy_context, fingerprint_inputs, ignore_errors)
+
+    return 0
+
+
+def resolve_requirements(galaxy_context,
+                         requirements_list,
+                         display_callback=None,
+                         ignore_errors=False,
+                         no_deps=False,
+                         force_overwrite=False,
+                         find_results_by_requirement=None):
+    '''Replace the Galaxy requirements in requirements_list with requirements for the exact versions to install
+
+    The versions of the requirements and all of their dependencies are picked
+    together, see resolver.Resolver. The other requirements (local files, urls,
+    scm, editable), and any requirements in find_results_by_requirement, are
+    returned as is.
+
+    The find() results of the picked versions are added to find_results_by_requirement.
+
+    If the requirements can not all be met together and ignore_errors is set, each
+    requirement is resolved on its own, and the ones that can not be met are skipped.'''
+
+    display_callback = display_callback or display.display_callback
+
+    if find_results_by_requirement is None:
+        find_results_by_requirement = {}
+
+    galaxy_requirements = [req for req in requirements_list
+                           if resolver.is_resolvable(req) and req not in find_results_by_requirement]
+    other_requirements = [req for req in requirements_list if req not in galaxy_requirements]
+
+    if not galaxy_requirements:
+        return requirements_list
+
+    try:
+        plan_items = resolver.resolve(galaxy_context, galaxy_requirements,
+                                      no_deps=no_deps,
+                                      force_overwrite=force_overwrite).items
+    except exceptions.GalaxyError as e:
+        log.warning('Unable to resolve the collection requirements: %s', e)
+        raise_without_ignore(ignore_errors, e)
+
+        plan_items = []
+        for requirement in galaxy_requirements:
+            try:
+                plan_items.extend(resolver.resolve(galaxy_context, [requirement],
+                                                   no_deps=no_deps,
+                                                   force_overwrite=force_overwrite).items)
+            except exceptions.GalaxyError as e:
+                display_callback('- %s was NOT resolved: %s' % (requirement.requirement_spec.label, e),
+                                 level='warning')
+
+    resolved_requirements = []
+
+    display_callback('', level='info')
+    display_callback('Resolved collection versions:', level='info')
+
+    for plan_item in plan_items:
+        if plan_item.requirement in resolved_requirements:
+            continue
+
+        display_callback('  %s,%s (for %s)' %
+                         (plan_item.label, plan_item.version,
+                          ', '.join([req.requirement_spec.label for req in plan_item.required_by])),
+                         level='info')
+        resolved_requirements.append(plan_item.requirement)
+        find_results_by_requirement[plan_item.requirement] = plan_item.find_results
+
+    return other_requirements + resolved_requirements
+
+
 def find_new_deps_from_installed(galaxy_context, installed_repos, no_deps=False):
     if no_deps:
         return []
@@ -290,7 +638,8 @@ def install_repositories(galaxy_context,
                          # TODO: error handling callback ?
                          ignore_errors=False,
                          no_deps=False,
-                         force_overwrite=False):
+                         force_overwrite=False,
+                         find_results_by_requirement=None):
 
     display_callback = display_callback or display.display_callback
     log.debug('requirements_to_install: %s', requirements_to_install)
@@ -304,17 +653,30 @@ def install_repositories(galaxy_context,
     #       a list of needed deps
 
     # Remove any dupe repository_specs
-    requirements_to_install_uniq = set(requirements_to_install)
-
     # TODO: if the default ordering of repository_specs isnt useful, may need to tweak it
-    for requirement_to_install in sorted(requirements_to_install_uniq):
+    sorted_requirements_to_install = sorted(set(requirements_to_install))
+
+    # find() and fetch everything at once. The installs are still done one at a time, in
+    # sorted_requirements_to_install order, each as soon as it and the ones before it are fetched.
+    found = find_requirements(galaxy_context, sorted_requirements_to_install,
+                              find_results_by_requirement=find_results_by_requirement)
+
+    for index, fetch_results, fetch_error in fetch_requirements(galaxy_context, sorted_requirements_to_install, found):
+        requirement_to_install = sorted_requirements_to_install[index]
+        fetcher, find_results, find_error = found[index]
+
         log.debug('requirement_to_install: %s', requirement_to_install)
         installed_repositories = install_repository(galaxy_context,
                                                     requirement_to_install,
                                                     display_callback=display_callback,
                                                     ignore_errors=ignore_errors,
                                                     no_deps=no_deps,
-                                                    force_overwrite=force_overwrite)
+                                                    force_overwrite=force_overwrite,
+                                                    fetcher=fetcher,
+                                                    find_results=find_results,
+                                                    find_error=find_error,
+                                                    fetch_results=fetch_results,
+                                                    fetch_error=fetch_error)
 
         # log.debug('dep_requirement_repository_specs1: %s', dep_requirements)
 
@@ -339,14 +701,116 @@ def install_repositories(galaxy_context,
     return most_installed_repositories
 
 
+def _max_workers(galaxy_context):
+    return galaxy_context.http.get('max_concurrent_requests', None) or http_pool.DEFAULT_MAX_CONCURRENT_REQUESTS
+
+
+def find_requirements(galaxy_context, requirements_to_install, find_results_by_requirement=None):
+    '''find() each of requirements_to_install, up to the http 'max_concurrent_requests' at once
+
+    Returns a list of (fetcher, find_results, find_error) tuples in the same order as
+    requirements_to_install. find_error is the GalaxyError find() raised (and find_results
+    is None) if the requirement could not be found, so each failure can be handled
+    (or ignored) when its requirement is installed.
+
+    Requirements in find_results_by_requirement (resolved or pinned in a lockfile)
+    are not found again. Normally that is every Galaxy requirement, since the resolver
+    has already looked up their metadata (concurrently, see resolver.Resolver.prefetch()).'''
+
+    find_results_by_requirement = find_results_by_requirement or {}
+
+    def _find(requirement_to_install):
+        fetcher = fetch_factory.get(galaxy_context=galaxy_context,
+                                    requirement_spec=requirement_to_install.requirement_spec)
+
+        if requirement_to_install in find_results_by_requirement:
+            return fetcher, find_results_by_requirement[requirement_to_install], None
+
+        try:
+            return fetcher, install.find(fetcher), None
+        except exceptions.GalaxyError as e:
+            log.debug('find() for %s failed: %s', requirement_to_install, e)
+            return fetcher, None, e
+
+    return concurrency.map_bounded(_find, requirements_to_install, max_workers=_max_workers(galaxy_context))
+
+
+def _artifact_size(find_results):
+    artifact = (find_results or {}).get('artifact', None) or {}
+    return artifact.get('size', None) or 0
+
+
+def fetch_requirements(galaxy_context, requirements_to_install, found):
+    '''fetch() each of the requirements that were found, up to the http 'max_concurrent_requests' at once
+
+    found is the list of (fetcher, find_results, find_error) from find_requirements().
+
+    The largest artifacts (by the 'size' find() returned) are started first, so
+    the longest downloads are not left until the end. Downloads from the same
+    server are also limited, see http_pool.download_slot().
+
+    Yields an (index, fetch_results, fetch_error) tuple for each requirement, where
+    index is the position of the requirement in requirements_to_install. They are
+    yielded in requirements_to_install order (so the installs are always done in the
+    same order), each as soon as it and all of the ones before it are fetched.
+    fetch_results and fetch_error are None for requirements that were not found.'''
+
+    def _fetch(requirement_and_found):
+        requirement_to_install, (fetcher, find_results, find_error) = requirement_and_found
+
+        if find_error or find_results is None:
+            return None, None
+
+        repository_spec_to_install = install.repository_spec_from_find_results(find_results,
+                                                                               requirement_to_install.requirement_spec)
+
+        try:
+            return install.fetch(fetcher,
+                                 repository_spec=repository_spec_to_install,
+                                 find_results=find_results), None
+        except exceptions.GalaxyError as e:
+            log.debug('fetch() for %s failed: %s', requirement_to_install, e)
+            return None, e
+
+    # largest first, the sort is stable so the same sizes stay in requirements_to_install order
+    fetch_order = sorted(range(len(requirements_to_install)),
+                         key=lambda index: -_artifact_size(found[index][1]))
+
+    log.debug('Fetching %s', [str(requirements_to_install[index]) for index in fetch_order])
+
+    fetched = concurrency.imap_completed(_fetch,
+                                         [(requirements_to_install[index], found[index]) for index in fetch_order],
+                                         max_workers=_max_workers(galaxy_context))
+
+    done = {}
+    next_index = 0
+
+    for order_index, fetch_result in fetched:
+        done[fetch_order[order_index]] = fetch_result
+
+        while next_index in done:
+            fetch_results, fetch_error = done.pop(next_index)
+            yield next_index, fetch_results, fetch_error
+            next_index += 1
+
+
 def install_repository(galaxy_context,
                        requirement_to_install,
                        display_callback=None,
                        # TODO: error handling callback ?
                        ignore_errors=False,
                        no_deps=False,
-                       force_overwrite=False):
-    '''This installs a single package by finding it, fetching it, verifying it and installing it.'''
+                       force_overwrite=False,
+                       fetcher=None,
+                       find_results=None,
+                       find_error=None,
+                       fetch_results=None,
+                       fetch_error=None):
+    '''This installs a single package by finding it, fetching it, verifying it and installing it.
+
+    If the requirement was already found by find_requirements(), pass its fetcher and
+    find_results (or find_error) to skip the find. Likewise, pass the fetch_results
+    (or fetch_error) from fetch_requirements() to skip the fetch.'''
 
     display_callback = display_callback or display.display_callback
 
@@ -370,8 +834,9 @@ def install_repository(galaxy_context,
     display_callback('Installing spec: %s' % requirement_spec_to_install.label, level='info')
 
     # We dont have anything that matches the RequirementSpec installed
-    fetcher = fetch_factory.get(galaxy_context=galaxy_context,
-                                requirement_spec=requirement_spec_to_install)
+    if fetcher is None:
+        fetcher = fetch_factory.get(galaxy_context=galaxy_context,
+                                    requirement_spec=requirement_spec_to_install)
 
     # if we fail to get a fetcher here, then to... FIND_FETCHER_FAILURE ?
     # could also move some of the logic in fetcher_factory to be driven from here
@@ -383,7 +848,11 @@ def install_repository(galaxy_context,
     # See if we can find metadata and/or download the archive before we try to
     # remove an installed version...
     try:
-        find_results = install.find(fetcher)
+        if find_error:
+            raise find_error
+
+        if find_results is None:
+            find_results = install.find(fetcher)
     except exceptions.GalaxyError as e:
         log.debug('requirement_to_install %s failed to be met: %s', requirement_to_install, e)
         log.warning('Unable to find metadata for %s: %s', requirement_spec_to_install.label, e)
@@ -448,9 +917,13 @@ def install_repository(galaxy_context,
 
     # FETCH state
     try:
-        fetch_results = install.fetch(fetcher,
-                                      repository_spec=repository_spec_to_install,
-                                      find_results=find_results)
+        if fetch_error:
+            raise fetch_error
+
+        if fetch_results is None:
+            fetch_results = install.fetch(fetcher,
+                                          repository_spec=repository_spec_to_install,
+                                          find_results=find_results)
         log.debug('fetch_results: %s', fetch_results)
         # fetch_results will include a 'archive_path' pointing to where the artifact
         # was saved to locally.
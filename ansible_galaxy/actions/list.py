@@ -13,10 +13,32 @@ class OutputFormat(object):
     HUMAN = 'human'
     LOCKFILE = 'lockfile'
     LOCKFILE_FREEZE = 'lockfile_freeze'
+    LOCKFILE_PINNED = 'lockfile_pinned'
     FULLY_QUALIFIED = 'fully_qualified'
 
 
-def format_as_lockfile(repo_list, lockfile_freeze=False):
+def pinned_lockfile_entry(installed_repository):
+    '''The pinned lockfile entry for installed_repository
+
+    A dict of the version and the artifact download_url, filename, size and sha256
+    if the repository was installed from Galaxy, otherwise a frozen version spec.'''
+    version_spec = "==%s" % installed_repository.repository_spec.version
+
+    install_info = getattr(installed_repository, 'install_info', None)
+    download_url = getattr(install_info, 'download_url', None)
+    artifact = getattr(install_info, 'artifact', None) or {}
+
+    if not download_url or not artifact.get('sha256', None):
+        return version_spec
+
+    return {'version': str(installed_repository.repository_spec.version),
+            'download_url': download_url,
+            'filename': artifact.get('filename', None),
+            'size': artifact.get('size', None),
+            'sha256': artifact['sha256']}
+
+
+def format_as_lockfile(repo_list, lockfile_freeze=False, lockfile_pinned=False):
     '''For a given repo_list, return the string content of the lockfile that matches'''
 
     if not repo_list:
@@ -30,6 +52,9 @@ def format_as_lockfile(repo_list, lockfile_freeze=False):
         if lockfile_freeze:
             version_spec = "=={installed_repository.repository_spec.version}".format(**repo_item)
 
+        if lockfile_pinned:
+            version_spec = pinned_lockfile_entry(repo_item['installed_repository'])
+
         collections_deps[label] = version_spec
 
     buf = yaml_persist.safe_dump(collections_deps, None, default_flow_style=False)
@@ -149,6 +174,11 @@ def _list(galaxy_context,
                                     lockfile_freeze=True)
         display_callback(output)
 
+    elif output_format == OutputFormat.LOCKFILE_PINNED:
+        output = format_as_lockfile(repo_list,
+                                    lockfile_pinned=True)
+        display_callback(output)
+
     elif output_format == OutputFormat.FULLY_QUALIFIED:
         display_fully_qualified(repo_list, list_content, display_callback)
     else:
@@ -162,6 +192,7 @@ def list_action(galaxy_context,
                 list_content=False,
                 lockfile_format=False,
                 lockfile_freeze=False,
+                lockfile_pinned=False,
                 fully_qualified=False,
                 output_format=None,
                 display_callback=None):
@@ -172,6 +203,8 @@ def list_action(galaxy_context,
         output_format = OutputFormat.LOCKFILE
     if lockfile_freeze:
         output_format = OutputFormat.LOCKFILE_FREEZE
+    if lockfile_pinned:
+        output_format = OutputFormat.LOCKFILE_PINNED
     if fully_qualified:
         output_format = OutputFormat.FULLY_QUALIFIED
 
@@ -5,8 +5,10 @@ import os
 
 from six.moves.urllib.parse import urljoin
 
+from ansible_galaxy import collection_artifact
 from ansible_galaxy import exceptions
 from ansible_galaxy import multipart_form
+from ansible_galaxy import negative_cache
 from ansible_galaxy.rest_api import GalaxyAPI
 from ansible_galaxy.utils import chksums
 
@@ -50,10 +52,25 @@ def _publish(galaxy_context,
     except exceptions.GalaxyError as exc:
         results['success'] = False
         results['errors'].append(str(exc))
+        return results
+
+    _forget_lookup_failures(galaxy_context, api, archive_path)
 
     return results
 
 
+def _forget_lookup_failures(galaxy_context, api, archive_path):
+    '''The collection will exist on the server soon, so forget any failures to find it'''
+    try:
+        spec_data = collection_artifact.load_data_from_collection_artifact(archive_path)
+    except exceptions.GalaxyError as exc:
+        log.debug('Unable to load the namespace and name of %s, not forgetting lookup failures: %s', archive_path, exc)
+        return
+
+    negative_cache.forget(api.api_server, spec_data['namespace'], spec_data['name'],
+                          cache_config=galaxy_context.cache)
+
+
 def publish(galaxy_context, archive_path, display_callback):
 
     results = _publish(galaxy_context,
@@ -0,0 +1,279 @@
+'''A content addressed store of downloaded collection artifacts
+
+Artifacts are stored by the sha256 of their contents (the 'sha256' of the
+artifact info from the Galaxy API), as <path>/<first 2 hex digits>/<sha256>.
+Since the sha256 of an artifact is known before it is downloaded, an artifact
+that is already in the store is used instead of downloading it again, no
+matter which url, server, or collection name it was found for.
+
+The store is in the 'artifacts' dir of the cache 'path' unless the cache
+'artifacts_path' is configured (for ex, to share one store between users
+or CI jobs). Once the installs of a run are done, if the total size of the
+stored artifacts is larger than the cache 'artifacts_max_size', the least
+recently used artifacts are removed (see prune_after_install()).
+
+Artifacts are written to a temp file in the store and renamed into place, so
+any number of processes can add to the store at once, and nothing ever sees a
+partially written artifact.
+
+That prune does not remove artifacts used in the last RECENTLY_USED_SECONDS,
+since they may be in use by another process sharing the store. Every prune
+also removes the temp files of adds that were interrupted, once they are
+RECENTLY_USED_SECONDS old.
+
+Like the other caches, errors using the store are logged and otherwise ignored.
+A broken store should only ever mean downloading the artifact again.'''
+
+import collections
+import errno
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACTS_MAX_SIZE = 1024 * 1024 * 1024
+
+RECENTLY_USED_SECONDS = 3600
+
+TMP_PREFIX = '.tmp-'
+
+ArtifactCacheEntry = collections.namedtuple('ArtifactCacheEntry', ['sha256', 'path', 'size', 'last_used'])
+
+
+def _makedirs(path):
+    # another process or thread may create it first
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def _is_sha256(value):
+    if not value or len(value) != 64:
+        return False
+
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+
+    return True
+
+
+class ArtifactCache(object):
+    def __init__(self, path, max_size=None):
+        self.path = path
+        # bytes, None means no limit
+        self.max_size = max_size
+
+    def __repr__(self):
+        return '%s(path=%s, max_size=%s)' % (self.__class__.__name__, self.path, self.max_size)
+
+    def artifact_path(self, sha256):
+        sha256 = sha256.lower()
+        return os.path.join(self.path, sha256[:2], sha256)
+
+    def get(self, sha256):
+        '''Return the path to the stored artifact with sha256, or None if it is not stored'''
+        if not _is_sha256(sha256):
+            return None
+
+        artifact_path = self.artifact_path(sha256)
+
+        # The mtime of the artifact is its last use, for pruning the least recently used
+        try:
+            os.utime(artifact_path, None)
+        except (OSError, IOError):
+            return None
+
+        log.debug('Found artifact %s in the artifact cache at %s', sha256, artifact_path)
+
+        return artifact_path
+
+    def add(self, sha256, source_path, move=False):
+        '''Store the file at source_path as the artifact with sha256, and return the path to the stored artifact
+
+        If move is True, source_path is moved into the store instead of copied.
+        The caller is expected to have already checked that source_path has
+        the sha256 it is stored as.
+
+        Returns None if the artifact could not be stored.'''
+        if not _is_sha256(sha256):
+            log.debug('Not storing %s in the artifact cache, "%s" is not a sha256', source_path, sha256)
+            return None
+
+        artifact_path = self.artifact_path(sha256)
+        artifact_dir = os.path.dirname(artifact_path)
+
+        try:
+            _makedirs(artifact_dir)
+
+            fd, tmp_path = tempfile.mkstemp(dir=artifact_dir, prefix=TMP_PREFIX)
+            os.close(fd)
+
+            try:
+                if move:
+                    try:
+                        os.rename(source_path, tmp_path)
+                    except OSError as exc:
+                        # a different filesystem
+                        if exc.errno != errno.EXDEV:
+                            raise
+                        shutil.copyfile(source_path, tmp_path)
+                        os.unlink(source_path)
+                else:
+                    shutil.copyfile(source_path, tmp_path)
+
+                # if another process stored the same artifact first, this replaces it with the same contents
+                os.rename(tmp_path, artifact_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+        except (OSError, IOError) as exc:
+            log.warning('Unable to store %s in the artifact cache at %s: %s', source_path, artifact_path, exc)
+            return None
+
+        log.debug('Stored artifact %s in the artifact cache at %s', sha256, artifact_path)
+
+        return artifact_path
+
+    def remove(self, sha256):
+        try:
+            os.unlink(self.artifact_path(sha256))
+        except (OSError, IOError):
+            return False
+        return True
+
+    def _shard_paths(self):
+        try:
+            shard_names = os.listdir(self.path)
+        except (OSError, IOError):
+            return []
+
+        return [os.path.join(self.path, shard_name) for shard_name in shard_names]
+
+    def remove_stale_tmp_files(self, max_age=RECENTLY_USED_SECONDS):
+        '''Remove the temp files of adds that were interrupted, if they are older than max_age seconds'''
+        oldest = time.time() - max_age
+
+        for shard_path in self._shard_paths():
+            try:
+                file_names = os.listdir(shard_path)
+            except (OSError, IOError):
+                continue
+
+            for file_name in file_names:
+                if not file_name.startswith(TMP_PREFIX):
+                    continue
+
+                tmp_path = os.path.join(shard_path, file_name)
+                try:
+                    if os.stat(tmp_path).st_mtime < oldest:
+                        log.debug('Removing the stale artifact cache temp file %s', tmp_path)
+                        os.unlink(tmp_path)
+                except (OSError, IOError):
+                    continue
+
+    def entries(self):
+        '''Return a list of an ArtifactCacheEntry for each stored artifact, least recently used first'''
+        entries = []
+        for shard_path in self._shard_paths():
+            try:
+                file_names = os.listdir(shard_path)
+            except (OSError, IOError):
+                continue
+
+            for file_name in file_names:
+                if not _is_sha256(file_name):
+                    continue
+
+                artifact_path = os.path.join(shard_path, file_name)
+                try:
+                    artifact_stat = os.stat(artifact_path)
+                except (OSError, IOError):
+                    # removed by someone else since the listdir()
+                    continue
+
+                entries.append(ArtifactCacheEntry(sha256=file_name,
+                                                  path=artifact_path,
+                                                  size=artifact_stat.st_size,
+                                                  last_used=artifact_stat.st_mtime))
+
+        entries.sort(key=lambda entry: entry.last_used)
+
+        return entries
+
+    def size(self):
+        '''The total size in bytes of all of the stored artifacts'''
+        return sum([entry.size for entry in self.entries()])
+
+    def prune(self, max_size, keep=None, min_age=0):
+        '''Remove least recently used artifacts until the store is no larger than max_size bytes
+
+        The artifacts with a sha256 in keep, or used less than min_age seconds ago,
+        are not removed. Returns the list of ArtifactCacheEntry that were removed.
+
+        Stale temp files are also removed, see remove_stale_tmp_files().'''
+        self.remove_stale_tmp_files()
+
+        keep = set([sha256.lower() for sha256 in keep or []])
+        used_since = time.time() - min_age
+
+        entries = self.entries()
+        total_size = sum([entry.size for entry in entries])
+
+        removed = []
+        for entry in entries:
+            if total_size <= max_size:
+                break
+
+            if entry.sha256 in keep or (min_age and entry.last_used > used_since):
+                continue
+
+            if self.remove(entry.sha256):
+                log.debug('Pruned artifact %s (%s bytes) from the artifact cache', entry.sha256, entry.size)
+                total_size -= entry.size
+                removed.append(entry)
+
+        return removed
+
+
+def prune_after_install(cache_config):
+    '''Prune the store of the 'cache' config section to its 'artifacts_max_size', once the installs of a run are done
+
+    Returns the list of ArtifactCacheEntry that were removed.'''
+    store = from_cache_config(cache_config)
+
+    if not store or store.max_size is None:
+        return []
+
+    removed = store.prune(store.max_size, min_age=RECENTLY_USED_SECONDS)
+
+    if removed:
+        log.debug('Pruned %s artifacts from the artifact cache %s', len(removed), store.path)
+
+    return removed
+
+
+def from_cache_config(cache_config):
+    '''Return the ArtifactCache for the 'cache' config section, or None if there is no cache path'''
+    cache_config = cache_config or {}
+
+    artifacts_path = cache_config.get('artifacts_path', None)
+
+    if not artifacts_path:
+        if not cache_config.get('path', None):
+            return None
+
+        artifacts_path = os.path.join(cache_config['path'], 'artifacts')
+
+    max_size = cache_config.get('artifacts_max_size', None)
+    if max_size is None:
+        max_size = DEFAULT_ARTIFACTS_MAX_SIZE
+
+    return ArtifactCache(os.path.expanduser(artifacts_path), max_size=max_size)
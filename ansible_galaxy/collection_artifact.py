@@ -32,12 +32,15 @@ def load_data_from_collection_artifact(repository_spec_string):
     return attr.asdict(spec_data)
 
 
-def validate_artifact(artifact_path, expected_chksum):
+def validate_artifact(artifact_path, expected_chksum, actual_chksum=None):
     '''Check the sha256sum of file at `artifact_path` against `expected_chksum`
 
+    If the sha256sum of the file is already known (for ex, it was computed while
+    downloading it), pass it as `actual_chksum` to avoid reading the file again.
+
     Raise a GalaxyArtifactChksumError if they don't match.
     '''
-    actual = chksums.sha256sum_from_path(artifact_path)
+    actual = actual_chksum or chksums.sha256sum_from_path(artifact_path)
 
     if actual != expected_chksum:
         raise exceptions.GalaxyArtifactChksumError(artifact_path=artifact_path,
@@ -1,12 +1,17 @@
 import logging
 
+import semantic_version
 import yaml
 
 from ansible_galaxy import exceptions
+from ansible_galaxy import requirements
 from ansible_galaxy.models.collections_lockfile import CollectionsLockfile
 
 log = logging.getLogger(__name__)
 
+# The items a pinned lockfile entry needs to be installed without using the Galaxy API
+PINNED_ENTRY_REQUIRED_KEYS = ('version', 'download_url', 'sha256')
+
 
 # TODO: replace with a generic version for cases
 #       where SomeClass(**dict_from_yaml) works
@@ -24,3 +29,65 @@ def load(data_or_file_object):
         raise exceptions.GalaxyClientError("Error parsing collections lockfile: %s" % str(exc))
 
     return collections_lockfile
+
+
+def is_pinned_entry(entry):
+    '''Return True if a lockfile entry is a pinned artifact instead of a version spec
+
+    A pinned entry is a dict like:
+
+        version: 1.0.0
+        download_url: https://galaxy.ansible.com/download/alikins-collection_inspect-1.0.0.tar.gz
+        filename: alikins-collection_inspect-1.0.0.tar.gz
+        size: 12345
+        sha256: 1f6e...
+    '''
+    return isinstance(entry, dict)
+
+
+def version_spec_dependencies(collections_lockfile):
+    '''The entries of the lockfile that are version specs, as a 'dependencies' style dict'''
+    return dict([(label, entry) for label, entry in collections_lockfile.dependencies.items()
+                 if not is_pinned_entry(entry)])
+
+
+def pinned_find_results(requirement_spec, entry):
+    '''Build the GalaxyUrlFetch.find() style results for a pinned lockfile entry'''
+    version = semantic_version.Version(str(entry['version']))
+
+    filename = entry.get('filename', None) or \
+        '%s-%s-%s.tar.gz' % (requirement_spec.namespace, requirement_spec.name, version)
+
+    return {'content': {'galaxy_namespace': requirement_spec.namespace,
+                        'repo_name': requirement_spec.name,
+                        'version': version},
+            'artifact': {'sha256': entry['sha256'],
+                         'filename': filename,
+                         'size': entry.get('size', None)},
+            'custom': {'download_url': entry['download_url'],
+                       'collection_is_deprecated': False},
+            }
+
+
+def pinned_requirements(collections_lockfile):
+    '''Return a list of (Requirement, find_results) for the pinned entries of the lockfile
+
+    The find_results are built from the lockfile entry, so the collection can be fetched
+    and its checksum validated without asking the Galaxy API anything.'''
+    results = []
+
+    for label, entry in sorted(collections_lockfile.dependencies.items()):
+        if not is_pinned_entry(entry):
+            continue
+
+        missing_keys = [key for key in PINNED_ENTRY_REQUIRED_KEYS if not entry.get(key, None)]
+
+        if missing_keys:
+            raise exceptions.GalaxyClientError('The collections lockfile entry for %s is missing: %s' %
+                                               (label, ', '.join(missing_keys)))
+
+        requirement = requirements.from_dependencies_dict({label: '==%s' % entry.get('version', None)})[0]
+
+        results.append((requirement, pinned_find_results(requirement.requirement_spec, entry)))
+
+    return results
@@ -10,15 +10,21 @@ log = logging.getLogger(__name__)
 class Config(object):
     def __init__(self):
         self.server = {}
+        self.http = {}
+        self.cache = {}
         self.collections_path = None
         self.global_collections_path = None
+        self.spool_path = None
         self.options = {}
 
     def as_dict(self):
         return collections.OrderedDict([
             ('server', self.server),
+            ('http', self.http),
+            ('cache', self.cache),
             ('collections_path', self.collections_path),
             ('global_collections_path', self.global_collections_path),
+            ('spool_path', self.spool_path),
             ('options', self.options),
         ])
 
@@ -26,8 +32,11 @@ class Config(object):
     def from_dict(cls, data):
         inst = cls()
         inst.server = data.get('server') or inst.server
+        inst.http = data.get('http') or inst.http
+        inst.cache = data.get('cache') or inst.cache
         inst.collections_path = data.get('collections_path') or inst.collections_path
         inst.global_collections_path = data.get('global_collections_path') or inst.global_collections_path
+        inst.spool_path = data.get('spool_path') or inst.spool_path
         inst.options = data.get('options') or inst.options
         return inst
 
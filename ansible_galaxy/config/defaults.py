@@ -25,10 +25,56 @@ DEFAULTS = [
       'api_key': None}
      ),
 
+    # http client settings
+    ('http',
+     {'pool_connections': 10,
+      'pool_maxsize': 10,
+      # max number of requests to make at once
+      'max_concurrent_requests': 8,
+      # max number of artifact downloads from the same server at once
+      'max_concurrent_downloads_per_host': 4,
+      # bytes read from a download and written to disk at once
+      'download_buffer_size': 1024 * 1024,
+      # allocate the disk space for a download up front, from its Content-Length
+      'download_preallocate': True,
+      # how to retry requests that fail for transient reasons, for
+      # galaxy api requests ('metadata') and downloads ('artifact')
+      'retries': {
+          'metadata': {'max_retries': 3,
+                       'backoff_factor': 0.5,
+                       'max_backoff': 10,
+                       'max_elapsed': 60},
+          'artifact': {'max_retries': 5,
+                       'backoff_factor': 1,
+                       'max_backoff': 30,
+                       'max_elapsed': 300},
+      }}
+     ),
+
+    # persistent caches of data from the galaxy server
+    ('cache',
+     {'path': os.path.join(MAZER_HOME, 'cache'),
+      # seconds to trust a cached server api version
+      'api_version_ttl': 86400,
+      # seconds to use a cached api response before revalidating it with the server
+      'metadata_max_age': 300,
+      # max total bytes of cached api responses
+      'metadata_max_size': 50 * 1024 * 1024,
+      # seconds to remember that a collection, or a version spec of one, was not found
+      'negative_ttl': 300,
+      # dir of the sha256 addressed store of downloaded artifacts, None for the 'artifacts' dir of 'path'
+      'artifacts_path': None,
+      # max total bytes of stored artifacts, the least recently used are removed first
+      'artifacts_max_size': 1024 * 1024 * 1024}
+     ),
+
     # In order of priority
     ('collections_path', os.path.join(MAZER_HOME, 'collections')),
     ('global_collections_path', '/usr/share/ansible/collections'),
 
+    # artifacts are downloaded to its .mazer_spool dir, None for the collections path
+    ('spool_path', None),
+
     # runtime options
     ('options',
      {
@@ -0,0 +1,229 @@
+'''A small persistent cache of json serializable data
+
+Each item is stored in its own json file in the cache directory. The file
+name is the sha256 of the key, and the file includes the key, the value,
+and the time the item was stored so items can be expired.
+
+If the cache has a max_size, the least recently used items are removed
+whenever the total size of the items is larger than max_size. The total is
+only read from the disk the first time an item is stored in a cache dir by
+this process, after that it is kept up to date as items are stored, so
+storing an item does not mean listing the whole cache dir.
+
+Errors reading or writing the cache are logged and otherwise ignored. A
+broken cache should only ever mean a cache miss.'''
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# The running total size of the items in each cache dir, by path
+_sizes = {}
+_sizes_lock = threading.Lock()
+
+
+def clear_sizes():
+    '''Forget the running totals, so the next set() of each cache dir reads its size from the disk'''
+    with _sizes_lock:
+        _sizes.clear()
+
+
+def _makedirs(path):
+    # another process or thread may create it first
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+class DiskCache(object):
+    def __init__(self, path, max_age=None, max_size=None):
+        self.path = path
+        # seconds, None means items do not expire
+        self.max_age = max_age
+        # bytes, None means no limit
+        self.max_size = max_size
+
+    def __repr__(self):
+        return '%s(path=%s, max_age=%s, max_size=%s)' % \
+            (self.__class__.__name__, self.path, self.max_age, self.max_size)
+
+    def _item_path(self, key):
+        key_digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, '%s.json' % key_digest)
+
+    def get_item(self, key):
+        '''Return the full cache item dict for key or None
+
+        The item includes the 'key', 'value' and 'stored_at' time. Expiration is
+        not checked.'''
+        item_path = self._item_path(key)
+
+        try:
+            with open(item_path, 'r') as item_fo:
+                item = json.load(item_fo)
+        except (OSError, IOError):
+            return None
+        except ValueError as exc:
+            log.warning('Ignoring invalid cache item %s for %s: %s', item_path, key, exc)
+            return None
+
+        # a sha256 collision is unlikely, but a stale format or manual edit is not
+        if item.get('key', None) != key:
+            return None
+
+        # The mtime of the item file is its last use, for pruning the least recently used
+        try:
+            os.utime(item_path, None)
+        except (OSError, IOError):
+            pass
+
+        return item
+
+    def is_expired(self, item, max_age=None):
+        max_age = max_age if max_age is not None else self.max_age
+
+        if max_age is None:
+            return False
+
+        age = time.time() - item.get('stored_at', 0)
+        return age > max_age
+
+    def get(self, key, max_age=None):
+        '''Return the cached value for key, or None if it is not cached or is expired'''
+        item = self.get_item(key)
+
+        if item is None:
+            return None
+
+        if self.is_expired(item, max_age=max_age):
+            log.debug('Cache item for %s is expired', key)
+            return None
+
+        return item.get('value', None)
+
+    def set(self, key, value):
+        '''Store value for key
+
+        The item is written to a temp file and renamed into place, so concurrent
+        readers never see a partially written item.'''
+        item = {'key': key,
+                'stored_at': time.time(),
+                'value': value}
+
+        item_path = self._item_path(key)
+
+        # the json is ascii, so its length is the size of the file
+        item_data = json.dumps(item)
+
+        try:
+            old_size = os.stat(item_path).st_size
+        except (OSError, IOError):
+            old_size = 0
+
+        try:
+            _makedirs(self.path)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.tmp-', suffix='.json')
+            with os.fdopen(fd, 'w') as tmp_fo:
+                tmp_fo.write(item_data)
+
+            os.rename(tmp_path, item_path)
+        except (OSError, IOError) as exc:
+            log.warning('Unable to write cache item %s for %s: %s', item_path, key, exc)
+            return False
+
+        if self.max_size is not None:
+            self._add_size(len(item_data) - old_size)
+
+        return True
+
+    def _add_size(self, size_change):
+        '''Add size_change to the running total of the cache dir, and prune if it is now larger than max_size'''
+        with _sizes_lock:
+            total_size = _sizes.get(self.path, None)
+
+            if total_size is None:
+                # includes the item that was just stored
+                total_size = self.size()
+            else:
+                total_size += size_change
+
+            _sizes[self.path] = total_size
+
+        if total_size > self.max_size:
+            self.prune(self.max_size)
+
+    def delete(self, key):
+        try:
+            os.unlink(self._item_path(key))
+        except (OSError, IOError):
+            return False
+        return True
+
+    def _item_paths_and_stats(self):
+        try:
+            file_names = os.listdir(self.path)
+        except (OSError, IOError):
+            return []
+
+        paths_and_stats = []
+        for file_name in file_names:
+            if not file_name.endswith('.json') or file_name.startswith('.tmp-'):
+                continue
+
+            item_path = os.path.join(self.path, file_name)
+            try:
+                paths_and_stats.append((item_path, os.stat(item_path)))
+            except (OSError, IOError):
+                # removed by someone else since the listdir()
+                continue
+
+        return paths_and_stats
+
+    def size(self):
+        '''The total size in bytes of all of the cached items'''
+        return sum([item_stat.st_size for dummy, item_stat in self._item_paths_and_stats()])
+
+    def prune(self, max_size):
+        '''Remove least recently used items until the cache is no larger than max_size bytes
+
+        Returns the number of items removed.'''
+        paths_and_stats = self._item_paths_and_stats()
+
+        total_size = sum([item_stat.st_size for dummy, item_stat in paths_and_stats])
+
+        if total_size <= max_size:
+            with _sizes_lock:
+                _sizes[self.path] = total_size
+            return 0
+
+        # oldest mtime first
+        paths_and_stats.sort(key=lambda path_and_stat: path_and_stat[1].st_mtime)
+
+        removed = 0
+        for item_path, item_stat in paths_and_stats:
+            if total_size <= max_size:
+                break
+
+            try:
+                os.unlink(item_path)
+            except (OSError, IOError):
+                continue
+
+            total_size -= item_stat.st_size
+            removed += 1
+
+        with _sizes_lock:
+            _sizes[self.path] = total_size
+
+        log.debug('Pruned %s items from %s', removed, self.path)
+
+        return removed
@@ -1,66 +1,388 @@
+import collections
+import hashlib
 import logging
 import os
 import tempfile
+import time
 import uuid
 
 import requests
 
+from ansible_galaxy import download_spool
 from ansible_galaxy import exceptions
+from ansible_galaxy import http_metrics
+from ansible_galaxy import http_pool
+from ansible_galaxy import redirect_cache
+from ansible_galaxy import retry
 from ansible_galaxy import user_agent
+from ansible_galaxy.utils import concurrency
 
 log = logging.getLogger(__name__)
 
+# path is the downloaded temp file, sha256 is the hex sha256 of its contents
+DownloadedArtifact = collections.namedtuple('DownloadedArtifact', ['path', 'sha256'])
 
-def fetch_url(archive_url, validate_certs=True, filename=None, dest_dir=None, chunk_size=None):
+# bytes read from the response and written to the file at once
+DEFAULT_DOWNLOAD_BUFFER_SIZE = 1024 * 1024
+
+# min seconds between calls to a download progress_callback
+PROGRESS_INTERVAL = 1.0
+
+
+def fetch_url(archive_url, validate_certs=True, filename=None, dest_dir=None, chunk_size=None,
+              http_config=None, cache_config=None, progress_callback=None, spool_path=None):
+    """
+    Downloads the archived content from github to a temp location, and returns its path
+
+    See fetch_artifact() for the details.
+    """
+    return fetch_artifact(archive_url, validate_certs=validate_certs, filename=filename,
+                          dest_dir=dest_dir, chunk_size=chunk_size,
+                          http_config=http_config, cache_config=cache_config,
+                          progress_callback=progress_callback, spool_path=spool_path).path
+
+
+def fetch_artifact(archive_url, validate_certs=True, filename=None, dest_dir=None, chunk_size=None,
+                   http_config=None, cache_config=None, expected_sha256=None, progress_callback=None,
+                   spool_path=None):
     """
     Downloads the archived content from github to a temp location
+
+    Returns a DownloadedArtifact with the path to the temp file and the sha256
+    of its contents. The sha256 is computed as the body is read, so checking
+    it against an expected sha256 does not need to read the file again.
+
+    The download uses the shared pooled http session for the archive_url
+    server. http_config is the 'http' section of the mazer config.
+
+    At most 'max_concurrent_downloads_per_host' downloads from the same server
+    are made at once, see http_pool.download_slot().
+
+    Downloads that fail for transient reasons (connection errors, 429 or
+    5xx responses, etc) are retried with the 'artifact' retry policy.
+
+    If archive_url redirects (for ex, to a CDN), the final url is remembered
+    (see redirect_cache) and used directly next time. cache_config is the
+    'cache' section of the mazer config, used to remember redirects on disk.
+
+    The download goes to a temp file in spool_path (the system temp dir if
+    there is no spool_path). With a spool_path, if the download fails part way,
+    the next attempt (or the next download of archive_url) continues where it
+    stopped with a Range request (see download_spool).
+    expected_sha256 is the sha256 the caller will check the artifact against,
+    which lets a download be resumed even if the server sends no ETag or
+    Last-Modified.
+
+    The body is read and written 'download_buffer_size' bytes at a time (or
+    chunk_size, if given), and if 'download_preallocate' is true, the space
+    for the whole artifact is allocated up front from its Content-Length
+    (except for partial downloads that can be resumed).
+    progress_callback(bytes_done, total_bytes, bytes_per_second) is called
+    at most every PROGRESS_INTERVAL seconds while downloading, and when done.
+    total_bytes is None if the size is not known.
+    """
+
+    retry_policy = retry.RetryPolicy.from_http_config(http_config, retry.ARTIFACT)
+
+    request_metrics = http_metrics.RequestMetrics('GET', archive_url, request_class=retry.ARTIFACT)
+
+    partial_download = _open_partial_download(archive_url, spool_path, http_config)
+
+    def _fetch_once():
+        request_metrics.attempt()
+
+        target_url = redirect_cache.get(archive_url, cache_config=cache_config)
+
+        if target_url:
+            log.debug('Downloading %s from its cached redirect target %s', archive_url, target_url)
+
+            # The download counts as a request in flight until the whole body is read
+            with http_pool.download_slot(target_url, http_config), http_pool.request_slot(http_config):
+                try:
+                    return _fetch_url(target_url, validate_certs=validate_certs, filename=filename,
+                                      chunk_size=chunk_size, http_config=http_config,
+                                      request_metrics=request_metrics,
+                                      partial_download=partial_download, expected_sha256=expected_sha256,
+                                      progress_callback=progress_callback, spool_path=spool_path)
+                except requests.exceptions.RequestException as exc:
+                    # for ex, an expired signed CDN url
+                    log.debug('Download from cached redirect target %s failed, trying %s: %s',
+                              target_url, archive_url, exc)
+                    redirect_cache.forget(archive_url, cache_config=cache_config)
+
+        with http_pool.download_slot(archive_url, http_config), http_pool.request_slot(http_config):
+            return _fetch_url(archive_url, validate_certs=validate_certs, filename=filename,
+                              chunk_size=chunk_size, http_config=http_config,
+                              request_metrics=request_metrics, cache_config=cache_config,
+                              partial_download=partial_download, expected_sha256=expected_sha256,
+                              progress_callback=progress_callback, spool_path=spool_path)
+
+    try:
+        succeeded = False
+        try:
+            downloaded_artifact = retry_policy.call(_fetch_once, archive_url)
+            succeeded = True
+        finally:
+            # keep what was downloaded for next time, even after ctrl-c
+            if not succeeded and partial_download:
+                partial_download.stop()
+    except requests.exceptions.HTTPError as http_exc:
+        request_metrics.done(error=http_exc)
+        raise exceptions.GalaxyDownloadError(http_exc,
+                                             url=http_exc.response.url)
+    except requests.exceptions.RequestException as e:
+        request_metrics.done(error=e)
+        log.exception(e)
+        raise exceptions.GalaxyDownloadError(e, url=archive_url)
+    except Exception as exc:
+        # for ex, the disk is full
+        request_metrics.done(error=exc)
+        raise
+
+    request_metrics.done()
+
+    return downloaded_artifact
+
+
+def fetch_urls(archive_urls, validate_certs=True, http_config=None, cache_config=None, spool_path=None):
+    """
+    Download each of archive_urls to a temp location, several at once
+
+    Returns a list of the downloaded temp file paths in the same order as
+    archive_urls. Up to the http 'max_concurrent_requests' downloads are
+    made at the same time.
+
+    If any download fails, the files that were downloaded are removed
+    and the first GalaxyDownloadError is raised.
     """
+    http_config = http_config or {}
+
+    def _fetch_one(archive_url):
+        try:
+            return (fetch_url(archive_url, validate_certs=validate_certs,
+                              http_config=http_config, cache_config=cache_config,
+                              spool_path=spool_path), None)
+        except exceptions.GalaxyDownloadError as exc:
+            return (None, exc)
+
+    max_workers = http_config.get('max_concurrent_requests', None) or http_pool.DEFAULT_MAX_CONCURRENT_REQUESTS
+
+    results = concurrency.map_bounded(_fetch_one, archive_urls, max_workers=max_workers)
+
+    errors = [exc for dummy, exc in results if exc]
+
+    if errors:
+        for downloaded_path, dummy in results:
+            if downloaded_path:
+                os.unlink(downloaded_path)
+
+        raise errors[0]
+
+    return [downloaded_path for downloaded_path, dummy in results]
+
+
+def _buffer_size(http_config):
+    return (http_config or {}).get('download_buffer_size', None) or DEFAULT_DOWNLOAD_BUFFER_SIZE
+
 
+def _open_partial_download(archive_url, spool_path, http_config):
+    if not spool_path:
+        return None
+
+    try:
+        return download_spool.PartialDownload.open(spool_path, archive_url,
+                                                   buffer_size=_buffer_size(http_config))
+    except (OSError, IOError) as exc:
+        log.warning('Unable to use the download spool dir %s, the download of %s can not be resumed: %s',
+                    spool_path, archive_url, exc)
+        return None
+
+
+def _content_length(resp):
+    content_length = resp.headers.get('Content-Length', None)
+
+    if content_length and content_length.isdigit():
+        return int(content_length)
+
+    return None
+
+
+def _preallocate(file_object, length):
+    '''Allocate length more bytes for file_object, so the filesystem can lay it out in one piece
+
+    Returns True if it did. Note this makes the file longer, so it has to be
+    truncated back to what was written.'''
+    if not length or not hasattr(os, 'posix_fallocate'):
+        return False
+
+    try:
+        file_object.flush()
+        os.posix_fallocate(file_object.fileno(), file_object.tell(), length)
+    except (OSError, IOError) as exc:
+        # for ex, a filesystem that does not support it
+        log.debug('Unable to preallocate %s bytes for %s: %s', length, file_object.name, exc)
+        return False
+
+    return True
+
+
+def _remove_temp_file(file_object, temp_path):
+    try:
+        file_object.close()
+    except (OSError, IOError):
+        # for ex, the buffered data could not be written to a full disk
+        pass
+
+    try:
+        os.unlink(temp_path)
+    except (OSError, IOError) as exc:
+        log.warning('Unable to remove the incomplete download %s: %s', temp_path, exc)
+
+
+def _stream_response(resp, file_object, write, chunk_size, offset=0, preallocate=True,
+                     request_metrics=None, progress_callback=None):
+    '''Write the body of resp to file_object with write(chunk)
+
+    offset is the number of bytes of the artifact written before, when continuing
+    a partial download.'''
+    content_length = _content_length(resp)
+    total_bytes = offset + content_length if content_length is not None else None
+
+    preallocated = preallocate and _preallocate(file_object, content_length)
+
+    started_at = time.time()
+    reported_at = started_at
+    bytes_done = offset
+
+    try:
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            write(chunk)
+            bytes_done += len(chunk)
+
+            if progress_callback:
+                now = time.time()
+                if now - reported_at >= PROGRESS_INTERVAL:
+                    reported_at = now
+                    progress_callback(bytes_done, total_bytes, float(bytes_done - offset) / (now - started_at))
+    finally:
+        if request_metrics:
+            # the bytes received, before any Content-Encoding is decoded
+            request_metrics.add_bytes_in(http_metrics.response_bytes_in(resp, default=bytes_done - offset))
+
+        if preallocated:
+            # drop any of the preallocated space that was not written to
+            file_object.flush()
+            file_object.truncate()
+
+    if progress_callback:
+        elapsed = time.time() - started_at
+        progress_callback(bytes_done, total_bytes, float(bytes_done - offset) / elapsed if elapsed > 0 else None)
+
+
+def _fetch_url(archive_url, validate_certs=True, filename=None, chunk_size=None, http_config=None,
+               request_metrics=None, cache_config=None, partial_download=None, expected_sha256=None,
+               progress_callback=None, spool_path=None):
+    '''Make one attempt at downloading archive_url, raising requests exceptions on failure
+
+    If partial_download is a download_spool.PartialDownload, the download is
+    written to it (and continues it, if the server allows). Otherwise it is
+    written to a new temp file in spool_path (or the system temp dir).
+
+    Returns a DownloadedArtifact.'''
     request_headers = {}
     request_id = uuid.uuid4().hex
     request_headers['X-Request-ID'] = request_id
     request_headers['User-Agent'] = user_agent.user_agent()
 
+    resume_headers = partial_download.request_headers() if partial_download else {}
+    request_headers.update(resume_headers)
+
     log.debug('Downloading archive_url: %s', archive_url)
 
-    try:
-        resp = requests.get(archive_url, verify=validate_certs,
-                            headers=request_headers, stream=True)
-    except Exception as e:
-        log.exception(e)
-        raise exceptions.GalaxyDownloadError(e, url=archive_url)
+    session = http_pool.get_session(archive_url, http_config=http_config)
+
+    resp = session.get(archive_url, verify=validate_certs,
+                       headers=request_headers, stream=True)
+
+    if request_metrics:
+        request_metrics.got_response(resp)
 
     # Let tmp filenames begin with the expected artifact filename before '::', except
     # if we don't know it, then it's the UNKNOWN...
     _prefix = filename or 'UNKNOWN-UNKNOWN-UNKNOWN.tar.gz'
     prefix = '%s::' % _prefix
+    suffix = download_spool.DOWNLOAD_SUFFIX
+
+    buffer_size = _buffer_size(http_config)
+    chunk_size = chunk_size or buffer_size
+
+    temp_path = None
+    sha256 = hashlib.sha256()
+
+    if partial_download:
+        resumed = partial_download.resumes(resp)
+
+        if resume_headers and not resumed and resp.status_code in (206, 416):
+            # the partial download was thrown away, try again for all of it
+            resp.close()
+            return _fetch_url(archive_url, validate_certs=validate_certs, filename=filename,
+                              chunk_size=chunk_size, http_config=http_config,
+                              request_metrics=request_metrics, cache_config=cache_config,
+                              partial_download=partial_download, expected_sha256=expected_sha256,
+                              progress_callback=progress_callback, spool_path=spool_path)
+
+        file_object = partial_download.part_fo
+        write = partial_download.write
+    else:
+        temp_dir = spool_path if spool_path and os.path.isdir(spool_path) else None
+        temp_fd, temp_path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=temp_dir)
+        file_object = os.fdopen(temp_fd, 'wb', buffer_size)
 
-    # TODO: add a configured spool or cache dir and/or default to using
-    #       one in MAZER_HOME or maybe ANSIBLE_TMP?
-    temp_fd = tempfile.NamedTemporaryFile(delete=False,
-                                          suffix='-tmp-mazer-artifact-download',
-                                          prefix=prefix)
+        def write(chunk):
+            file_object.write(chunk)
+            sha256.update(chunk)
 
+    succeeded = False
     try:
         resp.raise_for_status()
-    except requests.exceptions.HTTPError as http_exc:
-        temp_fd.close()
-        os.unlink(temp_fd.name)
 
-        raise exceptions.GalaxyDownloadError(http_exc,
-                                             url=http_exc.response.url)
+        if resp.history:
+            for redirect in resp.history:
+                log.debug('Original request for %s redirected. %s is redirected to %s',
+                          archive_url, redirect.url, redirect.headers['Location'])
+
+        if partial_download and not resumed:
+            partial_download.start(resp, expected_sha256=expected_sha256)
+
+        # A .part file that can be resumed is never preallocated. If mazer were killed part
+        # way, the next attempt would resume from the end of the preallocated (zero) space.
+        preallocate = (http_config or {}).get('download_preallocate', True)
+        if partial_download and partial_download.meta:
+            preallocate = False
 
-    if resp.history:
-        for redirect in resp.history:
-            log.debug('Original request for %s redirected. %s is redirected to %s',
-                      archive_url, redirect.url, redirect.headers['Location'])
+        _stream_response(resp, file_object, write, chunk_size,
+                         offset=partial_download.offset if partial_download else 0,
+                         preallocate=preallocate,
+                         request_metrics=request_metrics,
+                         progress_callback=progress_callback)
 
-    for chunk in resp.iter_content(chunk_size=chunk_size):
-        log.debug('read chunk')
-        temp_fd.write(chunk)
+        redirect_cache.remember(archive_url, resp, cache_config=cache_config)
 
-    temp_fd.close()
+        if partial_download:
+            downloaded_artifact = DownloadedArtifact(path=partial_download.complete(prefix, suffix),
+                                                     sha256=partial_download.sha256.hexdigest())
+        else:
+            file_object.close()
+            downloaded_artifact = DownloadedArtifact(path=temp_path, sha256=sha256.hexdigest())
 
-    return temp_fd.name
+        succeeded = True
+    finally:
+        # Any failure, not just a requests error. For ex, a connection dropped part way
+        # through the body, a full disk, or ctrl-c. A partial download is kept or removed
+        # by fetch_artifact(), a temp file is removed here.
+        if not succeeded:
+            resp.close()
+            if temp_path:
+                _remove_temp_file(file_object, temp_path)
 
-    return False
+    return downloaded_artifact
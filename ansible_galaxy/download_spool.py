@@ -0,0 +1,314 @@
+'''Keep partial artifact downloads so they can be resumed
+
+Artifacts are downloaded into the spool dir, the .mazer_spool dir of the
+'spool_path' setting (by default, of the collections path, see spool_dir())
+as <sha256 of the url>.part, with what is known about the download in
+<sha256 of the url>.json:
+
+    - 'url': the url being downloaded
+    - 'etag' and 'last_modified': the ETag and Last-Modified of the response
+    - 'size': the Content-Length of the whole artifact, if known
+
+If a download fails part way, the .part file and its metadata are kept. The
+next attempt (a retry, or the next mazer run) sends a 'Range' request for
+the rest of the artifact, with an 'If-Range' of the ETag (or Last-Modified).
+If the artifact changed on the server, the server sends all of it and the
+download starts over.
+
+A partial download is only kept if it can be checked later. That is, the
+response had an ETag or Last-Modified, or the caller knows the sha256 the
+whole artifact should have (and checks it). Partial downloads that are not
+resumed within DEFAULT_PARTIAL_MAX_AGE seconds are removed, and so are any
+completed downloads that were left behind. That is checked once per process
+for each spool dir, and only files with the names mazer gives them are
+removed.
+
+The .part file is locked while it is being downloaded to, so if another
+process is downloading the same url, the download goes to a new temp file
+instead.'''
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PARTIAL_MAX_AGE = 7 * 86400
+
+# how much of a partial download to read at once when hashing it
+HASH_BLOCK_SIZE = 65536
+
+# the end of the name of each completed download
+DOWNLOAD_SUFFIX = '-tmp-mazer-artifact-download'
+
+SPOOL_DIR_NAME = '.mazer_spool'
+
+# <sha256 of the url>.part and .json, and <artifact filename>::<random><DOWNLOAD_SUFFIX>
+SPOOL_FILE_NAME_RE = re.compile(r'^([0-9a-f]{64}\.(part|json)|.+::.+%s)$' % re.escape(DOWNLOAD_SUFFIX))
+
+# the spool dirs already pruned by this process
+_pruned = set()
+_pruned_lock = threading.Lock()
+
+
+def spool_dir(spool_path):
+    '''Return the spool dir in spool_path (the 'spool_path' setting, or the collections path if it is not set)
+
+    mazer only ever writes to, and removes files from, the dir it creates in
+    spool_path, so spool_path can be a shared dir like /var/tmp. By default it
+    is in the collections path (next to its ansible_collections dir), so it is on
+    the same filesystem as the installed collections, even if the collections
+    path is a mount point.'''
+    return os.path.join(spool_path, SPOOL_DIR_NAME)
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except (OSError, IOError):
+        pass
+
+
+def prune(path, max_age=DEFAULT_PARTIAL_MAX_AGE):
+    '''Remove partial (and left behind complete) downloads in path that are older than max_age seconds'''
+    try:
+        file_names = os.listdir(path)
+    except (OSError, IOError):
+        return
+
+    oldest = time.time() - max_age
+
+    for file_name in file_names:
+        # not something mazer downloaded
+        if not SPOOL_FILE_NAME_RE.match(file_name):
+            continue
+
+        file_path = os.path.join(path, file_name)
+
+        try:
+            if os.stat(file_path).st_mtime < oldest:
+                log.debug('Removing stale partial download %s', file_path)
+                os.unlink(file_path)
+        except (OSError, IOError):
+            continue
+
+
+def prune_once(path, max_age=DEFAULT_PARTIAL_MAX_AGE):
+    '''prune() path, unless it was already pruned by this process'''
+    with _pruned_lock:
+        if path in _pruned:
+            return
+        _pruned.add(path)
+
+    prune(path, max_age=max_age)
+
+
+def clear_pruned():
+    with _pruned_lock:
+        _pruned.clear()
+
+
+class PartialDownload(object):
+    '''A download to a .part file in the spool dir, that may continue an earlier one
+
+    Use PartialDownload.open() to create one.'''
+
+    def __init__(self, url, part_path, meta_path, part_fo, meta):
+        self.url = url
+        self.part_path = part_path
+        self.meta_path = meta_path
+        self.part_fo = part_fo
+        self.meta = meta
+
+        # the sha256 of everything written so far, including any earlier attempts
+        self.sha256 = hashlib.sha256()
+        self.offset = 0
+
+        self._hash_existing()
+
+    def __repr__(self):
+        return '%s(url=%s, part_path=%s, offset=%s)' % (self.__class__.__name__, self.url,
+                                                        self.part_path, self.offset)
+
+    @classmethod
+    def open(cls, path, url, buffer_size=-1):
+        '''Return a PartialDownload of url in the spool dir path, or None if it is in use
+
+        buffer_size is the size of the write buffer of the .part file.'''
+        _makedirs(path)
+        prune_once(path)
+
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        part_path = os.path.join(path, '%s.part' % key)
+        meta_path = os.path.join(path, '%s.json' % key)
+
+        part_fo = os.fdopen(os.open(part_path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b', buffer_size)
+
+        if fcntl:
+            try:
+                fcntl.flock(part_fo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (OSError, IOError):
+                log.debug('%s is being downloaded by someone else', part_path)
+                part_fo.close()
+                return None
+
+            # The process that had the lock may have finished, and renamed the file we opened
+            try:
+                if os.fstat(part_fo.fileno()).st_ino != os.stat(part_path).st_ino:
+                    part_fo.close()
+                    return None
+            except (OSError, IOError):
+                part_fo.close()
+                return None
+
+        meta = None
+        try:
+            with open(meta_path, 'r') as meta_fo:
+                meta = json.load(meta_fo)
+        except (OSError, IOError, ValueError):
+            pass
+
+        if not isinstance(meta, dict) or meta.get('url', None) != url:
+            # nothing known about whatever is in the .part file
+            meta = None
+            part_fo.truncate(0)
+            _remove(meta_path)
+
+        return cls(url, part_path, meta_path, part_fo, meta)
+
+    def _hash_existing(self):
+        self.part_fo.seek(0)
+
+        for block in iter(lambda: self.part_fo.read(HASH_BLOCK_SIZE), b''):
+            self.sha256.update(block)
+            self.offset += len(block)
+
+    def request_headers(self):
+        '''Return the headers to add to the request to resume the download, if it can be'''
+        if not self.offset or not self.meta:
+            return {}
+
+        size = self.meta.get('size', None)
+        if size is not None and self.offset >= size:
+            # more than there should be, or all of it but not renamed into place
+            self.restart()
+            return {}
+
+        headers = {'Range': 'bytes=%s-' % self.offset}
+
+        validator = self.meta.get('etag', None) or self.meta.get('last_modified', None)
+        if validator:
+            headers['If-Range'] = validator
+
+        return headers
+
+    def resumes(self, response):
+        '''Return True if response is the rest of the partial download
+
+        If it is not (the server ignored the Range, or the artifact changed),
+        the partial download is restarted from the beginning.'''
+        if not self.offset:
+            return False
+
+        if response.status_code == 206:
+            content_range = response.headers.get('Content-Range', '')
+
+            if content_range.startswith('bytes %s-' % self.offset):
+                log.info('Resuming the download of %s at byte %s', self.url, self.offset)
+                return True
+
+            log.debug('Unexpected Content-Range "%s" resuming %s at byte %s', content_range, self.url, self.offset)
+        elif response.status_code not in (200, 416):
+            # an error response, try to resume again on the next attempt
+            return False
+
+        self.restart()
+        return False
+
+    def restart(self):
+        '''Throw away whatever was downloaded before'''
+        self.part_fo.seek(0)
+        self.part_fo.truncate()
+        self.sha256 = hashlib.sha256()
+        self.offset = 0
+        self.meta = None
+        _remove(self.meta_path)
+
+    def start(self, response, expected_sha256=None):
+        '''Record what is needed to resume the download of the (full, 200) response later'''
+        etag = response.headers.get('ETag', None)
+        last_modified = response.headers.get('Last-Modified', None)
+
+        if not (etag or last_modified or expected_sha256):
+            # no way to tell if the rest of it would be the same artifact
+            log.debug('Not keeping partial downloads of %s, there is no ETag, Last-Modified, or sha256', self.url)
+            return
+
+        size = response.headers.get('Content-Length', None)
+
+        self.meta = {'url': self.url,
+                     'etag': etag,
+                     'last_modified': last_modified,
+                     'size': int(size) if size and size.isdigit() else None}
+
+        try:
+            with open(self.meta_path, 'w') as meta_fo:
+                json.dump(self.meta, meta_fo)
+        except (OSError, IOError) as exc:
+            log.warning('Unable to save the partial download info for %s: %s', self.url, exc)
+            self.meta = None
+
+    def write(self, chunk):
+        self.part_fo.write(chunk)
+        self.sha256.update(chunk)
+        self.offset += len(chunk)
+
+    def stop(self):
+        '''The download failed, keep what was downloaded if it can be resumed'''
+        if self.part_fo.closed:
+            return
+
+        try:
+            self.part_fo.flush()
+        except (OSError, IOError) as exc:
+            # for ex, a full disk. What is on disk is hashed again when it is resumed.
+            log.warning('Unable to save all of the partial download of %s: %s', self.url, exc)
+
+        if not self.meta:
+            _remove(self.part_path)
+
+        self.part_fo.close()
+
+    def complete(self, prefix, suffix):
+        '''The download finished, move it to a new temp file in the spool dir and return its path'''
+        self.part_fo.flush()
+
+        spool_dir = os.path.dirname(self.part_path)
+        fd, complete_path = tempfile.mkstemp(dir=spool_dir, prefix=prefix, suffix=suffix)
+        os.close(fd)
+
+        # renamed while still holding the lock
+        os.rename(self.part_path, complete_path)
+        _remove(self.meta_path)
+
+        self.part_fo.close()
+
+        return complete_path
@@ -32,7 +32,10 @@ def get(galaxy_context, requirement_spec):
         fetcher = local_file.LocalFileFetch(requirement_spec)
     elif requirement_spec.fetch_method == FetchMethods.REMOTE_URL:
         fetcher = remote_url.RemoteUrlFetch(requirement_spec=requirement_spec,
-                                            validate_certs=not galaxy_context.server['ignore_certs'])
+                                            validate_certs=not galaxy_context.server['ignore_certs'],
+                                            http_config=galaxy_context.http,
+                                            cache_config=galaxy_context.cache,
+                                            spool_path=galaxy_context.spool_path)
     elif requirement_spec.fetch_method == FetchMethods.GALAXY_URL:
         fetcher = galaxy_url.GalaxyUrlFetch(requirement_spec=requirement_spec,
                                             galaxy_context=galaxy_context)
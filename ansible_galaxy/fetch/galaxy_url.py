@@ -1,15 +1,17 @@
 import logging
 
-import semantic_version
 from six.moves.urllib.parse import quote as urlquote
 
 # mv details of this here
+from ansible_galaxy import artifact_cache
 from ansible_galaxy import collection_artifact
 from ansible_galaxy import exceptions
 from ansible_galaxy import download
+from ansible_galaxy import negative_cache
 from ansible_galaxy.fetch import base
 # from ansible_galaxy.models.repository_spec import RepositorySpec
 from ansible_galaxy.rest_api import GalaxyAPI
+from ansible_galaxy.version_index import VersionIndex
 
 log = logging.getLogger(__name__)
 
@@ -39,6 +41,120 @@ def select_repository_version(repoversions, version):
     return repoversion
 
 
+def get_collection_detail(api, requirement_spec):
+    '''Get the Collection detail for requirement_spec (GET /api/v2/collections/{namespace}/{name})'''
+
+    # TODO: extract parsing of cli content sorta-url thing and add better tests
+
+    # FIXME: Remove? We kind of need the actual Collection detail yet (ever?)
+    collection_detail_url = '{base_api_url}/v2/collections/{namespace}/{name}/'.format(base_api_url=api.base_api_url,
+                                                                                       namespace=urlquote(requirement_spec.namespace),
+                                                                                       name=urlquote(requirement_spec.name))
+
+    log.debug('collection_detail_url: %s', collection_detail_url)
+
+    cache_config = api.galaxy_context.cache
+
+    # fail fast if the collection was recently not found
+    missing_message = negative_cache.missing(api.api_server, requirement_spec.namespace, requirement_spec.name,
+                                             cache_config=cache_config)
+
+    if missing_message:
+        log.debug('%s was recently not found on %s, not looking again', requirement_spec.label, api.api_server)
+        raise exceptions.GalaxyClientError(missing_message)
+
+    not_found_message = "- sorry, %s was not found on %s." % (requirement_spec.label, api.api_server)
+
+    try:
+        collection_detail_data = api.get_object(href=collection_detail_url)
+    except exceptions.GalaxyRestAPIError as exc:
+        if getattr(exc.response, 'status_code', None) == 404:
+            negative_cache.remember_missing(api.api_server, requirement_spec.namespace, requirement_spec.name,
+                                            not_found_message, cache_config=cache_config)
+        raise
+
+    if not collection_detail_data:
+        negative_cache.remember_missing(api.api_server, requirement_spec.namespace, requirement_spec.name,
+                                        not_found_message, cache_config=cache_config)
+        raise exceptions.GalaxyClientError(not_found_message)
+
+    return collection_detail_data
+
+
+def get_collection_versions(api, collection_detail_data, requirement_spec):
+    '''Get all the available versions of a Collection (GET /api/v2/collections/{namespace}/{name}/versions/)
+
+    Returns a VersionIndex of the CollectionVersion dicts. The index for each
+    versions url is only built once per run (per GalaxyContext).'''
+
+    versions_list_url = collection_detail_data.get('versions_url', None)
+
+    def _build_version_index():
+        # TODO: if versions ends up with a 'related' we could follow it instead of specific
+        #       get_collection_version_list()
+        # example results
+        # [{
+        #   "version": "2.4.5",
+        #   "href": "/api/v2/collections/ansible/k8s/versions/2.4.5/",
+        #  },
+        #  {
+        #   "version": "1.2.3",
+        #   "href": "/api/v2/collections/ansible/k8s/versions/1.2.3/",
+        #  }]
+        log.debug('Getting collectionversions for %s.%s from %s',
+                  requirement_spec.namespace, requirement_spec.name, versions_list_url)
+
+        # Selecting the best version needs every version, so fetch all the pages
+        collection_version_list_data = api.get_object(versions_list_url)
+
+        return VersionIndex.from_collection_versions(collection_version_list_data)
+
+    collection_versions = api.galaxy_context.version_indexes.get(versions_list_url, _build_version_index)
+
+    log.debug('collection versions: %s', collection_versions)
+
+    if not collection_versions:
+        raise exceptions.GalaxyClientError("- sorry, %s was not found on %s." %
+                                           (requirement_spec.label,
+                                            api.api_server))
+
+    return collection_versions
+
+
+def find_results_from_version_detail(requirement_spec, version, collection_detail_data, collectionversion_detail_data):
+    '''Build the find() results for version from its CollectionVersion detail'''
+
+    download_url = collectionversion_detail_data.get('download_url', None)
+
+    log.debug('download_url for %s.%s: %s', requirement_spec.namespace, requirement_spec.name, download_url)
+
+    if not download_url:
+        raise exceptions.GalaxyError('no external_url info on the Repository object from %s' % requirement_spec.label)
+
+    artifact_detail = collectionversion_detail_data.get('artifact', {})
+    log.debug('artifact_detail: %s', artifact_detail)
+
+    # The 'dependencies' declared in the collection's galaxy.yml, so they can be resolved
+    # without downloading the artifact
+    metadata = collectionversion_detail_data.get('metadata', None) or {}
+    dependencies = metadata.get('dependencies', None) or {}
+
+    # TODO: raise exceptions if API requests are empty
+
+    results = {'content': {'galaxy_namespace': requirement_spec.namespace,
+                           'repo_name': requirement_spec.name,
+                           'version': version,
+                           'dependencies': dependencies},
+               'artifact': {'sha256': artifact_detail['sha256'],
+                            'filename': artifact_detail['filename'],
+                            'size': artifact_detail['size']},
+               'custom': {'download_url': download_url,
+                          'collection_is_deprecated': collection_detail_data.get('deprecated', False)},
+               }
+
+    return results
+
+
 # TODO: split into galaxy_role/galaxy_collection ?
 class GalaxyUrlFetch(base.BaseFetch):
     fetch_method = 'galaxy_url'
@@ -51,6 +167,9 @@ class GalaxyUrlFetch(base.BaseFetch):
 
         self.validate_certs = not self.galaxy_context.server['ignore_certs']
 
+        # True if local_path is in the artifact cache, and should not be removed by cleanup()
+        self.from_artifact_cache = False
+
         log.debug('requirement_spec: %s', requirement_spec)
         # log.debug('Validate TLS certificates: %s', self.validate_certs)
 
@@ -69,68 +188,31 @@ class GalaxyUrlFetch(base.BaseFetch):
 
         api = GalaxyAPI(self.galaxy_context)
 
-        namespace = self.requirement_spec.namespace
-        collection_name = self.requirement_spec.name
-
-        log.debug('Querying %s for namespace=%s, name=%s', self.galaxy_context.server['url'], namespace, collection_name)
-
-        # TODO: extract parsing of cli content sorta-url thing and add better tests
+        log.debug('Querying %s for namespace=%s, name=%s', self.galaxy_context.server['url'],
+                  self.requirement_spec.namespace, self.requirement_spec.name)
 
-        # FIXME: Remove? We kind of need the actual Collection detail yet (ever?)
-        collection_detail_url = '{base_api_url}/v2/collections/{namespace}/{name}/'.format(base_api_url=api.base_api_url,
-                                                                                           namespace=urlquote(namespace),
-                                                                                           name=urlquote(collection_name))
-
-        log.debug('collection_detail_url: %s', collection_detail_url)
-
-        collection_detail_data = api.get_object(href=collection_detail_url)
+        # fail fast if no version matched this version spec recently
+        unsatisfiable_message = negative_cache.unsatisfiable(api.api_server,
+                                                             self.requirement_spec.namespace,
+                                                             self.requirement_spec.name,
+                                                             self.requirement_spec.version_spec,
+                                                             cache_config=self.galaxy_context.cache)
 
-        if not collection_detail_data:
-            raise exceptions.GalaxyClientError("- sorry, %s was not found on %s." % (self.requirement_spec.label,
-                                                                                     api.api_server))
-
-        versions_list_url = collection_detail_data.get('versions_url', None)
-
-        collection_is_deprecated = collection_detail_data.get('deprecated', False)
-
-        # TODO: if versions ends up with a 'related' we could follow it instead of specific
-        #       get_collection_version_list()
-        # example results
-        # [{
-        #   "version": "2.4.5",
-        #   "href": "/api/v2/collections/ansible/k8s/versions/2.4.5/",
-        #  },
-        #  {
-        #   "version": "1.2.3",
-        #   "href": "/api/v2/collections/ansible/k8s/versions/1.2.3/",
-        #  }]
-        log.debug('Getting collectionversions for %s.%s from %s',
-                  namespace, collection_name, versions_list_url)
-
-        collection_version_list_data = api.get_object(versions_list_url)
-
-        log.debug('collectionvertlist data:\n%s', collection_version_list_data)
-
-        if not collection_version_list_data:
-            raise exceptions.GalaxyClientError("- sorry, %s was not found on %s." %
-                                               (self.requirement_spec.label,
-                                                api.api_server))
+        if unsatisfiable_message:
+            log.debug('No version of %s matched %s recently, not looking again',
+                      self.requirement_spec.label, self.requirement_spec.version_spec)
+            raise exceptions.GalaxyCouldNotFindAnswerForRequirement(unsatisfiable_message,
+                                                                    requirement_spec=self.requirement_spec)
 
-        collection_version_strings = [a.get('version') for a in collection_version_list_data if a.get('version', None)]
+        collection_detail_data = get_collection_detail(api, self.requirement_spec)
 
-        # a Version() component of the CollectionVersion
-        collection_versions_versions = [semantic_version.Version(ver) for ver in collection_version_strings]
+        collection_versions = get_collection_versions(api, collection_detail_data, self.requirement_spec)
 
         # No match returns None
-        best_version = self.requirement_spec.version_spec.select(collection_versions_versions)
+        best_version = collection_versions.select(self.requirement_spec.version_spec)
 
         # Find the rest of the info for the collectionversion that is the best version
-        # linear search
-        best_collectionversion = next(
-            (cv for cv in collection_version_list_data
-             # build a Version of both to for full semver matching
-             if semantic_version.Version(cv['version']) == best_version),
-            {})
+        best_collectionversion = collection_versions.get(best_version, {}) if best_version else {}
 
         log.debug('best_collectionversion: %s', best_collectionversion)
 
@@ -138,39 +220,25 @@ class GalaxyUrlFetch(base.BaseFetch):
         if not best_collectionversion:
             log.debug('Unable to find a collection that matches the spec: %s from available versions: %s',
                       self.requirement_spec,
-                      [ver['version'] for ver in collection_version_list_data])
-            raise exceptions.GalaxyCouldNotFindAnswerForRequirement('Unable to find a collection that matches the spec: %s' %
-                                                                    self.requirement_spec.label,
-                                                                    requirement_spec=self.requirement_spec)
-
-        best_collectionversion_detail_data = api.get_object(href=best_collectionversion.get('href', None))
-
-        download_url = best_collectionversion_detail_data.get('download_url', None)
-
-        log.debug('download_url for %s.%s: %s', namespace, collection_name, download_url)
-
-        if not download_url:
-            raise exceptions.GalaxyError('no external_url info on the Repository object from %s' % self.requirement_spec.label)
+                      collection_versions)
+            unsatisfiable_message = 'Unable to find a collection that matches the spec: %s' % self.requirement_spec.label
 
-        artifact_detail = best_collectionversion_detail_data.get('artifact', {})
-        log.debug('artifact_detail: %s', artifact_detail)
+            negative_cache.remember_unsatisfiable(api.api_server,
+                                                  self.requirement_spec.namespace,
+                                                  self.requirement_spec.name,
+                                                  self.requirement_spec.version_spec,
+                                                  unsatisfiable_message,
+                                                  cache_config=self.galaxy_context.cache)
 
-        # collectionversion_metadata = best_collectionversion_detail_data.get('metadata', None)
-        # log.debug('collectionversion_metadata: %s', collectionversion_metadata)
-
-        # TODO: raise exceptions if API requests are empty
+            raise exceptions.GalaxyCouldNotFindAnswerForRequirement(unsatisfiable_message,
+                                                                    requirement_spec=self.requirement_spec)
 
-        results = {'content': {'galaxy_namespace': namespace,
-                               'repo_name': collection_name,
-                               'version': best_version},
-                   'artifact': {'sha256': artifact_detail['sha256'],
-                                'filename': artifact_detail['filename'],
-                                'size': artifact_detail['size']},
-                   'custom': {'download_url': download_url,
-                              'collection_is_deprecated': collection_is_deprecated},
-                   }
+        best_collectionversion_detail_data = api.get_object(href=best_collectionversion.get('href', None))
 
-        return results
+        return find_results_from_version_detail(self.requirement_spec,
+                                                best_version,
+                                                collection_detail_data,
+                                                best_collectionversion_detail_data)
 
     def fetch(self, find_results=None):
         find_results = find_results or {}
@@ -191,18 +259,31 @@ class GalaxyUrlFetch(base.BaseFetch):
         # for including in any error messages or logging for this fetch
         self.remote_resource = download_url
 
-        # can raise GalaxyDownloadError
-        repository_archive_path = download.fetch_url(download_url,
-                                                     validate_certs=self.validate_certs,
-                                                     filename=expected_filename)
+        expected_chksum = find_results['artifact'].get('sha256')
 
-        self.local_path = repository_archive_path
+        repository_archive_path = self._fetch_from_artifact_cache(expected_chksum)
 
-        log.debug('repository_archive_path=%s', repository_archive_path)
+        if not repository_archive_path:
+            # can raise GalaxyDownloadError
+            downloaded_artifact = download.fetch_artifact(download_url,
+                                                          validate_certs=self.validate_certs,
+                                                          filename=expected_filename,
+                                                          http_config=self.galaxy_context.http,
+                                                          cache_config=self.galaxy_context.cache,
+                                                          expected_sha256=expected_chksum,
+                                                          progress_callback=self._log_progress,
+                                                          spool_path=self.galaxy_context.spool_path)
 
-        # validate the sha256sum of the downloaded artifact against the expected value
-        expected_chksum = find_results['artifact'].get('sha256')
-        collection_artifact.validate_artifact(self.local_path,  expected_chksum)
+            repository_archive_path = downloaded_artifact.path
+            self.local_path = repository_archive_path
+
+            log.debug('repository_archive_path=%s', repository_archive_path)
+
+            # validate the sha256sum computed while downloading against the expected value
+            collection_artifact.validate_artifact(self.local_path, expected_chksum,
+                                                  actual_chksum=downloaded_artifact.sha256)
+
+            repository_archive_path = self._add_to_artifact_cache(expected_chksum) or repository_archive_path
 
         # TODO: This is indication that a fetcher is wrong abstraction. A fetch
         #       can resolve a name/spec, find metadata about the content including avail versions,
@@ -221,3 +302,57 @@ class GalaxyUrlFetch(base.BaseFetch):
         results['artifact'] = find_results['artifact']
 
         return results
+
+    def _log_progress(self, bytes_done, total_bytes, bytes_per_second):
+        log.info('Downloaded %s of %s bytes of %s (%.1f MB/s)', bytes_done, total_bytes or 'unknown',
+                 self.remote_resource, (bytes_per_second or 0) / (1024 * 1024))
+
+    def _fetch_from_artifact_cache(self, expected_chksum):
+        store = artifact_cache.from_cache_config(self.galaxy_context.cache)
+
+        if not store:
+            return None
+
+        cached_path = store.get(expected_chksum)
+
+        if not cached_path:
+            return None
+
+        # The store could have been corrupted or tampered with, so check it like a download
+        try:
+            collection_artifact.validate_artifact(cached_path, expected_chksum)
+        except exceptions.GalaxyArtifactChksumError as exc:
+            log.warning('Removing invalid artifact %s from the artifact cache: %s', cached_path, exc)
+            store.remove(expected_chksum)
+            return None
+
+        log.info('Using %s from the artifact cache for %s', cached_path, self.remote_resource)
+
+        self.local_path = cached_path
+        self.from_artifact_cache = True
+
+        return cached_path
+
+    def _add_to_artifact_cache(self, expected_chksum):
+        store = artifact_cache.from_cache_config(self.galaxy_context.cache)
+
+        if not store:
+            return None
+
+        cached_path = store.add(expected_chksum, self.local_path, move=True)
+
+        if not cached_path:
+            return None
+
+        self.local_path = cached_path
+        self.from_artifact_cache = True
+
+        return cached_path
+
+    def cleanup(self):
+        # artifacts in the artifact cache are kept for next time
+        if self.from_artifact_cache:
+            log.debug('Not removing %s, it is in the artifact cache', self.local_path)
+            return
+
+        return super(GalaxyUrlFetch, self).cleanup()
@@ -10,13 +10,16 @@ log = logging.getLogger(__name__)
 class RemoteUrlFetch(base.BaseFetch):
     fetch_method = 'remote_url'
 
-    def __init__(self, requirement_spec, validate_certs=True):
+    def __init__(self, requirement_spec, validate_certs=True, http_config=None, cache_config=None, spool_path=None):
         super(RemoteUrlFetch, self).__init__()
 
         self.requirement_spec = requirement_spec
         self.remote_url = requirement_spec.src
 
         self.validate_certs = validate_certs
+        self.http_config = http_config
+        self.cache_config = cache_config
+        self.spool_path = spool_path
         log.debug('Validate TLS certificates: %s', self.validate_certs)
 
         self.remote_resource = self.remote_url
@@ -37,7 +40,11 @@ class RemoteUrlFetch(base.BaseFetch):
         find_results = find_results or {}
 
         # NOTE: could move download.fetch_url here instead of splitting it
-        repository_archive_path = download.fetch_url(self.remote_url, validate_certs=self.validate_certs)
+        repository_archive_path = download.fetch_url(self.remote_url,
+                                                     validate_certs=self.validate_certs,
+                                                     http_config=self.http_config,
+                                                     cache_config=self.cache_config,
+                                                     spool_path=self.spool_path)
         self.local_path = repository_archive_path
 
         log.debug('repository_archive_path=%s', repository_archive_path)
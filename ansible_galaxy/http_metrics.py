@@ -0,0 +1,236 @@
+'''Metrics for each http request mazer makes, and a summary of them for the run
+
+Every Galaxy API request made by RestClient and every artifact download
+made by download.fetch_url() is recorded as a dict with:
+
+    method, url, endpoint, request_class ('metadata' or 'artifact'),
+    status, error, retries, cache ('hit', 'miss', 'revalidate' or None),
+    connect_time (dns, tcp and tls time for any new connections),
+    ttfb (time to the response headers), total_time, bytes_in, bytes_out
+
+Times are in seconds. bytes_in is the bytes of the response body received,
+before any Content-Encoding (gzip, etc) is decoded. Metadata responses served
+from the disk cache without a request are recorded with cache='hit' and no times.
+
+summary() aggregates the records for the run, and is what 'mazer --stats'
+prints.'''
+
+import json
+import logging
+import math
+import re
+import threading
+import time
+
+import six
+from six.moves.urllib.parse import urlsplit
+
+from ansible_galaxy import http_pool
+from ansible_galaxy import retry
+
+log = logging.getLogger(__name__)
+
+# Galaxy API paths with the namespace, name, and version replaced so that
+# requests can be grouped by endpoint.
+ENDPOINT_PATTERNS = [
+    (re.compile(r'^/api/v2/collections/[^/]+/[^/]+/versions/[^/]+/?$'),
+     '/api/v2/collections/{namespace}/{name}/versions/{version}/'),
+    (re.compile(r'^/api/v2/collections/[^/]+/[^/]+/versions/?$'),
+     '/api/v2/collections/{namespace}/{name}/versions/'),
+    (re.compile(r'^/api/v2/collections/[^/]+/[^/]+/?$'),
+     '/api/v2/collections/{namespace}/{name}/'),
+]
+
+_records = []
+_records_lock = threading.Lock()
+
+
+def endpoint(method, url, request_class=None):
+    '''The endpoint a request is grouped by in the summary
+
+    For ex, 'GET https://galaxy.ansible.com/api/v2/collections/{namespace}/{name}/'
+
+    Artifact downloads are grouped by host, 'GET https://galaxy.ansible.com/{artifact}'
+    '''
+    url_parts = urlsplit(url)
+    path = url_parts.path
+
+    if request_class == retry.ARTIFACT:
+        path = '/{artifact}'
+    else:
+        for pattern, template in ENDPOINT_PATTERNS:
+            if pattern.match(path):
+                path = template
+                break
+
+    return '%s %s://%s%s' % (method, url_parts.scheme, url_parts.netloc, path)
+
+
+def record(**fields):
+    '''Add a request record'''
+    request_record = {'method': 'GET',
+                      'url': None,
+                      'request_class': retry.METADATA,
+                      'status': None,
+                      'error': None,
+                      'retries': 0,
+                      'cache': None,
+                      'connect_time': None,
+                      'ttfb': None,
+                      'total_time': None,
+                      'bytes_in': 0,
+                      'bytes_out': 0}
+    request_record.update(fields)
+    request_record['endpoint'] = endpoint(request_record['method'], request_record['url'],
+                                          request_class=request_record['request_class'])
+
+    log.debug('http request metrics: %s', json.dumps(request_record, sort_keys=True))
+
+    with _records_lock:
+        _records.append(request_record)
+
+    return request_record
+
+
+def records():
+    with _records_lock:
+        return list(_records)
+
+
+def reset():
+    with _records_lock:
+        del _records[:]
+
+
+def response_bytes_in(response, default=0):
+    '''Return the number of bytes of the body of response read from the connection
+
+    Unlike len(response.content), that is before any Content-Encoding is decoded.
+    Returns default if it can not be found.'''
+    try:
+        bytes_in = response.raw.tell()
+    except (AttributeError, IOError, OSError, ValueError):
+        return default
+
+    # a tell() of 0 can mean nothing was counted, for ex, a fake raw response
+    if isinstance(bytes_in, six.integer_types) and bytes_in > 0:
+        return bytes_in
+
+    return default
+
+
+class RequestMetrics(object):
+    '''Collects the metrics for one request (including any retries) and records them when done()
+
+    Needs to be created, and done() called, in the thread that makes the request,
+    so the time spent making new connections can be found.'''
+
+    def __init__(self, method, url, request_class=retry.METADATA, bytes_out=0, cache=None):
+        self.method = method
+        self.url = url
+        self.request_class = request_class
+        self.bytes_out = bytes_out
+        self.cache = cache
+
+        self.attempts = 0
+        self.status = None
+        self.ttfb = None
+        self.bytes_in = 0
+
+        http_pool.reset_connect_time()
+        self.started_at = time.time()
+
+    def attempt(self):
+        self.attempts += 1
+
+    def got_response(self, response):
+        self.status = response.status_code
+        self.ttfb = response.elapsed.total_seconds()
+
+    def add_bytes_in(self, byte_count):
+        self.bytes_in += byte_count
+
+    def done(self, error=None):
+        return record(method=self.method,
+                      url=self.url,
+                      request_class=self.request_class,
+                      status=self.status,
+                      error=str(error) if error else None,
+                      retries=max(0, self.attempts - 1),
+                      cache=self.cache,
+                      connect_time=http_pool.connect_time(),
+                      ttfb=self.ttfb,
+                      total_time=time.time() - self.started_at,
+                      bytes_in=self.bytes_in,
+                      bytes_out=self.bytes_out)
+
+
+def percentile(values, pct):
+    '''The pct percentile of values using the nearest rank method, or None if there are no values'''
+    if not values:
+        return None
+
+    sorted_values = sorted(values)
+    rank = max(0, int(math.ceil(pct / 100.0 * len(sorted_values))) - 1)
+    return sorted_values[rank]
+
+
+def _round(value):
+    if value is None:
+        return None
+    return round(value, 4)
+
+
+def _timings(values):
+    values = [value for value in values if value is not None]
+    return {'p50': _round(percentile(values, 50)),
+            'p95': _round(percentile(values, 95)),
+            'max': _round(max(values) if values else None)}
+
+
+def _is_error(request_record):
+    return bool(request_record['error']) or (request_record['status'] or 0) >= 400
+
+
+def _requests_summary(request_records):
+    return {'requests': len(request_records),
+            'errors': len([r for r in request_records if _is_error(r)]),
+            'retries': sum([r['retries'] for r in request_records]),
+            'bytes_in': sum([r['bytes_in'] for r in request_records]),
+            'bytes_out': sum([r['bytes_out'] for r in request_records]),
+            'latency': _timings([r['total_time'] for r in request_records])}
+
+
+def summary(request_records=None):
+    '''Aggregate request records (all of the records for the run by default) into a summary dict'''
+    if request_records is None:
+        request_records = records()
+
+    # served from the disk cache, no request made
+    cache_hits = [r for r in request_records if r['cache'] == 'hit']
+    request_records = [r for r in request_records if r['cache'] != 'hit']
+
+    run_summary = _requests_summary(request_records)
+
+    run_summary['ttfb'] = _timings([r['ttfb'] for r in request_records])
+    # only requests that made a new connection
+    run_summary['connect_time'] = _timings([r['connect_time'] for r in request_records if r['connect_time']])
+
+    revalidations = [r for r in request_records if r['cache'] == 'revalidate']
+    run_summary['cache'] = {'hits': len(cache_hits),
+                            'misses': len([r for r in request_records if r['cache'] == 'miss']),
+                            'revalidated': len([r for r in revalidations if r['status'] == 304]),
+                            'changed': len([r for r in revalidations if r['status'] != 304])}
+
+    by_class = {}
+    by_endpoint = {}
+    for request_record in request_records:
+        by_class.setdefault(request_record['request_class'], []).append(request_record)
+        by_endpoint.setdefault(request_record['endpoint'], []).append(request_record)
+
+    run_summary['request_classes'] = dict([(request_class, _requests_summary(class_records))
+                                           for request_class, class_records in by_class.items()])
+    run_summary['endpoints'] = dict([(endpoint_name, _requests_summary(endpoint_records))
+                                     for endpoint_name, endpoint_records in by_endpoint.items()])
+
+    return run_summary
@@ -0,0 +1,215 @@
+'''A process wide registry of pooled http sessions
+
+mazer makes lots of requests to a small number of servers (the Galaxy API
+server and whatever CDN it redirects artifact downloads to). Creating a new
+requests.Session for each of them means every request pays for its own TCP
+and TLS handshakes.
+
+Instead, every RestClient and download.fetch_url() call gets its
+requests.Session from here. There is one session per server (scheme, host
+and port), each with a keep-alive connection pool, shared by everything
+in the process.
+
+The number of requests in flight at once, from any thread, is limited by
+request_slot(). Artifact downloads are also limited per server by
+download_slot().
+
+The time each thread spends making new connections (dns lookup, tcp
+connect, and tls handshake) is tracked for http_metrics, see connect_time().'''
+
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from six.moves.urllib.parse import urlsplit
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from ansible_galaxy import user_agent
+
+log = logging.getLogger(__name__)
+
+# The number of per-host connection pools each session will cache. Redirects can
+# point to other hosts, so this is more than 1.
+DEFAULT_POOL_CONNECTIONS = 10
+
+# The max number of connections to keep alive in each per-host connection pool.
+DEFAULT_POOL_MAXSIZE = 10
+
+# The max number of requests in flight at once for the whole process
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+
+# The max number of artifact downloads from the same server at once
+DEFAULT_MAX_CONCURRENT_DOWNLOADS_PER_HOST = 4
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_request_slots = None
+
+# session_key -> semaphore
+_download_slots = {}
+
+# per thread total seconds spent in connect() since reset_connect_time()
+_connect_times = threading.local()
+
+
+def reset_connect_time():
+    _connect_times.total = 0.0
+
+
+def connect_time():
+    '''The seconds this thread has spent making new connections since reset_connect_time()'''
+    return getattr(_connect_times, 'total', 0.0)
+
+
+def _add_connect_time(seconds):
+    _connect_times.total = connect_time() + seconds
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started_at = time.time()
+        try:
+            return super(TimedHTTPConnection, self).connect()
+        finally:
+            _add_connect_time(time.time() - started_at)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started_at = time.time()
+        try:
+            return super(TimedHTTPSConnection, self).connect()
+        finally:
+            _add_connect_time(time.time() - started_at)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    '''A HTTPAdapter whose connections track the time spent in connect()'''
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool,
+                                                   'https': TimedHTTPSConnectionPool}
+
+
+def session_key(url):
+    '''The key used to find the session to use for url
+
+    For ex, 'https://galaxy.ansible.com/api/v2/collections/' -> 'https://galaxy.ansible.com'
+    '''
+    url_parts = urlsplit(url)
+    return '%s://%s' % (url_parts.scheme.lower(), url_parts.netloc.lower())
+
+
+def build_session(pool_connections=None, pool_maxsize=None):
+    '''Create a requests.Session with a keep-alive pooling HTTPAdapter mounted'''
+    pool_connections = pool_connections or DEFAULT_POOL_CONNECTIONS
+    pool_maxsize = pool_maxsize or DEFAULT_POOL_MAXSIZE
+
+    session = requests.Session()
+    session.headers.update({'User-Agent': user_agent.user_agent()})
+
+    adapter = TimedHTTPAdapter(pool_connections=pool_connections,
+                               pool_maxsize=pool_maxsize)
+
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+def get_session(url, http_config=None):
+    '''Return the shared requests.Session to use for requests to url
+
+    http_config is the 'http' section of the mazer config. Its 'pool_connections'
+    and 'pool_maxsize' items are used if a new session needs to be created.'''
+
+    http_config = http_config or {}
+
+    key = session_key(url)
+
+    with _sessions_lock:
+        session = _sessions.get(key, None)
+
+        if session is None:
+            log.debug('Creating a new http session for %s', key)
+
+            session = build_session(pool_connections=http_config.get('pool_connections', None),
+                                    pool_maxsize=http_config.get('pool_maxsize', None))
+            _sessions[key] = session
+
+    return session
+
+
+def request_slot(http_config=None):
+    '''Return the process wide semaphore that limits the number of requests in flight
+
+    Use it as a context manager around making a request (and reading its response).
+
+    The limit is the 'max_concurrent_requests' item of http_config the first
+    time this is called.'''
+    global _request_slots
+
+    with _sessions_lock:
+        if _request_slots is None:
+            http_config = http_config or {}
+            max_concurrent_requests = http_config.get('max_concurrent_requests', None) or DEFAULT_MAX_CONCURRENT_REQUESTS
+
+            log.debug('Limiting http requests to %s at once', max_concurrent_requests)
+
+            _request_slots = threading.BoundedSemaphore(max_concurrent_requests)
+
+    return _request_slots
+
+
+def download_slot(url, http_config=None):
+    '''Return the process wide semaphore that limits the number of downloads in flight from the server of url
+
+    Use it as a context manager around downloading url, outside of request_slot().
+
+    The limit is the 'max_concurrent_downloads_per_host' item of http_config the
+    first time this is called for the server.'''
+    key = session_key(url)
+
+    with _sessions_lock:
+        slots = _download_slots.get(key, None)
+
+        if slots is None:
+            http_config = http_config or {}
+            max_downloads = http_config.get('max_concurrent_downloads_per_host', None) or \
+                DEFAULT_MAX_CONCURRENT_DOWNLOADS_PER_HOST
+
+            log.debug('Limiting downloads from %s to %s at once', key, max_downloads)
+
+            slots = threading.BoundedSemaphore(max_downloads)
+            _download_slots[key] = slots
+
+    return slots
+
+
+def close_all():
+    '''Close all of the shared sessions and forget about them'''
+    global _request_slots
+
+    with _sessions_lock:
+        for key, session in _sessions.items():
+            log.debug('Closing http session for %s', key)
+            session.close()
+
+        _sessions.clear()
+
+        _request_slots = None
+        _download_slots.clear()
@@ -147,11 +147,18 @@ def install(galaxy_context,
                                               force_overwrite=force_overwrite,
                                               editable=editable)
 
+    # Artifacts from Galaxy are recorded in the install info, so 'mazer list --pinned'
+    # can create a lockfile that installs them again without using the Galaxy API
+    download_url = fetch_results.get('custom', {}).get('download_url', None)
+    artifact = fetch_results.get('artifact', None)
+
     # A list of InstallationResults
     res = repository_archive.install(repo_archive_,
                                      repository_spec=repository_spec,
                                      destination_info=destination_info,
-                                     display_callback=display_callback)
+                                     display_callback=display_callback,
+                                     download_url=download_url,
+                                     artifact=dict(artifact) if download_url and artifact else None)
 
     just_installed_spec_and_results.append((repository_spec, res))
 
@@ -0,0 +1,168 @@
+'''Remember what the last install into a collections path was, to skip installing the same thing again
+
+After an install completes, a fingerprint is written to FINGERPRINT_FILENAME
+in the collections path. It has:
+
+    - 'inputs': a sha256 of what was asked for. The Galaxy collection spec
+      strings, the sha256 of the contents of the collections lockfile (or
+      install plan), the server url, and the options that change what gets
+      installed.
+    - 'installed': a sha256 of the installed tree. The namespace and
+      collection dirs, and the size and mtime of the MANIFEST.json and
+      meta/.galaxy_install_info of each collection.
+
+If the next install asks for the same inputs and the installed tree still
+matches, there is nothing to do. Checking only needs a few stat() calls, no
+Galaxy API requests, downloads, or archive reads.
+
+Installs of local files, urls, scm urls, or editable dirs are never fingerprinted,
+since what they point to can change without the spec string changing.'''
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from ansible_galaxy import exceptions
+from ansible_galaxy import repository_spec_parse
+from ansible_galaxy.collection_artifact_manifest import COLLECTION_MANIFEST_FILENAME
+from ansible_galaxy.config.defaults import COLLECTIONS_PYTHON_NAMESPACE
+from ansible_galaxy.models.repository_spec import FetchMethods
+from ansible_galaxy.utils import chksums
+
+log = logging.getLogger(__name__)
+
+FINGERPRINT_FILENAME = '.mazer_install_fingerprint.json'
+FINGERPRINT_FORMAT_VERSION = 1
+
+# the files of an installed collection that change whenever it is (re)installed
+INSTALLED_FILES = (COLLECTION_MANIFEST_FILENAME, os.path.join('meta', '.galaxy_install_info'))
+
+
+def _sha256(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def inputs_digest(galaxy_context, repository_spec_strings=None, input_file_paths=None, options=None):
+    '''Return a sha256 of the inputs of an install, or None if the install can not be fingerprinted
+
+    input_file_paths is a list of files (collections lockfile, install plan) whose
+    contents are inputs. options is a dict of any other options that change what
+    is installed.'''
+    repository_spec_strings = repository_spec_strings or []
+
+    for repository_spec_string in repository_spec_strings:
+        try:
+            fetch_method = repository_spec_parse.choose_repository_fetch_method(repository_spec_string)
+        except exceptions.GalaxyError:
+            return None
+
+        if fetch_method != FetchMethods.GALAXY_URL:
+            log.debug('Not fingerprinting the install of %s since it is a %s', repository_spec_string, fetch_method)
+            return None
+
+    input_file_digests = []
+    for input_file_path in input_file_paths or []:
+        try:
+            input_file_digests.append(chksums.sha256sum_from_path(input_file_path))
+        except EnvironmentError as exc:
+            log.debug('Not fingerprinting the install since %s could not be read: %s', input_file_path, exc)
+            return None
+
+    return _sha256({'server': galaxy_context.server.get('url', None),
+                    'collections_path': galaxy_context.collections_path,
+                    'repository_spec_strings': list(repository_spec_strings),
+                    'input_file_digests': input_file_digests,
+                    'options': options or {}})
+
+
+def installed_digest(collections_path):
+    '''Return a sha256 of the collections installed in collections_path, from stat() info only'''
+    ansible_collections_path = os.path.join(collections_path, COLLECTIONS_PYTHON_NAMESPACE)
+
+    entries = []
+
+    try:
+        namespaces = sorted(os.listdir(ansible_collections_path))
+    except OSError:
+        namespaces = []
+
+    for namespace in namespaces:
+        try:
+            names = sorted(os.listdir(os.path.join(ansible_collections_path, namespace)))
+        except OSError:
+            continue
+
+        for name in names:
+            collection_path = os.path.join(ansible_collections_path, namespace, name)
+
+            for installed_file in INSTALLED_FILES:
+                try:
+                    file_stat = os.stat(os.path.join(collection_path, installed_file))
+                    entries.append([namespace, name, installed_file, file_stat.st_size, file_stat.st_mtime])
+                except OSError:
+                    entries.append([namespace, name, installed_file, None, None])
+
+    return _sha256(entries)
+
+
+def _fingerprint_path(collections_path):
+    return os.path.join(collections_path, FINGERPRINT_FILENAME)
+
+
+def load(collections_path):
+    '''Return the fingerprint dict of the last install into collections_path, or None'''
+    try:
+        with open(_fingerprint_path(collections_path), 'r') as fingerprint_fo:
+            fingerprint = json.load(fingerprint_fo)
+    except (OSError, IOError):
+        return None
+    except ValueError as exc:
+        log.warning('Ignoring invalid install fingerprint in %s: %s', collections_path, exc)
+        return None
+
+    if not isinstance(fingerprint, dict) or fingerprint.get('format_version', None) != FINGERPRINT_FORMAT_VERSION:
+        return None
+
+    return fingerprint
+
+
+def matches(collections_path, inputs):
+    '''Return True if the last install into collections_path had the same inputs, and nothing installed has changed since'''
+    if not inputs:
+        return False
+
+    fingerprint = load(collections_path)
+
+    if not fingerprint or fingerprint.get('inputs', None) != inputs:
+        return False
+
+    if fingerprint.get('installed', None) != installed_digest(collections_path):
+        log.debug('The collections installed in %s changed since the last install', collections_path)
+        return False
+
+    return True
+
+
+def save(collections_path, inputs):
+    '''Record the fingerprint of a completed install of inputs into collections_path'''
+    if not os.path.isdir(collections_path):
+        return False
+
+    fingerprint = {'format_version': FINGERPRINT_FORMAT_VERSION,
+                   'inputs': inputs,
+                   'installed': installed_digest(collections_path)}
+
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=collections_path, prefix='.tmp-', suffix='.json')
+        with os.fdopen(fd, 'w') as tmp_fo:
+            json.dump(fingerprint, tmp_fo)
+
+        os.rename(tmp_path, _fingerprint_path(collections_path))
+    except (OSError, IOError) as exc:
+        log.warning('Unable to write the install fingerprint to %s: %s', collections_path, exc)
+        return False
+
+    log.debug('Wrote install fingerprint %s to %s', fingerprint, collections_path)
+    return True
@@ -0,0 +1,122 @@
+'''Save and load install plans
+
+An install plan is the result of resolving a set of requirements (see
+resolver.Resolver), written out as JSON so it can be applied later, or on
+other hosts, without resolving again. For example:
+
+    {
+        "format_version": 1,
+        "collections": [
+            {
+                "namespace": "alikins",
+                "name": "collection_inspect",
+                "version": "1.0.0",
+                "download_url": "https://galaxy.ansible.com/download/alikins-collection_inspect-1.0.0.tar.gz",
+                "filename": "alikins-collection_inspect-1.0.0.tar.gz",
+                "size": 12345,
+                "sha256": "1f6e...",
+                "deprecated": false,
+                "required_by": [{"collection": null, "version_spec": ">=1.0.0"}]
+            }
+        ]
+    }
+
+The collections are in install order (dependencies first). Each entry has
+everything needed to fetch the artifact and verify its sha256, the same as a
+pinned collections lockfile entry, so applying a plan needs no Galaxy API requests.'''
+
+import json
+import logging
+
+from ansible_galaxy import collections_lockfile
+from ansible_galaxy import exceptions
+from ansible_galaxy.models.install_plan import InstallPlan, InstallPlanItem
+from ansible_galaxy.models.repository_spec import FetchMethods
+from ansible_galaxy.models.requirement import Requirement, RequirementOps
+from ansible_galaxy.models.requirement_spec import RequirementSpec
+
+log = logging.getLogger(__name__)
+
+PLAN_FORMAT_VERSION = 1
+
+PLAN_ENTRY_REQUIRED_KEYS = ('namespace', 'name') + collections_lockfile.PINNED_ENTRY_REQUIRED_KEYS
+
+
+def item_to_dict(install_plan_item):
+    find_results = install_plan_item.find_results
+    artifact = find_results.get('artifact', None) or {}
+    custom = find_results.get('custom', None) or {}
+    requirement_spec = install_plan_item.requirement.requirement_spec
+
+    required_by = [{'collection': str(req.repository_spec) if req.repository_spec else None,
+                    'version_spec': str(req.requirement_spec.version_spec)}
+                   for req in install_plan_item.required_by]
+
+    return {'namespace': requirement_spec.namespace,
+            'name': requirement_spec.name,
+            'version': str(install_plan_item.version),
+            'download_url': custom.get('download_url', None),
+            'filename': artifact.get('filename', None),
+            'size': artifact.get('size', None),
+            'sha256': artifact.get('sha256', None),
+            'deprecated': custom.get('collection_is_deprecated', False),
+            'required_by': required_by}
+
+
+def to_dict(install_plan):
+    return {'format_version': PLAN_FORMAT_VERSION,
+            'collections': [item_to_dict(item) for item in install_plan.items]}
+
+
+def item_from_dict(entry):
+    missing_keys = [key for key in PLAN_ENTRY_REQUIRED_KEYS if not entry.get(key, None)]
+
+    if missing_keys:
+        raise exceptions.GalaxyClientError('The install plan entry %s is missing: %s' %
+                                           (entry, ', '.join(missing_keys)))
+
+    requirement_spec = RequirementSpec(namespace=entry['namespace'],
+                                       name=entry['name'],
+                                       version_spec='==%s' % entry['version'],
+                                       fetch_method=FetchMethods.GALAXY_URL)
+
+    requirement = Requirement(requirement_spec=requirement_spec,
+                              op=RequirementOps.EQ,
+                              repository_spec=None)
+
+    find_results = collections_lockfile.pinned_find_results(requirement_spec, entry)
+    find_results['custom']['collection_is_deprecated'] = entry.get('deprecated', False)
+
+    return InstallPlanItem(requirement=requirement,
+                           find_results=find_results)
+
+
+def from_dict(data):
+    if not isinstance(data, dict):
+        raise exceptions.GalaxyClientError('An install plan should be a JSON object, not: %s' % data)
+
+    format_version = data.get('format_version', None)
+
+    if format_version != PLAN_FORMAT_VERSION:
+        raise exceptions.GalaxyClientError('Unsupported install plan format_version "%s", expected %s' %
+                                           (format_version, PLAN_FORMAT_VERSION))
+
+    return InstallPlan(items=[item_from_dict(entry) for entry in data.get('collections', None) or []])
+
+
+def load(data_or_file_object):
+    try:
+        if hasattr(data_or_file_object, 'read'):
+            data = json.load(data_or_file_object)
+        else:
+            data = json.loads(data_or_file_object)
+    except ValueError as exc:
+        log.exception(exc)
+        raise exceptions.GalaxyClientError('Error parsing install plan: %s' % exc)
+
+    return from_dict(data)
+
+
+def save(install_plan, file_object):
+    json.dump(to_dict(install_plan), file_object, indent=4, sort_keys=True)
+    file_object.write('\n')
@@ -25,18 +25,35 @@ __metaclass__ = type
 
 import logging
 
+from ansible_galaxy.utils import concurrency
+
 log = logging.getLogger(__name__)
 
 
 class GalaxyContext(object):
     ''' Keeps global galaxy info '''
 
-    def __init__(self, collections_path=None, server=None):
+    def __init__(self, collections_path=None, server=None, http=None, cache=None, spool_path=None):
         self.server = server or {'url': None,
                                  'ignore_certs': False,
                                  'api_key': None}
         self.collections_path = collections_path
 
+        # http client settings (connection pool sizes, etc)
+        self.http = http or {}
+
+        # persistent cache settings. If there is no cache 'path', nothing is cached on disk
+        self.cache = cache or {}
+
+        # where artifacts are downloaded to. If None, the system temp dir (and downloads can not be resumed)
+        self.spool_path = spool_path
+
+        # Galaxy API responses by url, so each is only requested once per run
+        self.api_memo = concurrency.CoalescingMemo()
+
+        # VersionIndex of each collection by versions url, so each is only built once per run
+        self.version_indexes = concurrency.CoalescingMemo()
+
     def __repr__(self):
-        return 'GalaxyContext(collections_path=%s, server=%s)' % \
-            (self.collections_path, self.server)
+        return 'GalaxyContext(collections_path=%s, server=%s, http=%s, cache=%s, spool_path=%s)' % \
+            (self.collections_path, self.server, self.http, self.cache, self.spool_path)
@@ -18,16 +18,28 @@ class InstallInfo(object):
     version = attr.ib(type=semantic_version.Version, default=None,
                       converter=convert_string_to_semver)
 
+    # Where the collection artifact was downloaded from, and its 'filename', 'size'
+    # and 'sha256', if it was installed from Galaxy
+    download_url = attr.ib(default=None)
+    artifact = attr.ib(default=None)
+
     @classmethod
-    def from_version_date(cls, version, install_datetime):
+    def from_version_date(cls, version, install_datetime, download_url=None, artifact=None):
         inst = cls(version=version,
                    install_date_iso=install_datetime,
-                   install_date=install_datetime.strftime('%c'))
+                   install_date=install_datetime.strftime('%c'),
+                   download_url=download_url,
+                   artifact=artifact)
         return inst
 
     def to_dict_version_strings(self):
         data = attr.asdict(self)
 
+        # only installs from Galaxy have artifact info
+        for key in ('download_url', 'artifact'):
+            if data.get(key, None) is None:
+                del data[key]
+
         if data.get('verison', '') is None:
             del data['version']
 
@@ -0,0 +1,41 @@
+import logging
+
+import attr
+
+from ansible_galaxy.models.requirement import Requirement
+
+log = logging.getLogger(__name__)
+
+
+@attr.s(frozen=True)
+class InstallPlanItem(object):
+    '''A collection version picked by the resolver
+
+    requirement is pinned to exactly the picked version (ie, '==1.2.3').
+    find_results is what GalaxyUrlFetch.find() would have returned for it.
+    required_by is the list of Requirements the picked version satisfies.'''
+
+    requirement = attr.ib(type=Requirement,
+                          validator=attr.validators.instance_of(Requirement))
+    find_results = attr.ib(factory=dict, cmp=False)
+    required_by = attr.ib(factory=list, cmp=False)
+
+    @property
+    def label(self):
+        return '%s.%s' % (self.requirement.requirement_spec.namespace,
+                          self.requirement.requirement_spec.name)
+
+    @property
+    def version(self):
+        return self.find_results.get('content', {}).get('version', None)
+
+
+@attr.s(frozen=True)
+class InstallPlan(object):
+    '''Every collection version needed to satisfy a set of requirements, dependencies first'''
+
+    items = attr.ib(factory=list, validator=attr.validators.instance_of(list))
+
+    @property
+    def requirements(self):
+        return [item.requirement for item in self.items]
@@ -16,6 +16,9 @@ class Repository(object):
     # ie, a collection or role-as-collections-requirement.yml
     requirements = attr.ib(factory=tuple)
 
+    # The InstallInfo from the .galaxy_install_info of an installed repository
+    install_info = attr.ib(default=None, cmp=False)
+
     @property
     def label(self):
         return self.repository_spec.label
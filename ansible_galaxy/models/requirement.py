@@ -69,6 +69,16 @@ class Requirement(object):
 
     scope = attr.ib(default=RequirementScopes.INSTALL)
 
+    # The other repos that have the requirement, if it was combined from the
+    # requirements of several repos (see requirements.coalesce())
+    also_required_by = attr.ib(factory=tuple, cmp=False)
+
+    @property
+    def required_by(self):
+        '''The list of every RepositorySpec that has the requirement'''
+        return [repository_spec for repository_spec in (self.repository_spec,) + tuple(self.also_required_by)
+                if repository_spec]
+
     def __str__(self):
         return '{repo_spec}->{req_spec_label}{op}{req_spec_version}'.format(repo_spec=str(self.repository_spec),
                                                                             req_spec_label=str(self.requirement_spec.label),
@@ -0,0 +1,183 @@
+'''Remember collections that could not be found on a Galaxy server
+
+When a collection does not exist on a server (a 404 or empty Collection
+detail), or none of its versions match a version spec, the failure is
+remembered for 'negative_ttl' seconds (DEFAULT_NEGATIVE_TTL if not
+configured, 0 to not remember failures at all). Until then, looking up
+the same collection (or the same version spec) fails right away without
+any requests to the server. This keeps a broken requirement, or a
+dependency that is missing on the server, from being looked up again in
+every dependency round and on every run.
+
+Failures are remembered per server url and collection namespace.name in
+memory for the process, and on disk in the 'negative' dir of the cache
+'path' if there is one.
+
+Use forget() when a collection may have shown up (for ex, after it is
+published), clear() to forget everything remembered in memory, or
+clear_disk() to also forget everything remembered on disk ('mazer cache clear').'''
+
+import logging
+import os
+import threading
+import time
+
+from ansible_galaxy import disk_cache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_NEGATIVE_TTL = 300
+
+# {key: {'missing': message or None, 'unsatisfiable': {version_spec: message}, 'expires_at': time}}
+_items = {}
+_items_lock = threading.Lock()
+
+
+def _key(server_url, namespace, name):
+    return '%s %s.%s' % (server_url, namespace, name)
+
+
+def _ttl(cache_config):
+    ttl = (cache_config or {}).get('negative_ttl', None)
+
+    if ttl is None:
+        return DEFAULT_NEGATIVE_TTL
+
+    return ttl
+
+
+def _disk_cache(cache_config):
+    cache_config = cache_config or {}
+
+    if not cache_config.get('path', None):
+        return None
+
+    return disk_cache.DiskCache(os.path.join(cache_config['path'], 'negative'))
+
+
+def _get_item(key, cache_config):
+    with _items_lock:
+        item = _items.get(key, None)
+
+    if item is None:
+        negative_disk_cache = _disk_cache(cache_config)
+
+        if negative_disk_cache:
+            item = negative_disk_cache.get(key)
+
+    if not item:
+        return None
+
+    if item['expires_at'] < time.time():
+        log.debug('Remembered lookup failures for %s expired', key)
+        with _items_lock:
+            _items.pop(key, None)
+        return None
+
+    with _items_lock:
+        _items[key] = item
+
+    return item
+
+
+def _update_item(key, cache_config, missing=None, version_spec=None, message=None):
+    ttl = _ttl(cache_config)
+
+    if not ttl:
+        return 0
+
+    item = _get_item(key, cache_config) or {'missing': None,
+                                            'unsatisfiable': {},
+                                            'expires_at': time.time() + ttl}
+
+    # the other entries of the item expire when they would have anyway
+    item = {'missing': message if missing else item['missing'],
+            'unsatisfiable': dict(item['unsatisfiable']),
+            'expires_at': item['expires_at']}
+
+    if version_spec is not None:
+        item['unsatisfiable'][str(version_spec)] = message
+
+    if missing:
+        item['expires_at'] = time.time() + ttl
+
+    log.debug('Remembering lookup failure for %s for %s seconds: %s', key, ttl, message)
+
+    with _items_lock:
+        _items[key] = item
+
+    negative_disk_cache = _disk_cache(cache_config)
+
+    if negative_disk_cache:
+        negative_disk_cache.set(key, item)
+
+    return ttl
+
+
+def missing(server_url, namespace, name, cache_config=None):
+    '''Return the remembered error message if the collection was not found on server_url, or None'''
+    item = _get_item(_key(server_url, namespace, name), cache_config)
+
+    if not item:
+        return None
+
+    return item['missing']
+
+
+def unsatisfiable(server_url, namespace, name, version_spec, cache_config=None):
+    '''Return the remembered error message if no version of the collection matched version_spec, or None'''
+    item = _get_item(_key(server_url, namespace, name), cache_config)
+
+    if not item:
+        return None
+
+    return item['unsatisfiable'].get(str(version_spec), None)
+
+
+def remember_missing(server_url, namespace, name, message, cache_config=None):
+    '''Remember the collection was not found on server_url
+
+    Returns the number of seconds it will be remembered for.'''
+    return _update_item(_key(server_url, namespace, name), cache_config,
+                        missing=True, message=message)
+
+
+def remember_unsatisfiable(server_url, namespace, name, version_spec, message, cache_config=None):
+    '''Remember no version of the collection on server_url matched version_spec
+
+    Returns the number of seconds it will be remembered for.'''
+    return _update_item(_key(server_url, namespace, name), cache_config,
+                        version_spec=version_spec, message=message)
+
+
+def forget(server_url, namespace, name, cache_config=None):
+    '''Forget any failures remembered for the collection on server_url'''
+    key = _key(server_url, namespace, name)
+
+    with _items_lock:
+        _items.pop(key, None)
+
+    negative_disk_cache = _disk_cache(cache_config)
+
+    if negative_disk_cache:
+        negative_disk_cache.delete(key)
+
+
+def clear():
+    '''Forget all the failures remembered in memory'''
+    with _items_lock:
+        _items.clear()
+
+
+def clear_disk(cache_config=None):
+    '''Forget all the failures remembered, in memory and on disk
+
+    Returns the number of failures removed from disk.'''
+    clear()
+
+    negative_disk_cache = _disk_cache(cache_config)
+
+    if not negative_disk_cache:
+        return 0
+
+    return negative_disk_cache.prune(0)
@@ -0,0 +1,176 @@
+'''Remember where artifact download urls redirect to
+
+Galaxy download_urls redirect to a CDN. Once a download has been
+redirected, the final url is remembered for as long as the redirect
+responses say they can be cached, so later downloads of the same url
+go straight to the CDN host without the redirect hop.
+
+A redirect is cacheable for:
+
+    - its Cache-Control 'max-age' (less its 'Age')
+    - or until its 'Expires' date
+    - or DEFAULT_PERMANENT_REDIRECT_TTL seconds if it is a 301 or 308 with neither
+
+A 'no-store' or 'no-cache' Cache-Control, or a temporary (302, 303, 307)
+redirect with neither header, is not cached. A chain of redirects is cached
+for the shortest lifetime of any of them.
+
+Targets are remembered in memory for the process, and on disk in the
+'redirects' dir of the cache 'path' if there is one.'''
+
+import email.utils
+import logging
+import os
+import threading
+import time
+
+from ansible_galaxy import disk_cache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PERMANENT_REDIRECT_TTL = 86400
+
+PERMANENT_REDIRECT_STATUS_CODES = frozenset([301, 308])
+
+# {url: {'target': target_url, 'expires_at': time}}
+_targets = {}
+_targets_lock = threading.Lock()
+
+
+def parse_cache_control(value):
+    '''Return a dict of the directives in a Cache-Control header value
+
+    Directives without a value, like 'no-store', have a value of None.'''
+    directives = {}
+
+    for directive in (value or '').split(','):
+        directive = directive.strip()
+
+        if not directive:
+            continue
+
+        name, dummy, directive_value = directive.partition('=')
+        directives[name.strip().lower()] = directive_value.strip().strip('"') or None
+
+    return directives
+
+
+def _http_date(value):
+    date_tuple = email.utils.parsedate_tz(value or '')
+
+    if date_tuple is None:
+        return None
+
+    return email.utils.mktime_tz(date_tuple)
+
+
+def redirect_lifetime(response):
+    '''The number of seconds the redirect response can be cached for, 0 if it can not be'''
+    cache_control = parse_cache_control(response.headers.get('Cache-Control', None))
+
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+
+    if cache_control.get('max-age', None) is not None:
+        try:
+            max_age = int(cache_control['max-age'])
+            age = int(response.headers.get('Age', 0))
+        except ValueError:
+            return 0
+
+        return max(0, max_age - age)
+
+    expires = response.headers.get('Expires', None)
+
+    if expires is not None:
+        expires_at = _http_date(expires)
+
+        # invalid dates, like '0', mean already expired
+        if expires_at is None:
+            return 0
+
+        response_date = _http_date(response.headers.get('Date', None)) or time.time()
+        return max(0, expires_at - response_date)
+
+    if response.status_code in PERMANENT_REDIRECT_STATUS_CODES:
+        return DEFAULT_PERMANENT_REDIRECT_TTL
+
+    return 0
+
+
+def _disk_cache(cache_config):
+    cache_config = cache_config or {}
+
+    if not cache_config.get('path', None):
+        return None
+
+    return disk_cache.DiskCache(os.path.join(cache_config['path'], 'redirects'))
+
+
+def get(url, cache_config=None):
+    '''Return the remembered redirect target for url, or None'''
+    with _targets_lock:
+        item = _targets.get(url, None)
+
+    if item is None:
+        redirect_disk_cache = _disk_cache(cache_config)
+
+        if redirect_disk_cache:
+            item = redirect_disk_cache.get(url)
+
+    if not item:
+        return None
+
+    if item['expires_at'] < time.time():
+        log.debug('Cached redirect target for %s expired', url)
+        forget(url, cache_config=cache_config)
+        return None
+
+    with _targets_lock:
+        _targets[url] = item
+
+    return item['target']
+
+
+def remember(url, response, cache_config=None):
+    '''Remember where url redirected to if response was redirected and the redirects are cacheable
+
+    Returns the number of seconds the target will be remembered for.'''
+    if not response.history:
+        return 0
+
+    lifetime = min([redirect_lifetime(redirect) for redirect in response.history])
+
+    if not lifetime:
+        return 0
+
+    item = {'target': response.url,
+            'expires_at': time.time() + lifetime}
+
+    log.debug('Remembering redirect target %s for %s for %s seconds', response.url, url, lifetime)
+
+    with _targets_lock:
+        _targets[url] = item
+
+    redirect_disk_cache = _disk_cache(cache_config)
+
+    if redirect_disk_cache:
+        redirect_disk_cache.set(url, item)
+
+    return lifetime
+
+
+def forget(url, cache_config=None):
+    with _targets_lock:
+        _targets.pop(url, None)
+
+    redirect_disk_cache = _disk_cache(cache_config)
+
+    if redirect_disk_cache:
+        redirect_disk_cache.delete(url)
+
+
+def clear():
+    '''Forget all the redirect targets remembered in memory'''
+    with _targets_lock:
+        _targets.clear()
@@ -180,7 +180,8 @@ def load_from_dir(content_dir, namespace_path, namespace, name, installed=True):
     repository = Repository(repository_spec=repository_spec,
                             path=path_name,
                             installed=installed,
-                            requirements=requirements_list,)
+                            requirements=requirements_list,
+                            install_info=install_info_data or None)
 
     log.debug('Loaded repository %s from %s', repository.repository_spec.label, path_name)
 
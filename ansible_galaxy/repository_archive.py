@@ -137,7 +137,8 @@ def load_archive(archive_path, repository_spec=None):
     return repository_archive_
 
 
-def install(repository_archive, repository_spec, destination_info, display_callback):
+def install(repository_archive, repository_spec, destination_info, display_callback,
+            download_url=None, artifact=None):
     log.debug('installing/extracting repo archive %s to destination %s', repository_archive, destination_info)
 
     # An editable install is a symlink to existing dir, so nothing to extract
@@ -155,7 +156,9 @@ def install(repository_archive, repository_spec, destination_info, display_callb
     install_datetime = datetime.datetime.utcnow()
 
     install_info_ = InstallInfo.from_version_date(repository_spec.version,
-                                                  install_datetime=install_datetime)
+                                                  install_datetime=install_datetime,
+                                                  download_url=download_url,
+                                                  artifact=artifact)
 
     # TODO: this save will need to be moved to a step later. after validating install?
     # The to_dict_version_strings is to convert the un-yaml-able semantic_version.Version to a string
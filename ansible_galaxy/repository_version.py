@@ -4,6 +4,7 @@ import semantic_version
 
 from ansible_galaxy import exceptions
 from ansible_galaxy.utils.version import normalize_version_string
+from ansible_galaxy.version_index import VersionIndex
 
 log = logging.getLogger(__name__)
 
@@ -71,9 +72,11 @@ def get_repository_version(repository_data, requirement_spec, repository_version
             (requirement_spec.label or 'content', available_versions)
         raise exceptions.GalaxyError(msg)
 
-    semver_available_versions = [semantic_version.Version(ver) for ver in available_versions]
+    # index the original version strings by their normalized version, each is only parsed once
+    version_index = VersionIndex([(normalized, orig) for normalized, orig in norm_to_orig_map
+                                  if normalized in available_versions])
 
-    latest_version = requirement_spec.version_spec.select(semver_available_versions)
+    latest_version = version_index.select(requirement_spec.version_spec)
     if latest_version is None:
         # TODO: how do we msg 'couldn't find the version you specified
         #       in actual version tags or ones we made up without the leading v'
@@ -83,17 +86,14 @@ def get_repository_version(repository_data, requirement_spec, repository_version
 
     # if we get here, 'version' is in available_normalized_versions
     # return the exact match version since it was available
-    latest_version_str = str(latest_version)
+    # there can be multiple original versions for the same normalized version ('1.0.0' and 'v1.0.0')
+    unnormal_versions = version_index.get_all(latest_version)
 
-    # have to use list of tuples here since we can have multiple identical keys with different values
-    norm_to_orig = [x for x in norm_to_orig_map if x[0] == latest_version_str]
-
-    if len(norm_to_orig) > 1:
-        unnormal_versions = [ver_alias[1] for ver_alias in norm_to_orig]
+    if len(unnormal_versions) > 1:
         raise exceptions.GalaxyClientError('There are ambiguous and contradicting version numbers (%s) that match version spec "%s"' %
                                            (', '.join(unnormal_versions), str(requirement_spec.version_spec)))
 
-    orig_version_str = norm_to_orig[0][1]
+    orig_version_str = unnormal_versions[0]
 
     log.debug('%s requested ver: %s, matched: %s, using real ver: %s ', requirement_spec.label, requirement_spec.version_spec, latest_version, orig_version_str)
 
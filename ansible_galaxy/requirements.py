@@ -1,5 +1,8 @@
 import logging
 
+import attr
+
+from ansible_galaxy.models.repository_spec import FetchMethods
 from ansible_galaxy.models.requirement import Requirement, RequirementOps, RequirementScopes
 from ansible_galaxy.models.requirement_spec import RequirementSpec
 from ansible_galaxy.repository_spec_parse import spec_data_from_string
@@ -29,3 +32,93 @@ def from_dependencies_dict(dependencies_dict, namespace_override=None, editable=
         reqs.append(requirement)
 
     return reqs
+
+
+def _coalesce_key(requirement):
+    requirement_spec = requirement.requirement_spec
+
+    # Any version of a collection from Galaxy can meet a Galaxy requirement, but
+    # other requirements are only the same if they are from the same place
+    if requirement_spec.fetch_method == FetchMethods.GALAXY_URL:
+        return (requirement_spec.namespace, requirement_spec.name, requirement_spec.fetch_method)
+
+    return (requirement_spec.namespace, requirement_spec.name, requirement_spec.fetch_method,
+            requirement_spec.src, requirement_spec.scm)
+
+
+def coalesce(requirements_list):
+    '''Combine the requirements on the same collection into one requirement per collection
+
+    Galaxy requirements on the same namespace.name are combined into one whose
+    version_spec is the intersection of all of their version_specs (ie, '>=1.0.0'
+    and '<2.0.0' becomes '>=1.0.0,<2.0.0'), and whose also_required_by is the
+    repository_spec of the rest of them. Other requirements are only combined
+    with requirements from the same src.
+
+    Requirements with a version_spec that has a '||' are not combined, since
+    joining its clauses with ',' would change what it means. Each of them is
+    returned on its own (and the resolver meets all of them at once anyway).
+
+    Returns a list of (requirement, required_by) tuples, in the order each collection
+    was first seen. required_by is the list of the requirements that were combined.'''
+
+    required_by = {}
+    keys = []
+    # Requirement equality ignores the version_spec, so include it to find dupes
+    seen = set()
+
+    for requirement in requirements_list:
+        key = _coalesce_key(requirement)
+
+        if key not in required_by:
+            keys.append(key)
+            required_by[key] = []
+
+        seen_key = (key, requirement, str(requirement.requirement_spec.version_spec))
+        if seen_key in seen:
+            continue
+
+        seen.add(seen_key)
+        required_by[key].append(requirement)
+
+    coalesced = []
+
+    for key in keys:
+        key_requirements = required_by[key]
+        first_requirement = key_requirements[0]
+
+        if len(key_requirements) == 1:
+            coalesced.append((first_requirement, key_requirements))
+            continue
+
+        if any(['||' in str(requirement.requirement_spec.version_spec) for requirement in key_requirements]):
+            log.debug('Not coalescing %s, there is a "||" in a version spec', key_requirements)
+            coalesced.extend([(requirement, [requirement]) for requirement in key_requirements])
+            continue
+
+        version_spec_clauses = []
+        for requirement in key_requirements:
+            for clause in str(requirement.requirement_spec.version_spec).split(','):
+                if clause != '*' and clause not in version_spec_clauses:
+                    version_spec_clauses.append(clause)
+
+        version_akas = [req.requirement_spec.version_aka for req in key_requirements if req.requirement_spec.version_aka]
+
+        requirement_spec = attr.evolve(first_requirement.requirement_spec,
+                                       version_spec=','.join(version_spec_clauses) or '*',
+                                       version_aka=version_akas[0] if version_akas else None)
+
+        also_required_by = []
+        for requirement in key_requirements[1:]:
+            for repository_spec in requirement.required_by:
+                if repository_spec not in first_requirement.required_by and repository_spec not in also_required_by:
+                    also_required_by.append(repository_spec)
+
+        log.debug('Coalesced %s into %s', key_requirements, requirement_spec.label)
+
+        coalesced.append((attr.evolve(first_requirement,
+                                      requirement_spec=requirement_spec,
+                                      also_required_by=tuple(first_requirement.also_required_by) + tuple(also_required_by)),
+                          key_requirements))
+
+    return coalesced
@@ -0,0 +1,456 @@
+'''Resolve requirements, and all of their dependencies, to exact collection versions
+
+The resolver builds the whole requirement graph from the Galaxy API
+collection version metadata (each CollectionVersion detail includes the
+'dependencies' of that version) before anything is downloaded or installed.
+
+Versions are picked newest first. When a requirement can not be met by the
+versions picked so far, the resolver backtracks to the most recent choice
+that still has other candidate versions and tries the next one. If every
+combination fails (or there were more than max_backtracks backtracks), a
+GalaxyCouldNotFindAnswerForRequirement is raised and nothing is installed.
+
+The metadata of the newest matching version of every collection in the
+dependency graph is requested up front, each level of the graph at once (see
+Resolver.prefetch()), so deep or wide dependency graphs do not need one
+request at a time.
+
+The result is an InstallPlan with one item per collection, dependencies
+first, each with the find() results needed to fetch it. Since the
+GalaxyAPI responses are remembered for the run, the later find() of each
+picked version does not make any more requests.
+
+Only Galaxy requirements (FetchMethods.GALAXY_URL) are resolved. Dependencies
+already met by an installed collection are not resolved (unless force_overwrite).'''
+
+import logging
+
+from ansible_galaxy import exceptions
+from ansible_galaxy import installed_repository_db
+from ansible_galaxy import negative_cache
+from ansible_galaxy import requirements
+from ansible_galaxy.fetch import galaxy_url
+from ansible_galaxy.models.install_plan import InstallPlan, InstallPlanItem
+from ansible_galaxy.models.repository_spec import FetchMethods, RepositorySpec
+from ansible_galaxy.models.requirement import Requirement, RequirementOps
+from ansible_galaxy.models.requirement_spec import RequirementSpec
+from ansible_galaxy.rest_api import GalaxyAPI
+from ansible_galaxy.utils import concurrency
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BACKTRACKS = 1000
+
+# These mean the Galaxy API could not be asked, not that it said no, so
+# there is no point trying any other versions.
+FATAL_ERRORS = (exceptions.GalaxyClientAPIConnectionError,
+                exceptions.GalaxyRestAPIClientRequestError,
+                exceptions.GalaxyRestServerError)
+
+# Galaxy API error responses that mean try again later, not no
+FATAL_STATUS_CODES = (429,)
+
+
+def is_fatal_error(exc):
+    '''Return True if exc means the Galaxy API could not answer, so it should not be cached or worked around'''
+    if isinstance(exc, FATAL_ERRORS):
+        return True
+
+    response = getattr(exc, 'response', None)
+    if isinstance(exc, exceptions.GalaxyRestAPIError) and response is not None:
+        return response.status_code >= 500 or response.status_code in FATAL_STATUS_CODES
+
+    return False
+
+
+def requirement_label(requirement):
+    '''The namespace.name of the collection requirement is for'''
+    return '%s.%s' % (requirement.requirement_spec.namespace,
+                      requirement.requirement_spec.name)
+
+
+def is_resolvable(requirement):
+    return requirement.requirement_spec.fetch_method == FetchMethods.GALAXY_URL
+
+
+def _required_by_blurb(requirement):
+    if requirement.required_by:
+        return '%s (required by %s)' % (requirement.requirement_spec.label,
+                                        ', '.join([str(repository_spec) for repository_spec in requirement.required_by]))
+    return requirement.requirement_spec.label
+
+
+class Resolver(object):
+    def __init__(self, galaxy_context, no_deps=False, force_overwrite=False, max_backtracks=None):
+        self.galaxy_context = galaxy_context
+        self.no_deps = no_deps
+        self.force_overwrite = force_overwrite
+        self.max_backtracks = max_backtracks or DEFAULT_MAX_BACKTRACKS
+
+        self.api = GalaxyAPI(galaxy_context)
+        self.irdb = installed_repository_db.InstalledRepositoryDatabase(galaxy_context)
+
+        # label -> (collection_detail_data, VersionIndex of CollectionVersion dicts)
+        #          or the GalaxyError from trying to get them
+        self._collections = {}
+
+        # (label, version) -> (find_results, [dependency Requirements])
+        #                     or the GalaxyError from trying to get them
+        self._candidate_info = {}
+
+        # requirement -> True if something installed already provides it
+        self._installed = {}
+
+    def is_installed(self, requirement):
+        if self.force_overwrite:
+            return False
+
+        if requirement not in self._installed:
+            self._installed[requirement] = any(True for dummy in self.irdb.by_requirement(requirement))
+
+        return self._installed[requirement]
+
+    def remembered_unsatisfiable(self, requirement):
+        '''Return the remembered message if no version of the collection matched the version spec of requirement recently
+
+        See negative_cache.'''
+        requirement_spec = requirement.requirement_spec
+
+        return negative_cache.unsatisfiable(self.api.api_server, requirement_spec.namespace, requirement_spec.name,
+                                            requirement_spec.version_spec, cache_config=self.galaxy_context.cache)
+
+    def remember_unsatisfiable(self, requirement, version_specs):
+        '''Remember each of version_specs that no version of the collection requirement is for matches'''
+        requirement_spec = requirement.requirement_spec
+        version_index = self.candidates(requirement)
+
+        for version_spec in version_specs:
+            if version_index.select(version_spec) is not None:
+                # only the combination of the version specs can not be met
+                continue
+
+            message = 'Unable to find a collection that matches the spec: %s,%s' % (requirement_label(requirement), version_spec)
+
+            negative_cache.remember_unsatisfiable(self.api.api_server, requirement_spec.namespace, requirement_spec.name,
+                                                  version_spec, message, cache_config=self.galaxy_context.cache)
+
+    def candidates(self, requirement):
+        '''Return the VersionIndex of the collection requirement is for
+
+        Can raise a GalaxyError if the collection can not be found.'''
+        label = requirement_label(requirement)
+
+        if label not in self._collections:
+            try:
+                collection_detail_data = galaxy_url.get_collection_detail(self.api, requirement.requirement_spec)
+                collection_versions = galaxy_url.get_collection_versions(self.api, collection_detail_data,
+                                                                         requirement.requirement_spec)
+                self._collections[label] = (collection_detail_data, collection_versions)
+            except exceptions.GalaxyError as exc:
+                if is_fatal_error(exc):
+                    raise
+                log.debug('Unable to get the versions of %s: %s', label, exc)
+                self._collections[label] = exc
+
+        result = self._collections[label]
+
+        if isinstance(result, exceptions.GalaxyError):
+            raise result
+
+        return result[1]
+
+    def candidate_info(self, requirement, version, collectionversion):
+        '''Return the find() results and the dependency Requirements of a candidate version
+
+        Can raise a GalaxyError if the version detail can not be found or is not installable.'''
+        label = requirement_label(requirement)
+        key = (label, version)
+
+        if key not in self._candidate_info:
+            try:
+                self._candidate_info[key] = self._load_candidate_info(requirement, version, collectionversion)
+            except exceptions.GalaxyError as exc:
+                if is_fatal_error(exc):
+                    raise
+                log.debug('Unable to use %s,%s: %s', label, version, exc)
+                self._candidate_info[key] = exc
+
+        result = self._candidate_info[key]
+
+        if isinstance(result, exceptions.GalaxyError):
+            raise result
+
+        return result
+
+    def _load_candidate_info(self, requirement, version, collectionversion):
+        requirement_spec = requirement.requirement_spec
+        collection_detail_data = self._collections[requirement_label(requirement)][0]
+
+        collectionversion_detail_data = self.api.get_object(href=collectionversion.get('href', None)) or {}
+
+        find_results = galaxy_url.find_results_from_version_detail(requirement_spec,
+                                                                   version,
+                                                                   collection_detail_data,
+                                                                   collectionversion_detail_data)
+
+        if self.no_deps:
+            return find_results, []
+
+        dependencies = find_results['content']['dependencies']
+
+        repository_spec = RepositorySpec(namespace=requirement_spec.namespace,
+                                         name=requirement_spec.name,
+                                         version=version,
+                                         fetch_method=FetchMethods.GALAXY_URL)
+
+        dependency_requirements = requirements.from_dependencies_dict(dependencies, repository_spec=repository_spec)
+
+        return find_results, dependency_requirements
+
+    def _needed(self, dependency_requirements):
+        return [req for req in dependency_requirements
+                if is_resolvable(req) and not self.is_installed(req)]
+
+    def _prefetch_one(self, requirement):
+        '''Get the versions of the collection, and the detail of the newest version matching requirement
+
+        Returns the dependencies of that version that are needed, or [] if
+        anything could not be found. Errors are left for resolve() to run into,
+        except the ones that mean the Galaxy API could not answer (see is_fatal_error()).'''
+        if self.remembered_unsatisfiable(requirement):
+            return []
+
+        try:
+            for version, cv in self.candidates(requirement).iter_matching(requirement.requirement_spec.version_spec):
+                dummy, dependency_requirements = self.candidate_info(requirement, version, cv)
+                return self._needed(dependency_requirements)
+        except exceptions.GalaxyError as exc:
+            if is_fatal_error(exc):
+                raise
+            log.debug('Unable to prefetch %s: %s', requirement_label(requirement), exc)
+
+        return []
+
+    def prefetch(self, requirements_list):
+        '''Get the metadata resolve() is likely to need for requirements_list, up to 'max_concurrent_requests' at once
+
+        The newest matching version of each collection is assumed, and its declared
+        dependencies are prefetched too, one level of the dependency graph at a time.
+        So every collection at the same depth is requested at once, instead of one
+        collection at a time as resolve() gets to them. Anything resolve() ends up
+        needing that was not guessed here (ie, older versions after backtracking)
+        is just requested when it is needed.'''
+        seen_labels = set()
+        frontier = requirements_list
+
+        while frontier:
+            level = []
+            for requirement in frontier:
+                label = requirement_label(requirement)
+
+                if label in seen_labels:
+                    continue
+
+                seen_labels.add(label)
+                level.append(requirement)
+
+            if not level:
+                break
+
+            log.debug('Prefetching %s', [requirement_label(requirement) for requirement in level])
+
+            needed_lists = concurrency.map_bounded(self._prefetch_one, level, max_workers=self.api.max_concurrent_requests)
+
+            frontier = [requirement for needed in needed_lists for requirement in needed]
+
+    def resolve(self, requirements_list):
+        '''Pick a version of every collection needed for requirements_list and return an InstallPlan
+
+        Raises GalaxyCouldNotFindAnswerForRequirement if there is no set of versions
+        that meets every requirement.'''
+
+        root_requirements = [req for req in requirements_list if is_resolvable(req)]
+
+        log.debug('Resolving requirements: %s', root_requirements)
+
+        self.prefetch(root_requirements)
+
+        # label -> (Version, CollectionVersion dict, the Requirement it was picked for)
+        decisions = {}
+        # requirements that still need to be checked, in breadth first order
+        pending = list(root_requirements)
+        # (label, untried candidates, decisions and pending before the pick) for
+        # each pick that can be revisited
+        choice_points = []
+        backtracks = 0
+
+        while pending:
+            requirement = pending[0]
+            rest = pending[1:]
+            label = requirement_label(requirement)
+            version_spec = requirement.requirement_spec.version_spec
+
+            if label in decisions:
+                picked_version, dummy, picked_for = decisions[label]
+
+                if version_spec.match(picked_version):
+                    pending = rest
+                    continue
+
+                failure = (requirement,
+                           '%s conflicts with %s,%s picked for %s' %
+                           (_required_by_blurb(requirement), label, picked_version, _required_by_blurb(picked_for)))
+            else:
+                # any other pending requirements for the same collection have to be met too
+                same_collection = [req for req in pending if requirement_label(req) == label]
+                version_specs = [req.requirement_spec.version_spec for req in same_collection]
+
+                unsatisfiable_messages = [message for message in map(self.remembered_unsatisfiable, same_collection)
+                                          if message]
+
+                if unsatisfiable_messages:
+                    log.debug('No version of %s matched %s recently, not looking again', label, version_specs)
+                    candidates = []
+                    failure = (requirement, '%s: %s' % (_required_by_blurb(requirement), unsatisfiable_messages[0]))
+                else:
+                    try:
+                        candidates = self.candidates(requirement).matching(*version_specs)
+                    except exceptions.GalaxyError as exc:
+                        if is_fatal_error(exc):
+                            raise
+                        candidates = []
+                        failure = (requirement, '%s: %s' % (_required_by_blurb(requirement), exc))
+                    else:
+                        failure = (requirement,
+                                   'no version of %s matches %s' %
+                                   (label, ', '.join(sorted(set([str(spec) for spec in version_specs])))))
+
+                        if not candidates:
+                            self.remember_unsatisfiable(requirement, version_specs)
+
+                picked = self._pick(requirement, candidates, decisions, rest)
+
+                if picked:
+                    decisions, pending, remaining = picked
+                    choice_points.append((requirement, remaining, decisions, rest))
+                    continue
+
+            log.debug('Unable to meet requirement %s: %s', requirement, failure[1])
+
+            # backtrack to the latest choice that has other candidates left
+            decisions = None
+            while choice_points:
+                backtracks += 1
+                if backtracks > self.max_backtracks:
+                    log.debug('Giving up after %s backtracks', self.max_backtracks)
+                    break
+
+                choice_requirement, remaining, choice_decisions, choice_rest = choice_points.pop()
+
+                choice_label = requirement_label(choice_requirement)
+                previous_decisions = dict(choice_decisions)
+                previous_decisions.pop(choice_label, None)
+
+                picked = self._pick(choice_requirement, remaining, previous_decisions, choice_rest)
+
+                if picked:
+                    decisions, pending, remaining = picked
+                    log.debug('Backtracked to %s,%s', choice_label, decisions[choice_label][0])
+                    choice_points.append((choice_requirement, remaining, decisions, choice_rest))
+                    break
+
+            if decisions is None:
+                failed_requirement, reason = failure
+                raise exceptions.GalaxyCouldNotFindAnswerForRequirement(
+                    'Unable to find a set of collection versions that meets all of the requirements, %s' % reason,
+                    requirement_spec=failed_requirement.requirement_spec)
+
+        return self._build_plan(root_requirements, decisions)
+
+    def _pick(self, requirement, candidates, decisions, rest):
+        '''Pick the first usable candidate
+
+        Returns (the new decisions, the new pending list, the untried candidates)
+        or None if none of the candidates are usable.'''
+        label = requirement_label(requirement)
+
+        for index, (version, cv) in enumerate(candidates):
+            try:
+                dummy, dependency_requirements = self.candidate_info(requirement, version, cv)
+            except exceptions.GalaxyError as exc:
+                if is_fatal_error(exc):
+                    raise
+                continue
+
+            log.debug('Trying %s,%s for %s', label, version, requirement)
+
+            new_decisions = dict(decisions)
+            new_decisions[label] = (version, cv, requirement)
+
+            return new_decisions, rest + self._needed(dependency_requirements), candidates[index + 1:]
+
+        return None
+
+    def _build_plan(self, root_requirements, decisions):
+        required_by = {}
+        dependency_labels = {}
+
+        for requirement in root_requirements:
+            required_by.setdefault(requirement_label(requirement), []).append(requirement)
+
+        for label in sorted(decisions):
+            version, cv, picked_for = decisions[label]
+            dummy, dependency_requirements = self.candidate_info(picked_for, version, cv)
+
+            needed = self._needed(dependency_requirements)
+            dependency_labels[label] = sorted(set([requirement_label(req) for req in needed]))
+
+            for requirement in needed:
+                required_by.setdefault(requirement_label(requirement), []).append(requirement)
+
+        # dependencies before the collections that need them
+        ordered_labels = []
+        visited = set()
+
+        def visit(label):
+            if label in visited:
+                return
+            visited.add(label)
+
+            for dependency_label in dependency_labels.get(label, []):
+                visit(dependency_label)
+
+            ordered_labels.append(label)
+
+        for label in sorted(decisions):
+            visit(label)
+
+        items = []
+        for label in ordered_labels:
+            version, cv, picked_for = decisions[label]
+            find_results, dummy = self.candidate_info(picked_for, version, cv)
+
+            label_required_by = required_by.get(label, [picked_for])
+
+            pinned_spec = RequirementSpec(namespace=picked_for.requirement_spec.namespace,
+                                          name=picked_for.requirement_spec.name,
+                                          version_spec='==%s' % version,
+                                          fetch_method=FetchMethods.GALAXY_URL)
+
+            pinned_requirement = Requirement(requirement_spec=pinned_spec,
+                                             op=RequirementOps.EQ,
+                                             repository_spec=label_required_by[0].repository_spec)
+
+            log.debug('Resolved %s to %s,%s', [str(req) for req in label_required_by], label, version)
+
+            items.append(InstallPlanItem(requirement=pinned_requirement,
+                                         find_results=find_results,
+                                         required_by=label_required_by))
+
+        return InstallPlan(items=items)
+
+
+def resolve(galaxy_context, requirements_list, no_deps=False, force_overwrite=False):
+    '''Resolve the Galaxy requirements in requirements_list and their dependencies to an InstallPlan'''
+    resolver = Resolver(galaxy_context, no_deps=no_deps, force_overwrite=force_overwrite)
+    return resolver.resolve(requirements_list)
@@ -23,20 +23,47 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 import logging
+import math
+import os
+import threading
 import uuid
 
 import requests
 
 from six.moves.urllib.parse import quote as urlquote
+from six.moves.urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+from ansible_galaxy import disk_cache
 from ansible_galaxy import exceptions
+from ansible_galaxy import http_metrics
+from ansible_galaxy import http_pool
+from ansible_galaxy import retry
 from ansible_galaxy import user_agent
+from ansible_galaxy.utils import concurrency
 
 log = logging.getLogger(__name__)
 http_log = logging.getLogger('%s.(http).(general)' % __name__)
 request_log = logging.getLogger('%s.(http).(request)' % __name__)
 response_log = logging.getLogger('%s.(http).(response)' % __name__)
 
+# The 'current_version' of each galaxy server api, by server url. Shared by
+# all GalaxyAPI instances so the server is only probed once per process.
+# _server_api_versions_lock only guards the dicts. The disk cache read and
+# the probe of each server are done holding the lock for that server url, so
+# one slow server does not hold up the others.
+_server_api_versions = {}
+_server_api_version_locks = {}
+_server_api_versions_lock = threading.Lock()
+
+# seconds a server api version cached on disk is trusted if 'cache' config does not say
+DEFAULT_API_VERSION_TTL = 86400
+
+# seconds a cached api response is used without asking the server if it changed
+DEFAULT_METADATA_MAX_AGE = 300
+
+# max total bytes of cached api responses
+DEFAULT_METADATA_MAX_SIZE = 50 * 1024 * 1024
+
 
 def response_slug(response):
     # The slug we use to identify a request by method, url and request id
@@ -45,6 +72,66 @@ def response_slug(response):
     return slug
 
 
+def page_urls_from_page(data):
+    '''Build the urls of all the pages after the 'data' page of a paginated response
+
+    This works for the page number style of pagination used by the galaxy api.
+    For ex, if 'data' is a full page of 10 results with a 'count' of 35 and a 'next' of
+    'http://galaxy.invalid/api/v2/collections/ns/n/versions/?page=2', the urls
+    for pages 2, 3 and 4 are returned.
+
+    If the urls can not be derived (no 'count', no 'page' in the 'next' url, etc),
+    an empty list is returned and the pages need to be followed via 'next' one at a time.'''
+
+    next_url = data.get('next', None)
+    count = data.get('count', None)
+    page_size = len(data.get('results', []))
+
+    if not next_url or not isinstance(count, int) or not page_size:
+        return []
+
+    url_parts = urlsplit(next_url)
+    query_params = parse_qsl(url_parts.query, keep_blank_values=True)
+
+    page_numbers = [value for key, value in query_params if key == 'page']
+
+    if len(page_numbers) != 1:
+        return []
+
+    try:
+        next_page_number = int(page_numbers[0])
+    except ValueError:
+        return []
+
+    # the page 'data' is the page before next_page
+    last_page_number = int(math.ceil(count / float(page_size)))
+
+    page_urls = []
+    for page_number in range(next_page_number, last_page_number + 1):
+        page_query_params = [(key, str(page_number) if key == 'page' else value) for key, value in query_params]
+        page_urls.append(urlunsplit((url_parts.scheme, url_parts.netloc, url_parts.path,
+                                     urlencode(page_query_params), url_parts.fragment)))
+
+    return page_urls
+
+
+def clear_server_api_versions():
+    '''Forget the server api versions found by any GalaxyAPI in this process'''
+    with _server_api_versions_lock:
+        _server_api_versions.clear()
+        _server_api_version_locks.clear()
+
+
+def _known_server_api_version(api_server):
+    with _server_api_versions_lock:
+        return _server_api_versions.get(api_server, None)
+
+
+def _server_api_version_lock(api_server):
+    with _server_api_versions_lock:
+        return _server_api_version_locks.setdefault(api_server, threading.Lock())
+
+
 def g_connect(method):
     ''' wrapper to lazily initialize connection info to galaxy '''
 
@@ -52,7 +139,7 @@ def g_connect(method):
         if not self.initialized:
             log.debug("Initial connection to galaxy_server: %s", self._api_server)
 
-            server_version = self._get_server_api_version()
+            server_version = self.get_server_api_version()
 
             if server_version not in self.SUPPORTED_VERSIONS:
                 raise exceptions.GalaxyClientError("Unsupported Galaxy server API version: %s" % server_version)
@@ -68,6 +155,13 @@ class RestClient(object):
     Mostly wrapper around requests.Session and Session.request(), but with
     more logging.
 
+    The requests.Session used is the process wide shared session for the
+    server being requested (see http_pool), so connections are reused
+    across RestClient instances.
+
+    GET requests that fail for transient reasons are retried with the
+    'metadata' retry policy (see retry).
+
     Also sets the mazer http user agent, and adds 'Request-ID' headers.
     '''
 
@@ -80,17 +174,20 @@ class RestClient(object):
 
         log.debug('User Agent: %s', self.user_agent)
 
-        self.session = requests.Session()
-        self.session.headers.update({'User-Agent': self.user_agent})
-
         self.log = logging.getLogger(__name__ + '.' + self.__class__.__name__)
 
+        self.retry_policy = retry.RetryPolicy.from_http_config(self.http_context.get('http', None),
+                                                               retry.METADATA)
+
     @property
     def validate_certs(self):
         return not self.http_context['server']['ignore_certs']
 
+    def get_session(self, url):
+        return http_pool.get_session(url, http_config=self.http_context.get('http', None))
+
     # TODO: raise an API/net specific exception?
-    def mkrequest(self, url, args=None, headers=None, http_method=None):
+    def mkrequest(self, url, args=None, headers=None, http_method=None, cache_status=None):
         '''Make an REST-y http request to Galaxy APIs
 
         Requests that fail and raise exceptions are caught and
@@ -100,6 +197,13 @@ class RestClient(object):
         Note: This only raises exceptions if the request fails (a connection failure,
               an SSL failure, DNS failure etc. If the server responds at all, this
               will not fail. Those cases are handled in GalaxyAPI.
+
+              Connection errors, timeouts, and 429 or 5xx responses to GET requests
+              are retried before giving up.
+
+        The timing, size, and status of the request are recorded in http_metrics.
+        cache_status is the metadata cache status of the request ('miss' or 'revalidate')
+        to include in its metrics.
         '''
         http_method = http_method or 'GET'
 
@@ -118,13 +222,32 @@ class RestClient(object):
 
         # request_log.debug('%s headers=%s', pre_request_slug, request_headers)
 
+        session = self.get_session(url)
+
+        request_metrics = http_metrics.RequestMetrics(http_method, url,
+                                                      request_class=retry.METADATA,
+                                                      bytes_out=len(args or b''),
+                                                      cache=cache_status)
+
+        def _request():
+            request_metrics.attempt()
+
+            # Only hold a request slot while making the request, not while waiting to retry
+            with http_pool.request_slot(self.http_context.get('http', None)):
+                return session.request(http_method, url, data=args, headers=request_headers,
+                                       verify=self.validate_certs)
+
         try:
 
             # Make the actual request
-            resp = self.session.request(http_method, url, data=args, headers=request_headers,
-                                        verify=self.validate_certs)
+            if http_method in retry.RETRY_METHODS:
+                resp = self.retry_policy.call(_request, pre_request_slug)
+            else:
+                resp = _request()
 
         except requests.exceptions.ConnectionError as connection_exc:
+            request_metrics.done(error=connection_exc)
+
             self.log.debug('Connection exception on %s', pre_request_slug)
             self.log.exception("%s: %s %r", pre_request_slug, connection_exc, connection_exc)
 
@@ -134,12 +257,18 @@ class RestClient(object):
                                                             response=connection_exc.response)
 
         except requests.exceptions.RequestException as request_exc:
+            request_metrics.done(error=request_exc)
+
             self.log.debug('Exception on %s', pre_request_slug)
             self.log.exception("%s: %s", pre_request_slug, request_exc)
 
             raise exceptions.GalaxyRestAPIClientRequestError(request_exc,
                                                              response=request_exc.response)
 
+        request_metrics.got_response(resp)
+        request_metrics.add_bytes_in(http_metrics.response_bytes_in(resp, default=len(resp.content)))
+        request_metrics.done()
+
         # Log info about the request/response for debug
         log.debug('resp.request: %s', resp.request)
         log.debug('resp: %s', resp)
@@ -190,12 +319,16 @@ class GalaxyAPI(object):
         # set the API server
         self._api_server = galaxy_context.server['url']
 
-        self.rest_client = RestClient(http_context={'server': galaxy_context.server})
+        self.rest_client = RestClient(http_context={'server': galaxy_context.server,
+                                                    'http': galaxy_context.http})
         # self.log.debug('Validate TLS certificates for %s: %s', self._api_server, self._validate_certs)
 
         # This is set to true by the g_connect wrapper once there is there has been a server api check
         self.initialized = False
 
+        # None if there is no cache 'path' configured
+        self.metadata_cache = self._metadata_disk_cache()
+
     @property
     def api_server(self):
         return self._api_server
@@ -204,6 +337,69 @@ class GalaxyAPI(object):
     def base_api_url(self):
         return '%s/api' % self._api_server
 
+    @property
+    def max_concurrent_requests(self):
+        return self.galaxy_context.http.get('max_concurrent_requests', None) or http_pool.DEFAULT_MAX_CONCURRENT_REQUESTS
+
+    def _api_version_disk_cache(self):
+        cache_config = self.galaxy_context.cache
+
+        if not cache_config.get('path', None):
+            return None
+
+        return disk_cache.DiskCache(os.path.join(cache_config['path'], 'api_versions'),
+                                    max_age=cache_config.get('api_version_ttl', DEFAULT_API_VERSION_TTL))
+
+    def _metadata_disk_cache(self):
+        cache_config = self.galaxy_context.cache
+
+        if not cache_config.get('path', None):
+            return None
+
+        return disk_cache.DiskCache(os.path.join(cache_config['path'], 'metadata'),
+                                    max_age=cache_config.get('metadata_max_age', DEFAULT_METADATA_MAX_AGE),
+                                    max_size=cache_config.get('metadata_max_size', DEFAULT_METADATA_MAX_SIZE))
+
+    def get_server_api_version(self):
+        '''Return the Galaxy API current version, probing the server only if needed
+
+        The version is cached per server url for the life of the process, and
+        if there is a cache 'path' configured, on disk for 'api_version_ttl' seconds.
+        Only supported versions are cached.'''
+
+        server_version = _known_server_api_version(self._api_server)
+
+        if server_version:
+            return server_version
+
+        with _server_api_version_lock(self._api_server):
+            # another thread may have found it while this one waited for the lock
+            server_version = _known_server_api_version(self._api_server)
+
+            if server_version:
+                return server_version
+
+            api_version_cache = self._api_version_disk_cache()
+
+            if api_version_cache:
+                server_version = api_version_cache.get(self._api_server)
+
+                if server_version:
+                    self.log.debug('Using cached server API version "%s" for %s from %s',
+                                   server_version, self._api_server, api_version_cache.path)
+
+            if not server_version:
+                server_version = self._get_server_api_version()
+
+                if api_version_cache and server_version in self.SUPPORTED_VERSIONS:
+                    api_version_cache.set(self._api_server, server_version)
+
+            if server_version in self.SUPPORTED_VERSIONS:
+                with _server_api_versions_lock:
+                    _server_api_versions[self._api_server] = server_version
+
+        return server_version
+
     def _get_server_api_version(self):
         """
         Fetches the Galaxy API current version to ensure
@@ -241,27 +437,62 @@ class GalaxyAPI(object):
         if 'next' not in data and 'count' not in data:
             return data
 
-        results = data['results']
+        results = list(data['results'])
 
         done = (data.get('next', None) is None)
 
+        page_urls = []
+        if not done:
+            page_urls = page_urls_from_page(data)
+
+        # Fetch all the remaining pages at once if we know their urls
+        if len(page_urls) > 1:
+            max_workers = self.max_concurrent_requests
+
+            log.debug('Fetching %s pages starting at %s with %s workers', len(page_urls), page_urls[0], max_workers)
+
+            pages_data = concurrency.map_bounded(self._get_computed_page, page_urls, max_workers=max_workers)
+
+            for page_data in pages_data:
+                # The pages after a page that failed are not used, the 'next' of the last
+                # page that worked is followed below instead.
+                if page_data is None:
+                    break
+
+                results += page_data.get('results', [])
+                data = page_data
+
+            # If more results showed up while we were fetching, the last page will have a 'next'
+            # to follow below.
+            done = (data.get('next', None) is None)
+
         while not done:
             next_url = data['next']
 
             log.debug('next_url: %s', next_url)
 
             # Basic get_object() but sans automatic paging
-            resp = self.rest_client.mkrequest(url=next_url, http_method='GET')
-            next_data = self.handle_response(resp)
+            data = self._get_data(next_url)
 
             # can assume all the rest of the links will also be 'page' dicts
             # if no results, default to a empty list
-            results += next_data.get('results', [])
+            results += data.get('results', [])
 
-            done = (next_data.get('next', None) is None)
+            done = (data.get('next', None) is None)
 
         return results
 
+    def _get_computed_page(self, page_url):
+        '''_get_data() a page url from page_urls_from_page(), or return None if the server responded with an error
+
+        The page may not exist (anymore), for ex, if there were fewer results
+        than 'count' by the time it was requested.'''
+        try:
+            return self._get_data(page_url)
+        except (exceptions.GalaxyRestAPIError, exceptions.GalaxyRestServerError) as exc:
+            log.debug('Unable to get the page %s, following "next" from the page before it instead: %s', page_url, exc)
+            return None
+
     @g_connect
     def get_collection_detail(self, namespace, name):
         namespace = urlquote(namespace)
@@ -326,24 +557,84 @@ class GalaxyAPI(object):
 
         return self.handle_response(resp)
 
+    def _get_data(self, url):
+        '''GET url and return the deserialized response, without any paging
+
+        If there is a metadata cache, a cached response younger than 'metadata_max_age'
+        is returned without making a request. Older cached responses are revalidated
+        with a conditional request (If-None-Match / If-Modified-Since), and reused
+        if the server responds '304 Not Modified'.'''
+
+        if not self.metadata_cache:
+            resp = self.rest_client.mkrequest(url=url, http_method='GET')
+            return self.handle_response(resp)
+
+        cached_item = self.metadata_cache.get_item(url)
+
+        request_headers = {}
+
+        cache_status = 'miss'
+
+        if cached_item:
+            if not self.metadata_cache.is_expired(cached_item):
+                self.log.debug('Using cached response for %s', url)
+                http_metrics.record(url=url, cache='hit')
+                return cached_item['value']['data']
+
+            cache_status = 'revalidate'
+
+            if cached_item['value'].get('etag', None):
+                request_headers['If-None-Match'] = cached_item['value']['etag']
+            if cached_item['value'].get('last_modified', None):
+                request_headers['If-Modified-Since'] = cached_item['value']['last_modified']
+
+        resp = self.rest_client.mkrequest(url=url, http_method='GET', headers=request_headers,
+                                          cache_status=cache_status)
+
+        if cached_item and resp.status_code == 304:
+            self.log.debug('Cached response for %s was not modified', url)
+
+            # store it again to reset its age
+            self.metadata_cache.set(url, cached_item['value'])
+            return cached_item['value']['data']
+
+        data = self.handle_response(resp)
+
+        if 'no-store' not in resp.headers.get('Cache-Control', ''):
+            self.metadata_cache.set(url, {'data': data,
+                                          'etag': resp.headers.get('ETag', None),
+                                          'last_modified': resp.headers.get('Last-Modified', None)})
+
+        return data
+
     # _get_object is not decorated with @g_connect, so we can call it
     # directly from _get_server_api_version() without recursion
     def _get_object(self, href=None):
         '''Get a full url and return deserialized results'''
 
-        # responses = self.rest_client.mkrequest():
-        # return self.handle_responses(responses)
-        resp = self.rest_client.mkrequest(url=href, http_method='GET')
-
-        data = self.handle_response(resp)
+        data = self._get_data(href)
 
         # determine if the data is paginated and if so, page it and accumulate results
         return self.paginate(data)
 
     @g_connect
     def get_object(self, href=None):
-        '''Get a full url and return deserialized results'''
-        return self._get_object(href=href)
+        '''Get a full url and return deserialized results
+
+        The results are remembered for the life of the galaxy_context, so each
+        url is only requested once no matter how many GalaxyAPI instances or
+        threads ask for it. The results are shared, so treat them as read only.'''
+        return self.galaxy_context.api_memo.get(href, lambda: self._get_object(href=href))
+
+    def get_objects(self, hrefs):
+        '''Get a list of full urls concurrently and return a list of their deserialized results
+
+        The results are in the same order as hrefs. Up to 'max_concurrent_requests'
+        of the urls are requested at once. If any request fails, the first
+        exception (in hrefs order) is raised.'''
+        return concurrency.map_bounded(lambda href: self.get_object(href=href),
+                                       hrefs,
+                                       max_workers=self.max_concurrent_requests)
 
     @g_connect
     def publish_file(self, form, publish_api_key):
@@ -0,0 +1,220 @@
+'''Retrying http requests that fail for transient reasons
+
+A request is retried if it fails with a connection error or timeout, or
+if the server responds with a 429 or one of the 5xx statuses that usually
+mean 'try again later'.
+
+Each retry waits for a capped exponential backoff with full jitter, or for
+the time the server asked for in a 'Retry-After' header. A request is not
+retried once its total time (including the waits) would be more than the
+policy 'max_elapsed' seconds.
+
+There are separate policies for the 'metadata' requests made to the Galaxy
+API and for 'artifact' downloads, configured in the 'retries' item of the
+'http' section of the mazer config.'''
+
+import collections
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import requests
+
+log = logging.getLogger(__name__)
+
+METADATA = 'metadata'
+ARTIFACT = 'artifact'
+
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+# Only requests that are safe to repeat are retried
+RETRY_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+
+DEFAULT_POLICIES = {
+    METADATA: {'max_retries': 3,
+               'backoff_factor': 0.5,
+               'max_backoff': 10,
+               'max_elapsed': 60},
+    ARTIFACT: {'max_retries': 5,
+               'backoff_factor': 1,
+               'max_backoff': 30,
+               'max_elapsed': 300},
+}
+
+# The number of retries of each request class, for the whole process
+_retry_counts = collections.Counter()
+_retry_counts_lock = threading.Lock()
+
+
+def retry_counts():
+    '''Return a dict of the number of retries made for each request class'''
+    with _retry_counts_lock:
+        return dict(_retry_counts)
+
+
+def reset_retry_counts():
+    with _retry_counts_lock:
+        _retry_counts.clear()
+
+
+def _count_retry(request_class):
+    with _retry_counts_lock:
+        _retry_counts[request_class] += 1
+
+
+def parse_retry_after(value):
+    '''Return the number of seconds to wait from a Retry-After header value or None
+
+    The value can be a number of seconds or a http date.'''
+    if not value:
+        return None
+
+    value = value.strip()
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    date_tuple = email.utils.parsedate_tz(value)
+
+    if date_tuple is None:
+        return None
+
+    return max(0.0, email.utils.mktime_tz(date_tuple) - time.time())
+
+
+def retry_after_from_response(response):
+    if response is None:
+        return None
+    return parse_retry_after(response.headers.get('Retry-After', None))
+
+
+def is_retryable_response(response):
+    return isinstance(response, requests.Response) and response.status_code in RETRY_STATUS_CODES
+
+
+def is_retryable_error(exc):
+    '''Return True if exc is a requests exception for a transient error'''
+    # a bad cert will still be bad next time
+    if isinstance(exc, requests.exceptions.SSLError):
+        return False
+
+    if isinstance(exc, RETRY_EXCEPTIONS):
+        return True
+
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return is_retryable_response(exc.response)
+
+    return False
+
+
+class RetryPolicy(object):
+    def __init__(self, request_class=METADATA, max_retries=None, backoff_factor=None,
+                 max_backoff=None, max_elapsed=None):
+        defaults = DEFAULT_POLICIES.get(request_class, DEFAULT_POLICIES[METADATA])
+
+        self.request_class = request_class
+        self.max_retries = max_retries if max_retries is not None else defaults['max_retries']
+        # seconds, the first retry waits for up to backoff_factor, the next up to 2 * backoff_factor, etc
+        self.backoff_factor = backoff_factor if backoff_factor is not None else defaults['backoff_factor']
+        # seconds, the longest backoff wait
+        self.max_backoff = max_backoff if max_backoff is not None else defaults['max_backoff']
+        # seconds, the total time budget for all the attempts of one request
+        self.max_elapsed = max_elapsed if max_elapsed is not None else defaults['max_elapsed']
+
+    def __repr__(self):
+        return '%s(request_class=%s, max_retries=%s, backoff_factor=%s, max_backoff=%s, max_elapsed=%s)' % \
+            (self.__class__.__name__, self.request_class, self.max_retries,
+             self.backoff_factor, self.max_backoff, self.max_elapsed)
+
+    @classmethod
+    def from_http_config(cls, http_config, request_class):
+        '''Create the RetryPolicy for request_class from the 'http' section of the mazer config'''
+        http_config = http_config or {}
+        policy_config = (http_config.get('retries', None) or {}).get(request_class, None) or {}
+
+        return cls(request_class=request_class,
+                   max_retries=policy_config.get('max_retries', None),
+                   backoff_factor=policy_config.get('backoff_factor', None),
+                   max_backoff=policy_config.get('max_backoff', None),
+                   max_elapsed=policy_config.get('max_elapsed', None))
+
+    def backoff(self, retry_number):
+        '''The seconds to wait before retry_number (starting at 0), with full jitter'''
+        backoff_cap = min(self.max_backoff, self.backoff_factor * (2 ** retry_number))
+        return random.uniform(0, backoff_cap)
+
+    def delay(self, retry_number, elapsed, retry_after=None):
+        '''Return the seconds to wait before retry_number, or None if there should be no more retries'''
+        if retry_number >= self.max_retries:
+            return None
+
+        wait = retry_after if retry_after is not None else self.backoff(retry_number)
+
+        if elapsed + wait > self.max_elapsed:
+            return None
+
+        return wait
+
+    def call(self, func, description):
+        '''Call func() until it succeeds or fails for a reason that should not be retried
+
+        func should make one attempt at a request and return the requests.Response
+        (or whatever result it made from the response), or raise a requests exception.
+
+        A requests.Response with a retryable status is retried, and if the retries
+        run out it is returned so the caller can handle the error like any other
+        response. A retryable exception is raised when the retries run out.
+
+        description is used for logging. For ex, '"GET https://galaxy.ansible.com/api/"'
+        '''
+        started_at = time.time()
+        retry_number = 0
+
+        while True:
+            try:
+                response = func()
+            except RETRY_EXCEPTIONS + (requests.exceptions.HTTPError,) as exc:
+                if not is_retryable_error(exc):
+                    raise
+
+                retry_after = retry_after_from_response(getattr(exc, 'response', None))
+                wait = self.delay(retry_number, time.time() - started_at, retry_after=retry_after)
+
+                if wait is None:
+                    log.warning('Giving up on %s after %s retries: %s', description, retry_number, exc)
+                    raise
+
+                reason = exc
+            else:
+                if not is_retryable_response(response):
+                    return response
+
+                retry_after = retry_after_from_response(response)
+                wait = self.delay(retry_number, time.time() - started_at, retry_after=retry_after)
+
+                if wait is None:
+                    log.warning('Giving up on %s after %s retries: http_status=%s',
+                                description, retry_number, response.status_code)
+                    return response
+
+                reason = 'http_status=%s' % response.status_code
+                response.close()
+
+            retry_number += 1
+            _count_retry(self.request_class)
+
+            log.warning('Retrying %s in %.2f seconds (retry %s of %s) after: %s',
+                        description, wait, retry_number, self.max_retries, reason)
+
+            self.sleep(wait)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
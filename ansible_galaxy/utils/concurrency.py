@@ -0,0 +1,142 @@
+import logging
+import sys
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+import six
+
+log = logging.getLogger(__name__)
+
+
+def map_bounded(func, items, max_workers=None):
+    '''Return [func(item) for item in items], calling func from up to max_workers threads
+
+    The results are in the same order as items. If any call raises an exception,
+    the first one (in items order) is raised.
+
+    If there is only one item or max_workers is 1 or less, func is just called
+    in the current thread.'''
+
+    items = list(items)
+    max_workers = min(max_workers or 1, len(items))
+
+    if max_workers <= 1:
+        return [func(item) for item in items]
+
+    log.debug('Running %s for %s items with %s workers', getattr(func, '__name__', func), len(items), max_workers)
+
+    pool = ThreadPool(processes=max_workers)
+    try:
+        return pool.map(func, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def imap_completed(func, items, max_workers=None):
+    '''Yield (index, func(item)) for each of items as soon as each call finishes
+
+    The calls are started in items order, from up to max_workers threads, so put
+    the items that should start first (ie, the slowest) first. If a call raises
+    an exception, it is raised when its result would have been yielded.
+
+    If there is only one item or max_workers is 1 or less, func is just called
+    in the current thread, in order.'''
+
+    items = list(items)
+    max_workers = min(max_workers or 1, len(items))
+
+    if max_workers <= 1:
+        for index, item in enumerate(items):
+            yield index, func(item)
+        return
+
+    log.debug('Running %s for %s items with %s workers', getattr(func, '__name__', func), len(items), max_workers)
+
+    def _call(index_and_item):
+        index, item = index_and_item
+        return index, func(item)
+
+    pool = ThreadPool(processes=max_workers)
+    try:
+        for result in pool.imap_unordered(_call, list(enumerate(items)), chunksize=1):
+            yield result
+    finally:
+        # if the caller stopped early, do not start any more calls
+        pool.terminate()
+        pool.join()
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class CoalescingMemo(object):
+    '''A memo of func() results by key, where concurrent calls for the same key share one call
+
+    The first get() of a key calls func. Any get() of the same key from other
+    threads while that call is in flight waits for it and gets the same result
+    (or exception) instead of calling func again. Later get() calls of the key
+    return the remembered result.
+
+    Exceptions are not remembered, so the next get() after a failure calls func again.'''
+
+    def __init__(self):
+        self._results = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._results
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
+
+    def get(self, key, func):
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+
+            call = self._in_flight.get(key, None)
+            is_owner = call is None
+
+            if is_owner:
+                call = _Call()
+                self._in_flight[key] = call
+
+        if not is_owner:
+            log.debug('Waiting for the in flight call for %s', key)
+
+            call.done.wait()
+
+            if call.exc_info:
+                six.reraise(*call.exc_info)
+
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException:
+            # including KeyboardInterrupt and SystemExit, so waiters do not take None as the result
+            call.exc_info = sys.exc_info()
+            raise
+        else:
+            with self._lock:
+                self._results[key] = call.result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+            call.done.set()
+
+        return call.result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
@@ -8,6 +8,10 @@ log = logging.getLogger(__name__)
 VERSION_WITH_LEADING_V_MATCH_RE = re.compile(r'^[vV]\d+\.')
 VERSION_WITH_LEADING_V_SUB_RE = re.compile(r'(^[vV])')
 
+# The kinds of version spec objects that can be used as is. A NpmSpec (in newer
+# semantic_version) can have '||' alternatives, that a Spec string can not.
+SPEC_TYPES = tuple([semantic_version.Spec] + ([semantic_version.NpmSpec] if hasattr(semantic_version, 'NpmSpec') else []))
+
 
 def convert_string_to_semver(version):
     # log.debug('vs: %s type: %s', version, type(version))
@@ -26,7 +30,7 @@ def convert_string_to_version_spec(version_spec):
     if version_spec is None:
         return None
 
-    if isinstance(version_spec, semantic_version.Spec):
+    if isinstance(version_spec, SPEC_TYPES):
         return version_spec
 
     return semantic_version.Spec(version_spec)
@@ -0,0 +1,164 @@
+'''A sorted index of the available versions of a collection
+
+Each version string is parsed into a semantic_version.Version once, when
+the index is built. Selecting the best version for a version spec uses the
+'==', '>', '>=', '<' and '<=' clauses of the spec to bisect to the range of
+versions that could match, and then checks only those versions (newest first)
+with the spec itself. Each version maps back to whatever data it was indexed
+with (for ex, the CollectionVersion dict from the Galaxy API).
+
+Since an index never changes once built, the same one can be used for every
+requirement on the collection in a run, see galaxy_url.get_collection_versions().'''
+
+import bisect
+import logging
+import re
+
+import semantic_version
+
+log = logging.getLogger(__name__)
+
+# A spec clause with a full version, ie '>=1.0.0' or '<2.0.0-beta.1'. Other clauses, like
+# '~1.0', '!=1.2.3' or '*', do not bound the versions to check.
+SPEC_CLAUSE_RE = re.compile(r'^(?P<op>==|>=|<=|>|<)?(?P<version>\d+\.\d+\.\d+(-[0-9A-Za-z.-]+)?)(\+[0-9A-Za-z.-]+)?$')
+
+
+def _sort_key(version):
+    # Versions that only differ by build metadata do not compare, so leave it out of the sort key
+    return semantic_version.Version(major=version.major,
+                                    minor=version.minor,
+                                    patch=version.patch,
+                                    prerelease=version.prerelease)
+
+
+def spec_bounds(version_spec):
+    '''Return the (lowest, highest) Version version_spec could match, either can be None for no bound'''
+    lowest = None
+    highest = None
+
+    spec_string = str(version_spec)
+
+    if '||' in spec_string:
+        return None, None
+
+    for clause in spec_string.split(','):
+        match = SPEC_CLAUSE_RE.match(clause.strip())
+
+        if not match:
+            continue
+
+        op = match.group('op') or '=='
+        version = semantic_version.Version(match.group('version'))
+
+        if op in ('==', '>=', '>'):
+            lowest = version if lowest is None else max(lowest, version)
+
+        if op in ('==', '<=', '<'):
+            highest = version if highest is None else min(highest, version)
+
+    return lowest, highest
+
+
+class VersionIndex(object):
+    def __init__(self, versions_and_data):
+        '''versions_and_data is an iterable of (version, data) tuples
+
+        version can be a version string or a semantic_version.Version. Invalid
+        version strings are skipped.'''
+        entries = []
+
+        for version, data in versions_and_data:
+            if not isinstance(version, semantic_version.Version):
+                try:
+                    version = semantic_version.Version(version)
+                except ValueError:
+                    log.warning('The version string "%s" is not valid, skipping.', version)
+                    continue
+
+            entries.append((_sort_key(version), str(version), version, data))
+
+        # oldest first
+        entries.sort(key=lambda entry: entry[:2])
+
+        self._keys = [entry[0] for entry in entries]
+        self._versions = [entry[2] for entry in entries]
+        self._data = [entry[3] for entry in entries]
+
+    @classmethod
+    def from_collection_versions(cls, collection_version_list_data):
+        '''Build an index from a Galaxy API list of CollectionVersion dicts'''
+        return cls([(cv['version'], cv) for cv in collection_version_list_data or [] if cv.get('version', None)])
+
+    def __len__(self):
+        return len(self._versions)
+
+    def __iter__(self):
+        '''The (Version, data) tuples, newest first'''
+        return iter(zip(reversed(self._versions), reversed(self._data)))
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, [str(version) for version in self._versions])
+
+    @property
+    def versions(self):
+        '''The versions, oldest first'''
+        return list(self._versions)
+
+    def _range(self, version_specs):
+        lowest = None
+        highest = None
+
+        for version_spec in version_specs:
+            spec_lowest, spec_highest = spec_bounds(version_spec)
+
+            if spec_lowest is not None:
+                lowest = spec_lowest if lowest is None else max(lowest, spec_lowest)
+            if spec_highest is not None:
+                highest = spec_highest if highest is None else min(highest, spec_highest)
+
+        start = 0 if lowest is None else bisect.bisect_left(self._keys, _sort_key(lowest))
+        end = len(self._keys) if highest is None else bisect.bisect_right(self._keys, _sort_key(highest))
+
+        return start, end
+
+    def iter_matching(self, *version_specs):
+        '''Yield the (Version, data) tuples that match all of version_specs, newest first'''
+        start, end = self._range(version_specs)
+
+        for position in range(end - 1, start - 1, -1):
+            version = self._versions[position]
+
+            if all(version_spec.match(version) for version_spec in version_specs):
+                yield version, self._data[position]
+
+    def matching(self, *version_specs):
+        '''Return a list of the (Version, data) tuples that match all of version_specs, newest first'''
+        return list(self.iter_matching(*version_specs))
+
+    def select(self, version_spec):
+        '''Return the newest Version matching version_spec, or None'''
+        for version, dummy in self.iter_matching(version_spec):
+            return version
+
+        return None
+
+    def get_all(self, version):
+        '''Return a list of the data for every entry of version'''
+        if not isinstance(version, semantic_version.Version):
+            version = semantic_version.Version(version)
+
+        key = _sort_key(version)
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_right(self._keys, key)
+
+        return [self._data[position] for position in range(start, end)
+                if str(self._versions[position]) == str(version)]
+
+    def get(self, version, default=None):
+        '''Return the data for version, or default if there is no such version'''
+        all_data = self.get_all(version)
+
+        if not all_data:
+            return default
+
+        return all_data[0]
@@ -28,6 +28,7 @@ import os
 import sys
 
 from ansible_galaxy.actions import build
+from ansible_galaxy.actions import cache as cache_action
 from ansible_galaxy.actions import info
 from ansible_galaxy.actions import install
 from ansible_galaxy.actions import list as list_action
@@ -38,6 +39,8 @@ from ansible_galaxy.actions import publish
 from ansible_galaxy.config import defaults
 from ansible_galaxy.config import config
 
+from ansible_galaxy import download_spool
+from ansible_galaxy import http_metrics
 from ansible_galaxy import matchers
 from ansible_galaxy import rest_api
 from ansible_galaxy import mazer_version
@@ -67,7 +70,7 @@ def get_config_path_from_env():
 
 class GalaxyCLI(cli.CLI):
     SKIP_INFO_KEYS = ("name", "description", "readme_html", "related", "summary_fields", "average_aw_composite", "average_aw_score", "url")
-    VALID_ACTIONS = ("build", "info", "install", "list", "migrate_role", "publish", "remove", "version")
+    VALID_ACTIONS = ("build", "cache", "info", "install", "list", "migrate_role", "publish", "remove", "version")
     VALID_ACTION_ALIASES = {'content-install': 'install'}
 
     def __init__(self, args):
@@ -83,6 +86,11 @@ class GalaxyCLI(cli.CLI):
                                    help='The path in which the collection is located. The default is the current working directory.')
             self.parser.add_option('--output-path', dest='output_path', default=None,
                                    help='The path in which the collection artifact will be created. The default is ./releases/.')
+        if self.action == "cache":
+            self.parser.set_usage("usage: %prog cache [list|prune|clear] [options]")
+            self.parser.add_option('--max-size', dest='cache_max_size', type='int', default=None,
+                                   help='With prune, remove the least recently used artifacts until the artifact cache is no '
+                                   'larger than this many bytes. The default is the artifacts_max_size configured in your mazer.yml file')
         if self.action == "publish":
             self.parser.set_usage("usage: %prog publish [options] archive_path")
             # TODO: Instead of hardcode galaxy.ansible.com, show url for configured server url
@@ -106,6 +114,11 @@ class GalaxyCLI(cli.CLI):
                                    help='Don\'t download collections listed as dependencies')
             self.parser.add_option('--namespace', dest='namespace', default=None,
                                    help='The namespace to use when installing content (required for installs from local scm repo or archives)')
+            self.parser.add_option('--plan-only', dest='plan_only_path', default=None, metavar='PLAN_FILE',
+                                   help='Resolve the collections to install, and write the versions and artifacts picked to a '
+                                   'JSON install plan file, without downloading or installing anything')
+            self.parser.add_option('--from-plan', dest='from_plan_path', default=None, metavar='PLAN_FILE',
+                                   help='Install the collections in an install plan file written by --plan-only, without resolving')
         elif self.action == "remove":
             self.parser.set_usage("usage: %prog remove repo1 repo2 ...")
         elif self.action == "list":
@@ -115,6 +128,9 @@ class GalaxyCLI(cli.CLI):
                                    help="List installed collections in collections lockfile format")
             self.parser.add_option('--freeze', dest='list_lockfile_freeze', default=False, action='store_true',
                                    help="List installed collections in collections lockfile format with frozen versions")
+            self.parser.add_option('--pinned', dest='list_lockfile_pinned', default=False, action='store_true',
+                                   help="List installed collections in collections lockfile format with frozen versions "
+                                   "and the download url, size and sha256 of each artifact")
             self.parser.add_option('--full', dest='list_fully_qualified', default=False, action='store_true',
                                    help="List installed collections using fully qualifed names as used in playbooks")
         elif self.action == "version":
@@ -124,7 +140,7 @@ class GalaxyCLI(cli.CLI):
         if self.action in ("info",):
             self.parser.add_option('--offline', dest='offline', default=False, action='store_true', help="Prevent Mazer from calling the galaxy API.")
 
-        if self.action not in ("publish", "version",):
+        if self.action not in ("cache", "publish", "version",):
             # NOTE: while the option type=str, the default is a list, and the
             # callback will set the value to a list.
             self.parser.add_option('-C', '--collections-path', dest='collections_path',
@@ -165,6 +181,8 @@ class GalaxyCLI(cli.CLI):
                                help='Ignore SSL certificate validation errors.')
         self.parser.add_option('--config', dest='cli_config_file', default=None,
                                help='path to a mazer config file (default: %s)' % defaults.DEFAULT_CONFIG_FILE)
+        self.parser.add_option('--stats', dest='stats', action='store_true', default=False,
+                               help='When done, print a JSON summary of the http requests made (timings, bytes, retries, cache use) to stderr')
         self.set_action()
 
         super(GalaxyCLI, self).parse()
@@ -172,6 +190,13 @@ class GalaxyCLI(cli.CLI):
         if self.action == 'install' and getattr(self.options, 'collections_path') and getattr(self.options, 'global_install'):
             raise cli_exceptions.CliOptionsError('--content-path and --global are mutually exclusive')
 
+        if self.action == 'install' and getattr(self.options, 'from_plan_path', None):
+            if getattr(self.options, 'plan_only_path', None):
+                raise cli_exceptions.CliOptionsError('--plan-only and --from-plan are mutually exclusive')
+
+            if self.args or getattr(self.options, 'collections_lockfile', None):
+                raise cli_exceptions.CliOptionsError('--from-plan can not be used with collection specs or --lockfile')
+
     def _get_galaxy_context(self, options, config):
         # use collections_path from options if availble but fallback to configured collections_path
         options_collections_path = None
@@ -197,7 +222,21 @@ class GalaxyCLI(cli.CLI):
         if getattr(options, 'publish_api_key', None):
             server['api_key'] = options.publish_api_key
 
-        galaxy_context = GalaxyContext(server=server, collections_path=collections_path)
+        cache = config.cache.copy()
+
+        if cache.get('path', None):
+            cache['path'] = os.path.abspath(os.path.expanduser(cache['path']))
+
+        if cache.get('artifacts_path', None):
+            cache['artifacts_path'] = os.path.abspath(os.path.expanduser(cache['artifacts_path']))
+
+        spool_path = download_spool.spool_dir(os.path.abspath(os.path.expanduser(config.spool_path or collections_path)))
+
+        galaxy_context = GalaxyContext(server=server,
+                                       collections_path=collections_path,
+                                       http=config.http.copy(),
+                                       cache=cache,
+                                       spool_path=spool_path)
 
         return galaxy_context
 
@@ -237,7 +276,20 @@ class GalaxyCLI(cli.CLI):
                  galaxy_context.server['url'],
                  self.action)
 
-        return self.execute()
+        try:
+            return self.execute()
+        finally:
+            if getattr(self.options, 'stats', False):
+                self.emit_stats()
+
+    def emit_stats(self):
+        '''Write the http_metrics summary for the run to stderr as JSON'''
+        stats = http_metrics.summary()
+
+        log.info('http stats: %s', json.dumps(stats, sort_keys=True))
+
+        sys.stderr.write(json.dumps(stats, indent=2, sort_keys=True))
+        sys.stderr.write('\n')
 
     def execute_build(self):
         """
@@ -263,6 +315,27 @@ class GalaxyCLI(cli.CLI):
                            build_context,
                            display_callback=self.display)
 
+    def execute_cache(self):
+        """
+        List or prune the cache of downloaded collection artifacts.
+        """
+
+        if len(self.args) > 1:
+            raise cli_exceptions.CliOptionsError('- only one cache command may be given')
+
+        galaxy_context = self._get_galaxy_context(self.options, self.config)
+
+        subcommand = self.args[0] if self.args else 'list'
+
+        if subcommand not in cache_action.CACHE_SUBCOMMANDS:
+            raise cli_exceptions.CliOptionsError('- unknown cache command "%s", expected one of: %s' %
+                                                 (subcommand, ', '.join(cache_action.CACHE_SUBCOMMANDS)))
+
+        return cache_action.cache(galaxy_context,
+                                  subcommand=subcommand,
+                                  max_size=self.options.cache_max_size,
+                                  display_callback=self.display)
+
     def execute_info(self):
         """
         Display detailed information about an installed collection, as well as info available from the Galaxy API.
@@ -295,6 +368,22 @@ class GalaxyCLI(cli.CLI):
         galaxy_context = self._get_galaxy_context(self.options, self.config)
         requested_spec_strings = self.args
 
+        if self.options.plan_only_path:
+            return install.plan_repository_specs(galaxy_context,
+                                                 self.options.plan_only_path,
+                                                 repository_spec_strings=requested_spec_strings,
+                                                 collections_lockfile_path=self.options.collections_lockfile,
+                                                 namespace_override=self.options.namespace,
+                                                 display_callback=self.display,
+                                                 no_deps=self.options.no_deps)
+
+        if self.options.from_plan_path:
+            return install.install_from_plan(galaxy_context,
+                                             self.options.from_plan_path,
+                                             display_callback=self.display,
+                                             ignore_errors=self.options.ignore_errors,
+                                             force_overwrite=self.options.force)
+
         # TODO: build requirement_specs from requested_collection_specs strings
         rc = install.install_repository_specs_loop(galaxy_context,
                                                    editable=self.options.editable_install,
@@ -357,6 +446,7 @@ class GalaxyCLI(cli.CLI):
                                        list_content=list_content,
                                        lockfile_format=self.options.list_lockfile_format,
                                        lockfile_freeze=self.options.list_lockfile_freeze,
+                                       lockfile_pinned=self.options.list_lockfile_pinned,
                                        fully_qualified=self.options.list_fully_qualified,
                                        display_callback=self.display)
 
@@ -0,0 +1,111 @@
+import hashlib
+import logging
+
+import pytest
+
+from ansible_galaxy import artifact_cache
+from ansible_galaxy import exceptions
+from ansible_galaxy import negative_cache
+from ansible_galaxy.actions import cache
+
+log = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def cache_galaxy_context(galaxy_context, tmpdir):
+    galaxy_context.cache = {'path': tmpdir.join('cache').strpath,
+                            'artifacts_max_size': 15}
+    return galaxy_context
+
+
+def _add_artifacts(galaxy_context, tmpdir, datas):
+    store = artifact_cache.from_cache_config(galaxy_context.cache)
+
+    shas = []
+    for i, data in enumerate(datas):
+        artifact_file = tmpdir.join('artifact-%s' % i)
+        artifact_file.write_binary(data)
+        sha256 = hashlib.sha256(data).hexdigest()
+        store.add(sha256, artifact_file.strpath)
+        shas.append(sha256)
+
+    return store, shas
+
+
+def display_items_callback(display_items):
+    def callback(*args):
+        display_items.extend(args)
+    return callback
+
+
+def test_cache_list(cache_galaxy_context, tmpdir):
+    store, shas = _add_artifacts(cache_galaxy_context, tmpdir, [b'a' * 10, b'b' * 10])
+
+    display_items = []
+    res = cache.cache(cache_galaxy_context, subcommand='list',
+                      display_callback=display_items_callback(display_items))
+
+    log.debug('display_items: %s', display_items)
+
+    assert res == 0
+    assert len(display_items) == 3
+    assert sorted([item.split()[0] for item in display_items[:2]]) == sorted(shas)
+    assert display_items[2].startswith('2 artifacts, 20 bytes')
+
+
+def test_cache_prune(cache_galaxy_context, tmpdir):
+    store, shas = _add_artifacts(cache_galaxy_context, tmpdir, [b'a' * 10, b'b' * 10])
+
+    display_items = []
+    res = cache.cache(cache_galaxy_context, subcommand='prune',
+                      display_callback=display_items_callback(display_items))
+
+    assert res == 0
+    assert store.size() == 10
+    assert display_items[0].startswith('Removed 1 artifacts, 10 bytes')
+
+
+def test_cache_prune_max_size(cache_galaxy_context, tmpdir):
+    store, shas = _add_artifacts(cache_galaxy_context, tmpdir, [b'a' * 10, b'b' * 10])
+
+    cache.cache(cache_galaxy_context, subcommand='prune', max_size=100,
+                display_callback=display_items_callback([]))
+
+    assert store.size() == 20
+
+
+def test_cache_clear(cache_galaxy_context, tmpdir):
+    store, shas = _add_artifacts(cache_galaxy_context, tmpdir, [b'a' * 10, b'b' * 10])
+
+    cache.cache(cache_galaxy_context, subcommand='clear',
+                display_callback=display_items_callback([]))
+
+    assert store.entries() == []
+
+
+def test_cache_no_cache_path(galaxy_context):
+    display_items = []
+    res = cache.cache(galaxy_context, subcommand='prune',
+                      display_callback=display_items_callback(display_items))
+
+    assert res == 0
+    assert 'no cache path' in display_items[0]
+
+
+def test_cache_unknown_subcommand(cache_galaxy_context):
+    with pytest.raises(exceptions.GalaxyClientError, match='Unknown cache command "frob"'):
+        cache.cache(cache_galaxy_context, subcommand='frob',
+                    display_callback=display_items_callback([]))
+
+
+def test_cache_clear_negative_cache(cache_galaxy_context):
+    negative_cache.remember_missing('http://galaxy.invalid', 'ns', 'missing', 'not found',
+                                    cache_config=cache_galaxy_context.cache)
+
+    display_items = []
+    cache.cache(cache_galaxy_context, subcommand='clear',
+                display_callback=display_items_callback(display_items))
+
+    assert display_items[0] == 'Forgot 1 remembered collection lookup failures'
+    assert negative_cache.missing('http://galaxy.invalid', 'ns', 'missing',
+                                  cache_config=cache_galaxy_context.cache) is None
@@ -5,10 +5,12 @@ import pytest
 
 from ansible_galaxy.actions import install
 from ansible_galaxy import exceptions
+from ansible_galaxy import install_plan
 from ansible_galaxy import repository_spec
 from ansible_galaxy import requirements
+from ansible_galaxy.models.install_plan import InstallPlan, InstallPlanItem
 from ansible_galaxy.models.repository import Repository
-from ansible_galaxy.models.repository_spec import RepositorySpec
+from ansible_galaxy.models.repository_spec import FetchMethods, RepositorySpec
 from ansible_galaxy.models.requirement import Requirement, RequirementOps
 from ansible_galaxy.models.requirement_spec import RequirementSpec
 
@@ -40,6 +42,8 @@ def test_install_repositories(galaxy_context, mocker):
     requirements_to_install = \
         requirements.from_dependencies_dict({'some_namespace.this_requires_some_name': '*'})
 
+    mocker.patch('ansible_galaxy.actions.install.find_requirements',
+                 return_value=[(None, None, None)])
     mocker.patch('ansible_galaxy.actions.install.install_repository',
                  return_value=expected_repos)
 
@@ -119,7 +123,9 @@ def test_install_repositories_no_deps_required(galaxy_context, mocker):
     repository_specs_to_install = \
         [repository_spec.repository_spec_from_string('some_namespace.this_requires_nothing')]
 
-    # mock out install_repository
+    # mock out find_requirements and install_repository
+    mocker.patch('ansible_galaxy.actions.install.find_requirements',
+                 return_value=[(None, None, None)])
     mocker.patch('ansible_galaxy.actions.install.install_repository',
                  return_value=[])
 
@@ -180,3 +186,259 @@ def test_find_new_deps_from_installed(galaxy_context):
     assert isinstance(res, list)
     assert isinstance(res[0], Requirement)
     assert res[0].requirement_spec == req_spec
+
+
+def _install_plan(*labels_and_versions):
+    items = []
+    for label, version in labels_and_versions:
+        pinned_spec = RequirementSpec(namespace=label.split('.')[0], name=label.split('.')[1],
+                                      version_spec='==%s' % version)
+        items.append(InstallPlanItem(requirement=Requirement(requirement_spec=pinned_spec),
+                                     find_results={'content': {'version': version}}))
+    return InstallPlan(items=items)
+
+
+def test_resolve_requirements(galaxy_context, mocker):
+    galaxy_requirements = requirements.from_dependencies_dict({'some_namespace.some_name': '*'})
+    local_requirement = Requirement(requirement_spec=RequirementSpec(namespace='local', name='thing',
+                                                                     fetch_method=FetchMethods.LOCAL_FILE))
+
+    install_plan = _install_plan(('some_namespace.some_dep', '2.0.0'), ('some_namespace.some_name', '1.0.0'))
+    mock_resolve = mocker.patch('ansible_galaxy.actions.install.resolver.resolve',
+                                return_value=install_plan)
+
+    res = install.resolve_requirements(galaxy_context, galaxy_requirements + [local_requirement],
+                                       display_callback=display_callback)
+
+    mock_resolve.assert_called_once_with(galaxy_context, galaxy_requirements, no_deps=False, force_overwrite=False)
+    assert res == [local_requirement] + install_plan.requirements
+
+
+def test_resolve_requirements_conflict(galaxy_context, mocker):
+    galaxy_requirements = requirements.from_dependencies_dict({'some_namespace.some_name': '*'})
+
+    mocker.patch('ansible_galaxy.actions.install.resolver.resolve',
+                 side_effect=exceptions.GalaxyCouldNotFindAnswerForRequirement('conflict'))
+
+    with pytest.raises(exceptions.GalaxyError, match='conflict'):
+        install.resolve_requirements(galaxy_context, galaxy_requirements,
+                                     display_callback=display_callback)
+
+
+def test_resolve_requirements_conflict_ignore_errors(galaxy_context, mocker):
+    galaxy_requirements = requirements.from_dependencies_dict({'some_namespace.some_name': '*',
+                                                               'some_namespace.other_name': '*'})
+
+    install_plan = _install_plan(('some_namespace.other_name', '1.0.0'))
+    mocker.patch('ansible_galaxy.actions.install.resolver.resolve',
+                 side_effect=[exceptions.GalaxyCouldNotFindAnswerForRequirement('conflict'),
+                              exceptions.GalaxyCouldNotFindAnswerForRequirement('conflict'),
+                              install_plan])
+
+    res = install.resolve_requirements(galaxy_context, galaxy_requirements,
+                                       display_callback=display_callback,
+                                       ignore_errors=True)
+
+    assert res == install_plan.requirements
+
+
+def test_find_requirements(galaxy_context, mocker):
+    requirements_to_install = \
+        requirements.from_dependencies_dict({'some_namespace.some_name': '*',
+                                             'some_namespace.not_found': '*',
+                                             'some_namespace.other_name': '*'})
+
+    def find(fetcher):
+        if fetcher.requirement_spec.name == 'not_found':
+            raise exceptions.GalaxyClientError('not found')
+        return {'content': {'repo_name': fetcher.requirement_spec.name}}
+
+    mocker.patch('ansible_galaxy.actions.install.install.find',
+                 side_effect=find)
+
+    res = install.find_requirements(galaxy_context, requirements_to_install)
+
+    assert [fetcher.requirement_spec for fetcher, dummy, dummy in res] == \
+        [req.requirement_spec for req in requirements_to_install]
+    assert [find_results and find_results['content']['repo_name'] for dummy, find_results, dummy in res] == \
+        ['some_name', None, 'other_name']
+    assert [str(find_error) for dummy, dummy, find_error in res] == ['None', 'not found', 'None']
+
+
+def test_install_repositories_find_error_ignore_errors(galaxy_context, mocker):
+    requirements_to_install = \
+        requirements.from_dependencies_dict({'some_namespace.not_found': '*'})
+
+    mocker.patch('ansible_galaxy.actions.install.install.find',
+                 side_effect=exceptions.GalaxyClientError('not found'))
+    mock_fetch = mocker.patch('ansible_galaxy.actions.install.install.fetch')
+
+    ret = install.install_repositories(galaxy_context,
+                                       requirements_to_install=requirements_to_install,
+                                       display_callback=display_callback,
+                                       ignore_errors=True)
+
+    assert ret == []
+    assert not mock_fetch.called
+
+    with pytest.raises(exceptions.GalaxyError, match='not found'):
+        install.install_repositories(galaxy_context,
+                                     requirements_to_install=requirements_to_install,
+                                     display_callback=display_callback)
+
+
+def test_install_repository_specs_loop_pinned_lockfile(galaxy_context, mocker, requests_mock, tmpdir):
+    lockfile_path = tmpdir.join('collections_lockfile.yml')
+    lockfile_path.write('some_namespace.some_name:\n'
+                        '  version: 1.2.3\n'
+                        '  download_url: http://cdn.example.com/some_namespace-some_name-1.2.3.tar.gz\n'
+                        '  filename: some_namespace-some_name-1.2.3.tar.gz\n'
+                        '  size: 1234\n'
+                        '  sha256: AAAAAAAA\n')
+
+    repo_spec = RepositorySpec(namespace='some_namespace', name='some_name', version='1.2.3')
+    mock_fetch = mocker.patch('ansible_galaxy.actions.install.install.fetch',
+                              return_value={'archive_path': '/dev/null'})
+    mocker.patch('ansible_galaxy.actions.install.install.install',
+                 return_value=[Repository(repository_spec=repo_spec)])
+
+    res = install.install_repository_specs_loop(galaxy_context,
+                                                collections_lockfile_path=lockfile_path.strpath,
+                                                display_callback=display_callback)
+
+    assert res == 0
+
+    # no Galaxy API requests at all
+    assert requests_mock.call_count == 0
+
+    find_results = mock_fetch.call_args[1]['find_results']
+    assert find_results['custom']['download_url'] == 'http://cdn.example.com/some_namespace-some_name-1.2.3.tar.gz'
+    assert find_results['artifact']['sha256'] == 'AAAAAAAA'
+    assert mock_fetch.call_args[1]['repository_spec'] == repo_spec
+
+
+def test_plan_repository_specs_and_install_from_plan(galaxy_context, mocker, requests_mock, tmpdir):
+    plan_path = tmpdir.join('install_plan.json')
+
+    resolved_plan = InstallPlan(items=[
+        install_plan.item_from_dict({'namespace': 'some_namespace',
+                                     'name': 'some_name',
+                                     'version': '1.2.3',
+                                     'download_url': 'http://cdn.example.com/some_namespace-some_name-1.2.3.tar.gz',
+                                     'sha256': 'AAAAAAAA'})])
+    mock_resolve = mocker.patch('ansible_galaxy.actions.install.resolver.resolve',
+                                return_value=resolved_plan)
+    mock_fetch = mocker.patch('ansible_galaxy.actions.install.install.fetch')
+
+    res = install.plan_repository_specs(galaxy_context,
+                                        plan_path.strpath,
+                                        repository_spec_strings=['some_namespace.some_name'],
+                                        display_callback=display_callback)
+
+    assert res == 0
+    # planned as if nothing was installed, and nothing fetched
+    assert mock_resolve.call_args[1]['force_overwrite'] is True
+    assert mock_fetch.call_count == 0
+
+    repo_spec = RepositorySpec(namespace='some_namespace', name='some_name', version='1.2.3')
+    mock_fetch.return_value = {'archive_path': '/dev/null'}
+    mocker.patch('ansible_galaxy.actions.install.install.install',
+                 return_value=[Repository(repository_spec=repo_spec)])
+
+    res = install.install_from_plan(galaxy_context,
+                                    plan_path.strpath,
+                                    display_callback=display_callback)
+
+    assert res == 0
+    # nothing resolved again, and no Galaxy API requests
+    assert mock_resolve.call_count == 1
+    assert requests_mock.call_count == 0
+
+    find_results = mock_fetch.call_args[1]['find_results']
+    assert find_results['custom']['download_url'] == 'http://cdn.example.com/some_namespace-some_name-1.2.3.tar.gz'
+    assert find_results['artifact']['sha256'] == 'AAAAAAAA'
+    assert mock_fetch.call_args[1]['repository_spec'] == repo_spec
+
+
+def test_plan_repository_specs_not_from_galaxy(galaxy_context, tmpdir):
+    plan_path = tmpdir.join('install_plan.json')
+    local_requirement = Requirement(requirement_spec=RequirementSpec(namespace='local', name='thing',
+                                                                     fetch_method=FetchMethods.LOCAL_FILE))
+
+    with pytest.raises(exceptions.GalaxyClientError, match='local.thing'):
+        install.plan_repository_specs(galaxy_context,
+                                      plan_path.strpath,
+                                      requirements_list=[local_requirement],
+                                      display_callback=display_callback)
+
+    assert not plan_path.exists()
+
+
+def test_install_repository_specs_loop_unchanged_skipped(galaxy_context, mocker, tmpdir):
+    lockfile_path = tmpdir.join('collections_lockfile.yml')
+    lockfile_path.write('some_namespace.some_name: "==1.2.3"\n')
+
+    mock_resolve = mocker.patch('ansible_galaxy.actions.install.resolve_requirements', return_value=[])
+    mocker.patch('ansible_galaxy.actions.install.install_repositories_matching_repository_specs',
+                 return_value=[])
+
+    for dummy in range(2):
+        res = install.install_repository_specs_loop(galaxy_context,
+                                                    collections_lockfile_path=lockfile_path.strpath,
+                                                    display_callback=display_callback)
+        assert res == 0
+
+    # the second run had the same inputs and nothing changed
+    assert mock_resolve.call_count == 1
+
+    install.install_repository_specs_loop(galaxy_context,
+                                          collections_lockfile_path=lockfile_path.strpath,
+                                          display_callback=display_callback,
+                                          force_overwrite=True)
+
+    assert mock_resolve.call_count == 2
+
+    lockfile_path.write('some_namespace.some_name: "==1.2.4"\n')
+
+    install.install_repository_specs_loop(galaxy_context,
+                                          collections_lockfile_path=lockfile_path.strpath,
+                                          display_callback=display_callback)
+
+    assert mock_resolve.call_count == 3
+
+
+def test_fetch_requirements_largest_first(galaxy_context, mocker):
+    galaxy_context.http = {'max_concurrent_requests': 1}
+
+    requirements_to_install = requirements.from_dependencies_dict({'some_namespace.small': '*',
+                                                                   'some_namespace.large': '*',
+                                                                   'some_namespace.not_found': '*',
+                                                                   'some_namespace.medium': '*'})
+
+    def _found(requirement):
+        name = requirement.requirement_spec.name
+        if name == 'not_found':
+            return (None, None, exceptions.GalaxyClientError('not found'))
+        size = {'small': 10, 'medium': 100, 'large': 1000}[name]
+        return (None,
+                {'content': {'version': '1.0.0'}, 'artifact': {'size': size}},
+                None)
+
+    found = [_found(req) for req in requirements_to_install]
+
+    mock_fetch = mocker.patch('ansible_galaxy.actions.install.install.fetch',
+                              side_effect=lambda fetcher, repository_spec, find_results: {'archive_path': repository_spec.name})
+
+    res = list(install.fetch_requirements(galaxy_context, requirements_to_install, found))
+
+    assert [call[1]['repository_spec'].name for call in mock_fetch.call_args_list] == ['large', 'medium', 'small']
+
+    # in requirements_to_install order, not the order they were fetched in
+    assert [index for index, dummy, dummy in res] == [0, 1, 2, 3]
+
+    fetched_names = [(requirements_to_install[index].requirement_spec.name, fetch_results, fetch_error)
+                     for index, fetch_results, fetch_error in res]
+    assert sorted(fetched_names) == [('large', {'archive_path': 'large'}, None),
+                                     ('medium', {'archive_path': 'medium'}, None),
+                                     ('not_found', None, None),
+                                     ('small', {'archive_path': 'small'}, None)]
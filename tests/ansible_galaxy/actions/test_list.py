@@ -1,8 +1,14 @@
+import datetime
 import logging
 import os
 
+import yaml
+
 from ansible_galaxy import exceptions
 from ansible_galaxy.actions import list as list_action
+from ansible_galaxy.models.install_info import InstallInfo
+from ansible_galaxy.models.repository import Repository
+from ansible_galaxy.models.repository_spec import RepositorySpec
 
 log = logging.getLogger(__name__)
 
@@ -82,3 +88,30 @@ def test_format_as_lockfile(mocker):
     log.debug('res: |%s|', res)
 
     assert 'testns.testcollection' in res
+
+
+def test_format_as_lockfile_pinned():
+    repo_spec = RepositorySpec(namespace='testns', name='testcollection', version='1.2.3')
+    other_repo_spec = RepositorySpec(namespace='example', name='randomjunk', version='0.0.1')
+
+    install_info_ = InstallInfo.from_version_date('1.2.3', datetime.datetime.utcnow(),
+                                                  download_url='http://cdn.example.com/testns-testcollection-1.2.3.tar.gz',
+                                                  artifact={'filename': 'testns-testcollection-1.2.3.tar.gz',
+                                                            'size': 1234,
+                                                            'sha256': 'AAAAAAAA'})
+
+    repo_list = [{'content_items': {},
+                  'installed_repository': Repository(repository_spec=repo_spec, install_info=install_info_)},
+                 # no artifact info (for ex, installed from a local file) so frozen version spec
+                 {'content_items': {},
+                  'installed_repository': Repository(repository_spec=other_repo_spec)}]
+
+    res = list_action.format_as_lockfile(repo_list, lockfile_pinned=True)
+    log.debug('res: |%s|', res)
+
+    assert yaml.safe_load(res) == {'testns.testcollection': {'version': '1.2.3',
+                                                             'download_url': 'http://cdn.example.com/testns-testcollection-1.2.3.tar.gz',
+                                                             'filename': 'testns-testcollection-1.2.3.tar.gz',
+                                                             'size': 1234,
+                                                             'sha256': 'AAAAAAAA'},
+                                   'example.randomjunk': '==0.0.1'}
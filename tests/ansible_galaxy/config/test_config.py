@@ -6,7 +6,7 @@ from ansible_galaxy.config import config
 
 log = logging.getLogger(__name__)
 
-CONFIG_SECTIONS = ['server', 'collections_path', 'global_collections_path', 'options']
+CONFIG_SECTIONS = ['server', 'http', 'cache', 'collections_path', 'global_collections_path', 'spool_path', 'options']
 
 
 def assert_object(config_obj):
@@ -90,8 +90,11 @@ def test_config_as_dict():
     orig_config_data = OrderedDict([
         ('server', {'url': 'some_url_value',
                     'ignore_certs': True}),
+        ('http', {'pool_maxsize': 4}),
+        ('cache', {'path': '/dev/null/some_cache_path'}),
         ('collections_path', None),
         ('global_collections_path', None),
+        ('spool_path', '/dev/null/some_spool_path'),
         ('options', {'some_option': 'some_option_value'}),
     ])
 
@@ -1,8 +1,13 @@
+import hashlib
 import logging
+import os
 
 import pytest
 
+from ansible_galaxy import artifact_cache
+from ansible_galaxy import download
 from ansible_galaxy import exceptions
+from ansible_galaxy import negative_cache
 from ansible_galaxy.fetch import galaxy_url
 from ansible_galaxy.models.context import GalaxyContext
 from ansible_galaxy.models.requirement_spec import RequirementSpec
@@ -88,7 +93,7 @@ def test_galaxy_url_fetch_find(galaxy_url_fetch, requests_mock):
     # The request to get the CollectionVersion detail via href from CollectionVersion list
     requests_mock.get('http://example.invalid/api/v2/collections/some_ns/some_name/versions/9.3.245/',
                       json={'download_url': download_url,
-                            'metadata': {},
+                            'metadata': {'dependencies': {'some_ns.some_dep': '>=1.0.0'}},
                             'artifact': {'sha256': expected_sha256,
                                          'filename': 'some_ns-some_name-9.3.245.tar.gz',
                                          'size': 1201},
@@ -109,6 +114,87 @@ def test_galaxy_url_fetch_find(galaxy_url_fetch, requests_mock):
     assert res['artifact']['sha256'] == expected_sha256
     assert res['artifact']['filename'] == 'some_ns-some_name-9.3.245.tar.gz'
     assert res['artifact']['size'] == 1201
+    assert res['content']['dependencies'] == {'some_ns.some_dep': '>=1.0.0'}
+
+
+def _artifact_find_results(data):
+    return {'content': {'galaxy_namespace': 'some_ns',
+                        'repo_name': 'some_name'},
+            'artifact': {'sha256': hashlib.sha256(data).hexdigest(),
+                         'filename': 'some_ns-some_name-9.3.245.tar.gz',
+                         'size': len(data)},
+            'custom': {'repo_data': {},
+                       'download_url': 'http://example.invalid/download/some_ns-some_name-9.3.245.tar.gz',
+                       'repoversion': {'version': '9.3.245'}},
+            }
+
+
+def _mock_download(mocker, tmpdir, data):
+    def fetch_artifact(*args, **kwargs):
+        download_file = tmpdir.join('download-tmp-mazer-artifact-download')
+        download_file.write_binary(data)
+        return download.DownloadedArtifact(path=download_file.strpath,
+                                           sha256=hashlib.sha256(data).hexdigest())
+
+    return mocker.patch('ansible_galaxy.fetch.galaxy_url.download.fetch_artifact', side_effect=fetch_artifact)
+
+
+def test_galaxy_url_fetch_fetch_stores_artifact(galaxy_url_fetch, mocker, tmpdir):
+    galaxy_url_fetch.galaxy_context.cache = {'path': tmpdir.join('cache').strpath}
+    find_results = _artifact_find_results(b'some artifact')
+    sha256 = find_results['artifact']['sha256']
+
+    mocked_fetch_url = _mock_download(mocker, tmpdir, b'some artifact')
+
+    res = galaxy_url_fetch.fetch(find_results)
+
+    store = artifact_cache.from_cache_config(galaxy_url_fetch.galaxy_context.cache)
+    assert mocked_fetch_url.call_count == 1
+    assert res['archive_path'] == store.get(sha256)
+    assert not tmpdir.join('download-tmp-mazer-artifact-download').exists()
+
+    # the stored artifact is kept for the next install
+    galaxy_url_fetch.cleanup()
+    assert os.path.exists(res['archive_path'])
+
+    # a different fetch of the same artifact does not download it
+    other_fetch = galaxy_url.GalaxyUrlFetch(requirement_spec=galaxy_url_fetch.requirement_spec,
+                                            galaxy_context=galaxy_url_fetch.galaxy_context)
+    other_res = other_fetch.fetch(find_results)
+
+    assert mocked_fetch_url.call_count == 1
+    assert other_res['archive_path'] == res['archive_path']
+
+
+def test_galaxy_url_fetch_fetch_invalid_cached_artifact(galaxy_url_fetch, mocker, tmpdir):
+    galaxy_url_fetch.galaxy_context.cache = {'path': tmpdir.join('cache').strpath}
+    find_results = _artifact_find_results(b'some artifact')
+    sha256 = find_results['artifact']['sha256']
+
+    store = artifact_cache.from_cache_config(galaxy_url_fetch.galaxy_context.cache)
+    corrupt_file = tmpdir.join('corrupt')
+    corrupt_file.write_binary(b'not the artifact')
+    store.add(sha256, corrupt_file.strpath)
+
+    mocked_fetch_url = _mock_download(mocker, tmpdir, b'some artifact')
+
+    res = galaxy_url_fetch.fetch(find_results)
+
+    assert mocked_fetch_url.call_count == 1
+    assert open(res['archive_path'], 'rb').read() == b'some artifact'
+
+
+def test_galaxy_url_fetch_fetch_no_cache_path(galaxy_url_fetch, mocker, tmpdir):
+    find_results = _artifact_find_results(b'some artifact')
+
+    _mock_download(mocker, tmpdir, b'some artifact')
+
+    res = galaxy_url_fetch.fetch(find_results)
+
+    assert res['archive_path'] == tmpdir.join('download-tmp-mazer-artifact-download').strpath
+
+    galaxy_url_fetch.cleanup()
+    assert not os.path.exists(res['archive_path'])
 
 
 def test_galaxy_url_fetch_find_no_repo_data(galaxy_url_fetch, galaxy_context, requests_mock):
@@ -131,10 +217,11 @@ def test_galaxy_url_fetch_fetch(galaxy_url_fetch, mocker, requests_mock):
     download_url = 'http://example.invallid/download/some_ns-some_name-9.3.245.tar.gz'
     collection_path = '/dev/null/path/to/collection.tar.gz'
 
-    mocked_download_fetch_url = mocker.patch('ansible_galaxy.fetch.galaxy_url.download.fetch_url', autospec=True)
-    mocked_download_fetch_url.return_value = collection_path
-
     expected_sha256 = 'AAAAAAAAAAAAAAAAAAA'
+
+    mocked_download_fetch_artifact = mocker.patch('ansible_galaxy.fetch.galaxy_url.download.fetch_artifact', autospec=True)
+    mocked_download_fetch_artifact.return_value = download.DownloadedArtifact(path=collection_path,
+                                                                              sha256=expected_sha256)
     artifact_data = {'sha256': expected_sha256,
                      'filename': 'some_ns-some_name-9.3.245.tar.gz',
                      'size': 1201}
@@ -162,8 +249,8 @@ def test_galaxy_url_fetch_fetch(galaxy_url_fetch, mocker, requests_mock):
     assert isinstance(res['content'], dict)
     assert res['artifact'] == artifact_data
 
-    log.debug('mock_sha256.call_args_list: %s', mock_sha256.call_args_list)
-    assert mock_sha256.call_args_list == [mocker.call('/dev/null/path/to/collection.tar.gz')]
+    # the sha256 computed while downloading is used, the artifact is not read again
+    assert mock_sha256.call_count == 0
 
 
 # Note that select_collection_version just gets the full version object
@@ -227,3 +314,71 @@ def test_select_collection_version_empty_repoversions():
 
     assert isinstance(res, dict)
     assert res == {}
+
+
+def test_get_collection_versions_index_reused(galaxy_context_example_invalid, requests_mock):
+    requests_mock.get('http://example.invalid/api/',
+                      json={'current_version': 'v2'})
+    versions_url = 'http://example.invalid/api/v2/collections/some_ns/some_name/versions/'
+    requests_mock.get(versions_url,
+                      json={'count': 2,
+                            'next': None,
+                            'previous': None,
+                            'results': [{'version': '1.2.3', 'href': versions_url + '1.2.3/'},
+                                        {'version': '9.3.245', 'href': versions_url + '9.3.245/'}]})
+
+    api = galaxy_url.GalaxyAPI(galaxy_context_example_invalid)
+    req_spec = RequirementSpec(namespace='some_ns', name='some_name')
+
+    index = galaxy_url.get_collection_versions(api, {'versions_url': versions_url}, req_spec)
+    other_index = galaxy_url.get_collection_versions(api, {'versions_url': versions_url}, req_spec)
+
+    assert index is other_index
+    assert str(index.select(req_spec.version_spec)) == '9.3.245'
+    assert index.get('1.2.3')['href'] == versions_url + '1.2.3/'
+
+
+def test_galaxy_url_fetch_find_404_remembered(galaxy_url_fetch, galaxy_context_example_invalid, requests_mock, tmpdir):
+    galaxy_context_example_invalid.cache = {'path': tmpdir.strpath}
+
+    requests_mock.get('http://example.invalid/api/',
+                      json={'current_version': 'v2'})
+    detail_mock = requests_mock.get('http://example.invalid/api/v2/collections/some_namespace/some_name/',
+                                    status_code=404,
+                                    json={'code': 'not_found', 'message': 'Not found.'})
+
+    with pytest.raises(exceptions.GalaxyRestAPIError):
+        galaxy_url_fetch.find()
+
+    assert detail_mock.call_count == 1
+
+    # remembered in memory, and on disk for the next run
+    with pytest.raises(exceptions.GalaxyClientError, match='- sorry, some_namespace.some_name.* was not found'):
+        galaxy_url_fetch.find()
+
+    negative_cache.clear()
+
+    with pytest.raises(exceptions.GalaxyClientError, match='was not found'):
+        galaxy_url_fetch.find()
+
+    assert detail_mock.call_count == 1
+
+
+def test_galaxy_url_fetch_find_unsatisfiable_remembered(galaxy_url_fetch, requests_mock):
+    requests_mock.get('http://example.invalid/api/',
+                      json={'current_version': 'v2'})
+    requests_mock.get('http://example.invalid/api/v2/collections/some_namespace/some_name/',
+                      json={'versions_url': 'http://example.invalid/api/v2/collections/some_ns/some_name/versions/'})
+    versions_mock = requests_mock.get('http://example.invalid/api/v2/collections/some_ns/some_name/versions/',
+                                      json={'count': 1,
+                                            'next': None,
+                                            'previous': None,
+                                            'results': [{'version': '1.2.3', 'href': '/versions/1.2.3/'}]})
+
+    for dummy in range(2):
+        with pytest.raises(exceptions.GalaxyCouldNotFindAnswerForRequirement):
+            galaxy_url_fetch.find()
+
+    assert requests_mock.call_count == 3
+    assert versions_mock.call_count == 1
+    assert negative_cache.unsatisfiable('http://example.invalid', 'some_namespace', 'some_name', '==9.3.245')
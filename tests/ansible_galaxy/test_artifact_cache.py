@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import os
+
+import pytest
+
+from ansible_galaxy import artifact_cache
+
+log = logging.getLogger(__name__)
+
+
+def _artifact(tmpdir, name, data):
+    artifact_file = tmpdir.join(name)
+    artifact_file.write_binary(data)
+    return artifact_file.strpath, hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def store(tmpdir):
+    return artifact_cache.ArtifactCache(tmpdir.join('artifacts').strpath)
+
+
+def test_artifact_cache_add_get(store, tmpdir):
+    source_path, sha256 = _artifact(tmpdir, 'some-artifact.tar.gz', b'some artifact')
+
+    assert store.get(sha256) is None
+
+    stored_path = store.add(sha256, source_path)
+
+    assert stored_path == os.path.join(store.path, sha256[:2], sha256)
+    assert store.get(sha256) == stored_path
+    assert store.get(sha256.upper()) == stored_path
+    assert open(stored_path, 'rb').read() == b'some artifact'
+    # copied, not moved
+    assert os.path.exists(source_path)
+    # no temp files left behind
+    assert os.listdir(os.path.dirname(stored_path)) == [sha256]
+
+
+def test_artifact_cache_add_move(store, tmpdir):
+    source_path, sha256 = _artifact(tmpdir, 'some-artifact.tar.gz', b'some artifact')
+
+    stored_path = store.add(sha256, source_path, move=True)
+
+    assert store.get(sha256) == stored_path
+    assert not os.path.exists(source_path)
+
+
+@pytest.mark.parametrize("sha256", [None, '', 'AAAAAAAAAAAAAAAAAAA', 'z' * 64, '../' * 21 + 'a'])
+def test_artifact_cache_not_a_sha256(store, tmpdir, sha256):
+    source_path, dummy = _artifact(tmpdir, 'some-artifact.tar.gz', b'some artifact')
+
+    assert store.add(sha256, source_path) is None
+    assert store.get(sha256) is None
+    assert store.entries() == []
+
+
+def test_artifact_cache_add_error(store, tmpdir):
+    sha256 = hashlib.sha256(b'gone').hexdigest()
+
+    assert store.add(sha256, tmpdir.join('does-not-exist.tar.gz').strpath) is None
+    assert store.get(sha256) is None
+    assert os.listdir(os.path.join(store.path, sha256[:2])) == []
+
+
+def test_artifact_cache_prune_lru(tmpdir):
+    store = artifact_cache.ArtifactCache(tmpdir.join('artifacts').strpath)
+
+    shas = []
+    for i, name in enumerate(['a', 'b', 'c']):
+        source_path, sha256 = _artifact(tmpdir, name, name.encode('utf-8') * 10)
+        stored_path = store.add(sha256, source_path)
+        # a is the oldest, c the newest
+        os.utime(stored_path, (1000 + i, 1000 + i))
+        shas.append(sha256)
+
+    assert store.size() == 30
+    assert [entry.sha256 for entry in store.entries()] == shas
+
+    # using 'a' makes 'b' the least recently used
+    store.get(shas[0])
+
+    removed = store.prune(20)
+
+    assert [entry.sha256 for entry in removed] == [shas[1]]
+    assert store.get(shas[1]) is None
+    assert store.size() == 20
+
+    removed = store.prune(0, keep=[shas[0]])
+
+    assert [entry.sha256 for entry in removed] == [shas[2]]
+    assert [entry.sha256 for entry in store.entries()] == [shas[0]]
+
+
+def test_artifact_cache_add_does_not_prune(tmpdir):
+    store = artifact_cache.ArtifactCache(tmpdir.join('artifacts').strpath, max_size=15)
+
+    for name in ('old', 'new'):
+        artifact_path, sha256 = _artifact(tmpdir, name, name[0].encode('utf-8') * 10)
+        store.add(sha256, artifact_path)
+
+    assert len(store.entries()) == 2
+
+
+def test_prune_after_install(tmpdir):
+    cache_config = {'artifacts_path': tmpdir.join('artifacts').strpath, 'artifacts_max_size': 15}
+    store = artifact_cache.from_cache_config(cache_config)
+
+    old_path, old_sha256 = _artifact(tmpdir, 'old', b'o' * 10)
+    os.utime(store.add(old_sha256, old_path), (1000, 1000))
+
+    # just used, maybe by another process sharing the store
+    new_path, new_sha256 = _artifact(tmpdir, 'new', b'n' * 10)
+    store.add(new_sha256, new_path)
+
+    recent_path, recent_sha256 = _artifact(tmpdir, 'recent', b'r' * 10)
+    store.add(recent_sha256, recent_path)
+
+    removed = artifact_cache.prune_after_install(cache_config)
+
+    assert [entry.sha256 for entry in removed] == [old_sha256]
+    assert sorted([entry.sha256 for entry in store.entries()]) == sorted([new_sha256, recent_sha256])
+
+
+def test_prune_after_install_no_store():
+    assert artifact_cache.prune_after_install({}) == []
+
+
+def test_artifact_cache_prune_stale_tmp_files(store):
+    shard_path = os.path.join(store.path, 'ab')
+    os.makedirs(shard_path)
+
+    stale_tmp_path = os.path.join(shard_path, '.tmp-stale')
+    new_tmp_path = os.path.join(shard_path, '.tmp-new')
+    for tmp_path in (stale_tmp_path, new_tmp_path):
+        open(tmp_path, 'w').close()
+    os.utime(stale_tmp_path, (1000, 1000))
+
+    store.prune(0)
+
+    # an add may still be writing the new one
+    assert os.listdir(shard_path) == ['.tmp-new']
+
+
+def test_artifact_cache_entries_no_store(tmpdir):
+    store = artifact_cache.ArtifactCache(tmpdir.join('does_not_exist').strpath)
+
+    assert store.entries() == []
+    assert store.size() == 0
+    assert store.prune(0) == []
+
+
+@pytest.mark.parametrize("cache_config,expected_path,expected_max_size", [
+    ({}, None, None),
+    ({'path': '/tmp/mazer_cache'}, '/tmp/mazer_cache/artifacts', artifact_cache.DEFAULT_ARTIFACTS_MAX_SIZE),
+    ({'path': '/tmp/mazer_cache', 'artifacts_path': '/srv/artifacts', 'artifacts_max_size': 10},
+     '/srv/artifacts', 10),
+    ({'artifacts_path': '/srv/artifacts'}, '/srv/artifacts', artifact_cache.DEFAULT_ARTIFACTS_MAX_SIZE),
+])
+def test_from_cache_config(cache_config, expected_path, expected_max_size):
+    store = artifact_cache.from_cache_config(cache_config)
+
+    if expected_path is None:
+        assert store is None
+        return
+
+    assert store.path == expected_path
+    assert store.max_size == expected_max_size
@@ -54,3 +54,15 @@ def test_validate_artifact_bogus(tmpdir):
     assert exc.artifact_path == temp_file.strpath
     assert exc.expected == EMPTY_SHA
     assert exc.actual == 'a948904f2f0f479b8f8197694b30184b0d2ed1c1cd2a1ec0fb85d299a192a447'
+
+
+def test_validate_artifact_actual_chksum(mocker):
+    mock_sha256 = mocker.patch('ansible_galaxy.collection_artifact.chksums.sha256sum_from_path')
+
+    collection_artifact.validate_artifact('/dev/null/some_artifact.tar.gz', EMPTY_SHA, actual_chksum=EMPTY_SHA)
+
+    with pytest.raises(exceptions.GalaxyArtifactChksumError):
+        collection_artifact.validate_artifact('/dev/null/some_artifact.tar.gz', EMPTY_SHA, actual_chksum='AAAA')
+
+    # the file is not read
+    assert mock_sha256.call_count == 0
@@ -74,3 +74,34 @@ def test_load_not_dict():
             collections_lockfile.load(lfd)
 
     log.debug('exc_info: %s', exc_info)
+
+
+def test_load_pinned():
+    lockfile_path = os.path.join(EXAMPLE_LOCKFILE_DIR,
+                                 'pinned.yml')
+
+    with open(lockfile_path, 'r') as lfd:
+        lockfile = collections_lockfile.load(lfd)
+
+    assert collections_lockfile.version_spec_dependencies(lockfile) == {'alikins.collection_ntp': '==2.0.0'}
+
+    res = collections_lockfile.pinned_requirements(lockfile)
+
+    assert len(res) == 1
+
+    requirement, find_results = res[0]
+    assert requirement.requirement_spec.label == 'alikins.collection_inspect,==1.0.0'
+    assert str(find_results['content']['version']) == '1.0.0'
+    assert find_results['custom']['download_url'] == \
+        'https://galaxy.example.com/download/alikins-collection_inspect-1.0.0.tar.gz'
+    assert find_results['artifact'] == {'filename': 'alikins-collection_inspect-1.0.0.tar.gz',
+                                        'size': 12345,
+                                        'sha256': '3b0e3e6e54c0e6b5f39ab6bbdd5e1a4c4a6d8e4ffb6fc8e1a6d1cdb2b1e1a1b2'}
+
+
+def test_pinned_requirements_missing_sha256():
+    lockfile = CollectionsLockfile(dependencies={'some_ns.some_name': {'version': '1.0.0',
+                                                                       'download_url': 'https://example.com/a.tar.gz'}})
+
+    with pytest.raises(exceptions.GalaxyClientError, match='some_ns.some_name is missing: sha256'):
+        collections_lockfile.pinned_requirements(lockfile)
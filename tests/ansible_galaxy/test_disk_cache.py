@@ -0,0 +1,114 @@
+import logging
+import os
+
+from ansible_galaxy import disk_cache
+
+log = logging.getLogger(__name__)
+
+
+def test_disk_cache_set_get(tmpdir):
+    cache = disk_cache.DiskCache(tmpdir.join('some_cache').strpath)
+
+    res = cache.set('http://example.invalid/api/', {'current_version': 'v2'})
+
+    assert res is True
+    assert cache.get('http://example.invalid/api/') == {'current_version': 'v2'}
+
+
+def test_disk_cache_get_miss(tmpdir):
+    cache = disk_cache.DiskCache(tmpdir.strpath)
+
+    assert cache.get('http://example.invalid/api/') is None
+
+
+def test_disk_cache_get_expired(tmpdir, mocker):
+    cache = disk_cache.DiskCache(tmpdir.strpath, max_age=60)
+
+    mocker.patch('ansible_galaxy.disk_cache.time.time', return_value=1000.0)
+    cache.set('some_key', 'some_value')
+
+    mocker.patch('ansible_galaxy.disk_cache.time.time', return_value=1059.0)
+    assert cache.get('some_key') == 'some_value'
+
+    mocker.patch('ansible_galaxy.disk_cache.time.time', return_value=1061.0)
+    assert cache.get('some_key') is None
+
+    # max_age passed to get() overrides the default
+    assert cache.get('some_key', max_age=120) == 'some_value'
+
+
+def test_disk_cache_get_invalid_item(tmpdir):
+    cache = disk_cache.DiskCache(tmpdir.strpath)
+    cache.set('some_key', 'some_value')
+
+    with open(cache._item_path('some_key'), 'w') as item_fo:
+        item_fo.write('{not valid json')
+
+    assert cache.get('some_key') is None
+
+
+def test_disk_cache_delete(tmpdir):
+    cache = disk_cache.DiskCache(tmpdir.strpath)
+    cache.set('some_key', 'some_value')
+
+    assert cache.delete('some_key') is True
+    assert cache.get('some_key') is None
+    assert cache.delete('some_key') is False
+
+
+def test_disk_cache_set_unwritable(tmpdir):
+    cache_path = tmpdir.join('not_a_dir')
+    cache_path.write('some file contents')
+
+    cache = disk_cache.DiskCache(os.path.join(cache_path.strpath, 'sub_dir'))
+
+    assert cache.set('some_key', 'some_value') is False
+
+
+def test_disk_cache_prune(tmpdir):
+    cache = disk_cache.DiskCache(tmpdir.strpath)
+
+    for idx in range(4):
+        cache.set('key%s' % idx, 'x' * 100)
+        # make the mtimes distinct and ordered
+        os.utime(cache._item_path('key%s' % idx), (1000 + idx, 1000 + idx))
+
+    # using key0 makes it the most recently used
+    assert cache.get('key0') is not None
+
+    # the items can differ in size by a byte or so, since 'stored_at' is in them
+    kept_size = os.path.getsize(cache._item_path('key0')) + os.path.getsize(cache._item_path('key3'))
+    res = cache.prune(max_size=kept_size)
+
+    assert res == 2
+    assert cache.get('key1') is None
+    assert cache.get('key2') is None
+    assert cache.get('key0') is not None
+    assert cache.get('key3') is not None
+
+
+def test_disk_cache_max_size(tmpdir):
+    cache = disk_cache.DiskCache(tmpdir.strpath, max_size=1)
+
+    cache.set('some_key', 'some_value')
+
+    assert cache.size() == 0
+    assert cache.get('some_key') is None
+
+
+def test_disk_cache_set_running_size(tmpdir, mocker):
+    cache = disk_cache.DiskCache(tmpdir.strpath, max_size=1000)
+
+    paths_and_stats_spy = mocker.spy(cache, '_item_paths_and_stats')
+
+    for i in range(10):
+        cache.set('key%s' % i, 'value%s' % i)
+
+    # the size is only read from the disk once, and nothing needed pruning
+    assert paths_and_stats_spy.call_count == 1
+    assert len(os.listdir(tmpdir.strpath)) == 10
+
+    cache.set('big_key', 'x' * 1000)
+
+    assert paths_and_stats_spy.call_count == 2
+    assert cache.size() <= 1000
@@ -1,11 +1,16 @@
+import hashlib
 import io
 import logging
 import os
+import socket
 
 import pytest
+import requests
 
 from ansible_galaxy import download
 from ansible_galaxy import exceptions
+from ansible_galaxy import http_metrics
+from ansible_galaxy import retry
 
 log = logging.getLogger(__name__)
 
@@ -42,3 +47,373 @@ def test_fetch_bytes_200(requests_mock):
 
     log.debug('res: %s', res)
     os.unlink(res)
+
+
+def test_fetch_urls(requests_mock):
+    urls = ['http://example.invalid/download/some_ns-some_name-1.2.3.tar.gz',
+            'http://cdn.example.invalid/download/other_ns-other_name-4.5.6.tar.gz']
+
+    for url in urls:
+        requests_mock.get(url,
+                          status_code=200,
+                          reason='OK',
+                          content=url.encode('utf-8'))
+
+    res = download.fetch_urls(urls)
+
+    log.debug('res: %s', res)
+
+    assert len(res) == 2
+
+    for url, downloaded_path in zip(urls, res):
+        with open(downloaded_path, 'rb') as downloaded_fo:
+            assert downloaded_fo.read() == url.encode('utf-8')
+        os.unlink(downloaded_path)
+
+
+def test_fetch_urls_404(requests_mock, mocker):
+    ok_url = 'http://example.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    not_found_url = 'http://example.invalid/download/other_ns-other_name-4.5.6.tar.gz'
+
+    requests_mock.get(ok_url,
+                      status_code=200,
+                      content=b'stuff')
+    requests_mock.get(not_found_url,
+                      status_code=404,
+                      reason='Not Found')
+
+    mock_unlink = mocker.patch('ansible_galaxy.download.os.unlink', wraps=os.unlink)
+
+    with pytest.raises(exceptions.GalaxyDownloadError, match='.*other_ns-other_name-4.5.6.tar.gz.*'):
+        download.fetch_urls([ok_url, not_found_url])
+
+    # the 404 tmp file, and the tmp file for the download that worked
+    assert mock_unlink.call_count == 2
+
+
+def test_fetch_url_retry(requests_mock):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+
+    requests_mock.get(url, [{'status_code': 503, 'headers': {'Retry-After': '1'}},
+                            {'exc': requests.exceptions.ConnectionError('connection reset')},
+                            {'status_code': 200, 'content': b'some artifact bytes'}])
+
+    res = download.fetch_url(url)
+
+    with open(res, 'rb') as artifact_fo:
+        assert artifact_fo.read() == b'some artifact bytes'
+
+    os.unlink(res)
+
+    assert requests_mock.call_count == 3
+    assert retry.retry_counts() == {retry.ARTIFACT: 2}
+
+    request_record = http_metrics.records()[-1]
+
+    assert request_record['request_class'] == retry.ARTIFACT
+    assert request_record['status'] == 200
+    assert request_record['retries'] == 2
+    assert request_record['bytes_in'] == len(b'some artifact bytes')
+
+
+def test_fetch_artifact_sha256(requests_mock):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    body = b'some artifact bytes' * 1000
+
+    requests_mock.get(url, [{'exc': requests.exceptions.ConnectionError('connection reset')},
+                            {'status_code': 200, 'content': body}])
+
+    res = download.fetch_artifact(url, chunk_size=128)
+
+    with open(res.path, 'rb') as artifact_fo:
+        assert artifact_fo.read() == body
+
+    os.unlink(res.path)
+
+    assert res.sha256 == hashlib.sha256(body).hexdigest()
+
+
+def test_fetch_url_retries_exhausted(requests_mock):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+
+    requests_mock.get(url, status_code=502)
+
+    http_config = {'retries': {'artifact': {'max_retries': 2}}}
+
+    with pytest.raises(exceptions.GalaxyDownloadError, match='.*502 Server Error.*'):
+        download.fetch_url(url, http_config=http_config)
+
+    assert requests_mock.call_count == 3
+
+    request_record = http_metrics.records()[-1]
+
+    assert request_record['status'] == 502
+    assert request_record['retries'] == 2
+    assert '502 Server Error' in request_record['error']
+
+
+def test_fetch_artifact_write_error_recorded(requests_mock, mocker):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+
+    requests_mock.get(url, content=b'some artifact bytes')
+
+    mocker.patch('ansible_galaxy.download._stream_response', side_effect=IOError('No space left on device'))
+
+    with pytest.raises(IOError):
+        download.fetch_artifact(url)
+
+    request_record = http_metrics.records()[-1]
+
+    assert request_record['status'] == 200
+    assert 'No space left on device' in request_record['error']
+
+
+def test_fetch_url_cached_redirect(requests_mock):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    cdn_url = 'https://cdn.invalid/artifacts/some_ns-some_name-1.2.3.tar.gz'
+
+    requests_mock.get(url, status_code=302, headers={'Location': cdn_url,
+                                                     'Cache-Control': 'max-age=600'})
+    requests_mock.get(cdn_url, status_code=200, content=b'some artifact bytes')
+
+    for dummy in range(2):
+        res = download.fetch_url(url)
+        os.unlink(res)
+
+    # the second download skipped the redirect
+    assert [request.url for request in requests_mock.request_history] == [url, cdn_url, cdn_url]
+
+
+def test_fetch_url_cached_redirect_stale(requests_mock):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    cdn_url = 'https://cdn.invalid/artifacts/some_ns-some_name-1.2.3.tar.gz?signature=old'
+    new_cdn_url = 'https://cdn.invalid/artifacts/some_ns-some_name-1.2.3.tar.gz?signature=new'
+
+    requests_mock.get(url, status_code=301, headers={'Location': cdn_url})
+    requests_mock.get(cdn_url, status_code=200, content=b'some artifact bytes')
+
+    res = download.fetch_url(url)
+    os.unlink(res)
+
+    # the old signed url expired, and the download url now redirects somewhere else
+    requests_mock.get(cdn_url, status_code=403)
+    requests_mock.get(url, status_code=301, headers={'Location': new_cdn_url})
+    requests_mock.get(new_cdn_url, status_code=200, content=b'some artifact bytes')
+
+    res = download.fetch_url(url)
+
+    with open(res, 'rb') as artifact_fo:
+        assert artifact_fo.read() == b'some artifact bytes'
+
+    os.unlink(res)
+
+    assert [request.url for request in requests_mock.request_history][-3:] == [cdn_url, url, new_cdn_url]
+
+
+class DroppedConnectionBody(io.RawIOBase):
+    '''A response body that drops the connection after drop_at bytes'''
+    def __init__(self, data, drop_at):
+        self.data = data
+        self.drop_at = drop_at
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        if self.pos >= self.drop_at:
+            raise socket.error('connection reset by peer')
+
+        size = min(len(buf), self.drop_at - self.pos)
+        buf[:size] = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return size
+
+
+ARTIFACT_BYTES = b''.join([('%s' % i).encode('utf-8') for i in range(1000)])
+
+
+def _range_response(request, context):
+    offset = int(request.headers['Range'].split('=')[1].rstrip('-'))
+    context.status_code = 206
+    context.headers['Content-Range'] = 'bytes %s-%s/%s' % (offset, len(ARTIFACT_BYTES) - 1, len(ARTIFACT_BYTES))
+    return ARTIFACT_BYTES[offset:]
+
+
+def _dropped_response(headers=None):
+    return {'status_code': 200,
+            'headers': headers or {'ETag': '"some-etag"', 'Content-Length': str(len(ARTIFACT_BYTES))},
+            'body': DroppedConnectionBody(ARTIFACT_BYTES, 1000)}
+
+
+def test_fetch_artifact_resumes(requests_mock, tmpdir):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    spool_path = tmpdir.join('spool').strpath
+
+    requests_mock.get(url, [_dropped_response(),
+                            {'content': _range_response}])
+
+    res = download.fetch_artifact(url, chunk_size=128, spool_path=spool_path)
+
+    with open(res.path, 'rb') as artifact_fo:
+        assert artifact_fo.read() == ARTIFACT_BYTES
+
+    assert res.sha256 == hashlib.sha256(ARTIFACT_BYTES).hexdigest()
+    assert os.path.dirname(res.path) == spool_path
+
+    resume_request = requests_mock.request_history[1]
+    assert resume_request.headers['Range'] == 'bytes=896-'
+    assert resume_request.headers['If-Range'] == '"some-etag"'
+
+    # only the completed download is left
+    assert os.listdir(spool_path) == [os.path.basename(res.path)]
+    os.unlink(res.path)
+
+
+def test_fetch_artifact_resumes_next_time(requests_mock, tmpdir):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    spool_path = tmpdir.join('spool').strpath
+    http_config = {'retries': {'artifact': {'max_retries': 0}}}
+
+    # No ETag or Last-Modified, but the sha256 is known
+    requests_mock.get(url, [_dropped_response(headers={'Content-Length': str(len(ARTIFACT_BYTES))})])
+
+    with pytest.raises(exceptions.GalaxyDownloadError):
+        download.fetch_artifact(url, chunk_size=128, http_config=http_config, spool_path=spool_path,
+                                expected_sha256=hashlib.sha256(ARTIFACT_BYTES).hexdigest())
+
+    requests_mock.get(url, content=_range_response)
+
+    res = download.fetch_artifact(url, chunk_size=128, http_config=http_config, spool_path=spool_path)
+
+    assert res.sha256 == hashlib.sha256(ARTIFACT_BYTES).hexdigest()
+    assert requests_mock.request_history[-1].headers['Range'] == 'bytes=896-'
+    assert 'If-Range' not in requests_mock.request_history[-1].headers
+    os.unlink(res.path)
+
+
+def test_fetch_artifact_resume_ignored(requests_mock, tmpdir):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    spool_path = tmpdir.join('spool').strpath
+
+    # the server sends all of it, for ex, the artifact changed and the ETag did not match
+    requests_mock.get(url, [_dropped_response(),
+                            {'status_code': 200, 'content': ARTIFACT_BYTES}])
+
+    res = download.fetch_artifact(url, chunk_size=128, spool_path=spool_path)
+
+    with open(res.path, 'rb') as artifact_fo:
+        assert artifact_fo.read() == ARTIFACT_BYTES
+
+    assert res.sha256 == hashlib.sha256(ARTIFACT_BYTES).hexdigest()
+    os.unlink(res.path)
+
+
+def test_fetch_artifact_resumable_not_preallocated(requests_mock, tmpdir, mocker):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    spool_path = tmpdir.join('spool').strpath
+
+    requests_mock.get(url, status_code=200, content=ARTIFACT_BYTES,
+                      headers={'ETag': '"some-etag"', 'Content-Length': str(len(ARTIFACT_BYTES))})
+
+    preallocate_spy = mocker.spy(download, '_preallocate')
+
+    res = download.fetch_artifact(url, chunk_size=128, spool_path=spool_path)
+
+    # if killed part way, a preallocated .part file would look like all of it had been downloaded
+    assert preallocate_spy.call_count == 0
+    assert res.sha256 == hashlib.sha256(ARTIFACT_BYTES).hexdigest()
+    os.unlink(res.path)
+
+
+def test_fetch_artifact_not_resumable(requests_mock, tmpdir):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    spool_path = tmpdir.join('spool').strpath
+    http_config = {'retries': {'artifact': {'max_retries': 0}}}
+
+    # nothing to check a resumed download against
+    requests_mock.get(url, [_dropped_response(headers={'Content-Length': str(len(ARTIFACT_BYTES))})])
+
+    with pytest.raises(exceptions.GalaxyDownloadError):
+        download.fetch_artifact(url, chunk_size=128, http_config=http_config, spool_path=spool_path)
+
+    assert os.listdir(spool_path) == []
+
+
+def test_fetch_artifact_interrupted_temp_file_removed(requests_mock, tmpdir, mocker):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    spool_path = tmpdir.mkdir('spool').strpath
+
+    requests_mock.get(url, content=ARTIFACT_BYTES)
+
+    # for ex, in use by another process, so the download goes to a temp file
+    mocker.patch('ansible_galaxy.download._open_partial_download', return_value=None)
+    mocker.patch('ansible_galaxy.download._stream_response', side_effect=KeyboardInterrupt)
+
+    with pytest.raises(KeyboardInterrupt):
+        download.fetch_artifact(url, chunk_size=128, spool_path=spool_path)
+
+    assert os.listdir(spool_path) == []
+
+
+def test_fetch_artifact_interrupted_partial_download_kept(requests_mock, tmpdir, mocker):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+    spool_path = tmpdir.join('spool').strpath
+
+    requests_mock.get(url, content=ARTIFACT_BYTES, headers={'ETag': '"some-etag"'})
+
+    def interrupted(resp, file_object, write, chunk_size, **kwargs):
+        write(ARTIFACT_BYTES[:100])
+        raise KeyboardInterrupt()
+
+    mocker.patch('ansible_galaxy.download._stream_response', side_effect=interrupted)
+
+    with pytest.raises(KeyboardInterrupt):
+        download.fetch_artifact(url, chunk_size=128, spool_path=spool_path)
+
+    part_paths = [os.path.join(spool_path, name) for name in os.listdir(spool_path) if name.endswith('.part')]
+    assert len(part_paths) == 1
+    assert os.path.getsize(part_paths[0]) == 100
+
+
+def test_fetch_artifact_progress(requests_mock, mocker):
+    url = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+
+    requests_mock.get(url, content=ARTIFACT_BYTES, headers={'Content-Length': str(len(ARTIFACT_BYTES))})
+
+    mocker.patch('ansible_galaxy.download.PROGRESS_INTERVAL', 0)
+
+    progress = []
+
+    def progress_callback(bytes_done, total_bytes, bytes_per_second):
+        progress.append((bytes_done, total_bytes))
+
+    res = download.fetch_artifact(url, chunk_size=1024, progress_callback=progress_callback)
+    os.unlink(res.path)
+
+    log.debug('progress: %s', progress)
+
+    assert progress[0] == (1024, len(ARTIFACT_BYTES))
+    # and once more when done
+    assert progress[-2:] == [(len(ARTIFACT_BYTES), len(ARTIFACT_BYTES))] * 2
+
+
+class FakeStreamingResponse(object):
+    def __init__(self, chunks, content_length):
+        self.chunks = chunks
+        self.headers = {'Content-Length': str(content_length)}
+
+    def iter_content(self, chunk_size=None):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_stream_response_preallocated_truncated(tmpdir):
+    artifact_file = tmpdir.join('some_artifact.tar.gz')
+
+    with open(artifact_file.strpath, 'wb') as artifact_fo:
+        # the server said there would be more
+        download._stream_response(FakeStreamingResponse([b'some ', b'artifact'], 4096),
+                                  artifact_fo, artifact_fo.write, chunk_size=5)
+
+    assert artifact_file.read_binary() == b'some artifact'
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+
+import pytest
+
+from ansible_galaxy import download_spool
+
+log = logging.getLogger(__name__)
+
+URL = 'https://galaxy.invalid/download/some_ns-some_name-1.2.3.tar.gz'
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def spool_path(tmpdir):
+    return tmpdir.join('spool').strpath
+
+
+def _partial(spool_path, data, meta):
+    partial = download_spool.PartialDownload.open(spool_path, URL)
+    partial.start(FakeResponse(headers=meta))
+    partial.write(data)
+    partial.stop()
+
+    return download_spool.PartialDownload.open(spool_path, URL)
+
+
+def test_spool_dir():
+    assert download_spool.spool_dir('/tmp/collections') == '/tmp/collections/.mazer_spool'
+
+
+def test_partial_download_resume_headers(spool_path):
+    partial = _partial(spool_path, b'some', {'ETag': '"some-etag"', 'Content-Length': '10'})
+
+    assert partial.offset == 4
+    assert partial.request_headers() == {'Range': 'bytes=4-', 'If-Range': '"some-etag"'}
+
+    assert partial.resumes(FakeResponse(206, {'Content-Range': 'bytes 4-9/10'}))
+
+    partial.write(b' data')
+    path = partial.complete('some_ns-some_name-1.2.3.tar.gz::', '-tmp-mazer-artifact-download')
+
+    with open(path, 'rb') as complete_fo:
+        assert complete_fo.read() == b'some data'
+
+    assert os.listdir(spool_path) == [os.path.basename(path)]
+
+
+@pytest.mark.parametrize("response", [
+    FakeResponse(200),
+    FakeResponse(206, {'Content-Range': 'bytes 0-9/10'}),
+    FakeResponse(416),
+])
+def test_partial_download_restarted(spool_path, response):
+    partial = _partial(spool_path, b'some', {'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+
+    assert partial.request_headers()['If-Range'] == 'Wed, 21 Oct 2015 07:28:00 GMT'
+    assert not partial.resumes(response)
+    assert partial.offset == 0
+    assert os.path.getsize(partial.part_path) == 0
+
+
+def test_partial_download_error_response_kept(spool_path):
+    partial = _partial(spool_path, b'some', {'ETag': '"some-etag"'})
+
+    assert not partial.resumes(FakeResponse(503))
+    assert partial.offset == 4
+
+
+def test_partial_download_larger_than_size(spool_path):
+    partial = _partial(spool_path, b'some data', {'ETag': '"some-etag"', 'Content-Length': '4'})
+
+    assert partial.request_headers() == {}
+    assert partial.offset == 0
+
+
+def test_partial_download_not_kept_without_validator(spool_path):
+    partial = _partial(spool_path, b'some', {})
+
+    assert partial.offset == 0
+    assert partial.request_headers() == {}
+
+
+def test_partial_download_other_url(spool_path):
+    partial = _partial(spool_path, b'some', {'ETag': '"some-etag"'})
+    partial.stop()
+
+    with open(partial.meta_path, 'w') as meta_fo:
+        json.dump({'url': 'https://galaxy.invalid/something/else.tar.gz'}, meta_fo)
+
+    partial = download_spool.PartialDownload.open(spool_path, URL)
+
+    assert partial.offset == 0
+    assert not os.path.exists(partial.meta_path)
+
+
+@pytest.mark.skipif(download_spool.fcntl is None, reason='no fcntl locking on this platform')
+def test_partial_download_in_use(spool_path):
+    partial = download_spool.PartialDownload.open(spool_path, URL)
+
+    assert download_spool.PartialDownload.open(spool_path, URL) is None
+
+    partial.stop()
+
+    assert download_spool.PartialDownload.open(spool_path, URL) is not None
+
+
+def test_prune(spool_path):
+    partial = _partial(spool_path, b'some', {'ETag': '"some-etag"'})
+    partial.stop()
+
+    os.utime(partial.part_path, (1000, 1000))
+
+    download_spool.prune(spool_path)
+
+    assert not os.path.exists(partial.part_path)
+    assert os.path.exists(partial.meta_path)
+
+
+def test_prune_left_behind_downloads(spool_path):
+    os.makedirs(spool_path)
+
+    old_download = os.path.join(spool_path, 'some_ns-some_name-1.2.3.tar.gz::abcd' + download_spool.DOWNLOAD_SUFFIX)
+    new_download = os.path.join(spool_path, 'some_ns-some_name-1.2.4.tar.gz::efgh' + download_spool.DOWNLOAD_SUFFIX)
+    not_downloads = [os.path.join(spool_path, file_name)
+                     for file_name in ('something_else', 'notes.json', 'other.part', 'x' + download_spool.DOWNLOAD_SUFFIX)]
+
+    for path in [old_download, new_download] + not_downloads:
+        open(path, 'w').close()
+        os.utime(path, (1000, 1000))
+
+    os.utime(new_download, None)
+
+    download_spool.prune(spool_path)
+
+    assert sorted(os.listdir(spool_path)) == \
+        sorted([os.path.basename(path) for path in [new_download] + not_downloads])
+
+
+def test_prune_once(spool_path, mocker):
+    prune_mock = mocker.patch('ansible_galaxy.download_spool.prune')
+
+    for dummy in range(3):
+        download_spool.PartialDownload.open(spool_path, URL).stop()
+
+    prune_mock.assert_called_once_with(spool_path, max_age=download_spool.DEFAULT_PARTIAL_MAX_AGE)
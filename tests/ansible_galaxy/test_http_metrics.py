@@ -0,0 +1,92 @@
+import logging
+
+import pytest
+
+from ansible_galaxy import http_metrics
+from ansible_galaxy import retry
+
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize("method,url,request_class,expected", [
+    ('GET', 'https://galaxy.ansible.com/api/', retry.METADATA,
+     'GET https://galaxy.ansible.com/api/'),
+    ('GET', 'https://galaxy.ansible.com/api/v2/collections/ansible/k8s/', retry.METADATA,
+     'GET https://galaxy.ansible.com/api/v2/collections/{namespace}/{name}/'),
+    ('GET', 'https://galaxy.ansible.com/api/v2/collections/ansible/k8s/versions/?page=2', retry.METADATA,
+     'GET https://galaxy.ansible.com/api/v2/collections/{namespace}/{name}/versions/'),
+    ('GET', 'https://galaxy.ansible.com/api/v2/collections/ansible/k8s/versions/1.2.3/', retry.METADATA,
+     'GET https://galaxy.ansible.com/api/v2/collections/{namespace}/{name}/versions/{version}/'),
+    ('GET', 'https://galaxy.ansible.com/download/ansible-k8s-1.2.3.tar.gz', retry.ARTIFACT,
+     'GET https://galaxy.ansible.com/{artifact}'),
+])
+def test_endpoint(method, url, request_class, expected):
+    assert http_metrics.endpoint(method, url, request_class=request_class) == expected
+
+
+@pytest.mark.parametrize("values,pct,expected", [
+    ([], 50, None),
+    ([3], 95, 3),
+    ([5, 1, 4, 2, 3], 50, 3),
+    (list(range(1, 101)), 95, 95),
+    (list(range(1, 101)), 100, 100),
+])
+def test_percentile(values, pct, expected):
+    assert http_metrics.percentile(values, pct) == expected
+
+
+def test_request_metrics():
+    request_metrics = http_metrics.RequestMetrics('POST', 'https://galaxy.ansible.com/api/v2/collections/',
+                                                  bytes_out=100)
+    request_metrics.attempt()
+    request_metrics.attempt()
+    request_metrics.add_bytes_in(20)
+
+    request_record = request_metrics.done(error=ValueError('broken'))
+
+    assert request_record['retries'] == 1
+    assert request_record['bytes_in'] == 20
+    assert request_record['bytes_out'] == 100
+    assert request_record['error'] == 'broken'
+    assert request_record['total_time'] >= 0
+
+    assert http_metrics.records() == [request_record]
+
+
+def test_summary():
+    api_url = 'https://galaxy.ansible.com/api/v2/collections/ansible/k8s/'
+    download_url = 'https://galaxy.ansible.com/download/ansible-k8s-1.2.3.tar.gz'
+
+    http_metrics.record(url=api_url, status=200, total_time=0.1, ttfb=0.05, bytes_in=10, cache='miss')
+    http_metrics.record(url=api_url, status=304, total_time=0.2, ttfb=0.2, connect_time=0.1, cache='revalidate')
+    http_metrics.record(url=api_url, cache='hit')
+    http_metrics.record(url=download_url, request_class=retry.ARTIFACT, status=200,
+                        total_time=2.0, ttfb=0.1, bytes_in=1000, retries=2)
+    http_metrics.record(url=download_url, request_class=retry.ARTIFACT, status=404,
+                        total_time=0.3, ttfb=0.3)
+
+    summary = http_metrics.summary()
+
+    log.debug('summary: %s', summary)
+
+    assert summary['requests'] == 4
+    assert summary['errors'] == 1
+    assert summary['retries'] == 2
+    assert summary['bytes_in'] == 1010
+    assert summary['latency'] == {'p50': 0.2, 'p95': 2.0, 'max': 2.0}
+    assert summary['connect_time'] == {'p50': 0.1, 'p95': 0.1, 'max': 0.1}
+    assert summary['cache'] == {'hits': 1, 'misses': 1, 'revalidated': 1, 'changed': 0}
+
+    assert summary['request_classes'][retry.METADATA]['requests'] == 2
+    assert summary['request_classes'][retry.ARTIFACT]['bytes_in'] == 1000
+
+    api_endpoint = summary['endpoints']['GET https://galaxy.ansible.com/api/v2/collections/{namespace}/{name}/']
+    assert api_endpoint['requests'] == 2
+
+
+def test_summary_empty():
+    summary = http_metrics.summary()
+
+    assert summary['requests'] == 0
+    assert summary['latency'] == {'p50': None, 'p95': None, 'max': None}
+    assert summary['endpoints'] == {}
@@ -0,0 +1,105 @@
+import logging
+import time
+
+import pytest
+import requests
+
+from ansible_galaxy import http_pool
+
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize("url,expected", [
+    ('https://galaxy.ansible.com/api/v2/collections/', 'https://galaxy.ansible.com'),
+    ('https://Galaxy.Ansible.com/api/', 'https://galaxy.ansible.com'),
+    ('http://localhost:8000/api/', 'http://localhost:8000'),
+])
+def test_session_key(url, expected):
+    res = http_pool.session_key(url)
+
+    assert res == expected
+
+
+def test_get_session():
+    session = http_pool.get_session('https://galaxy.ansible.com/api/')
+
+    assert isinstance(session, requests.Session)
+    assert session.headers['User-Agent'].startswith('Mazer/')
+
+
+def test_get_session_shared_per_server():
+    session1 = http_pool.get_session('https://galaxy.ansible.com/api/')
+    session2 = http_pool.get_session('https://galaxy.ansible.com/api/v2/collections/some_ns/some_name/')
+    other_session = http_pool.get_session('https://cdn.example.invalid/some_ns-some_name-1.2.3.tar.gz')
+
+    assert session1 is session2
+    assert session1 is not other_session
+
+
+def test_get_session_http_config():
+    http_config = {'pool_connections': 3,
+                   'pool_maxsize': 17}
+
+    session = http_pool.get_session('https://galaxy.ansible.com/api/', http_config=http_config)
+
+    adapter = session.get_adapter('https://galaxy.ansible.com/api/')
+
+    log.debug('adapter: %s', adapter)
+
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 17
+
+
+def test_close_all():
+    session1 = http_pool.get_session('https://galaxy.ansible.com/api/')
+
+    http_pool.close_all()
+
+    session2 = http_pool.get_session('https://galaxy.ansible.com/api/')
+
+    assert session1 is not session2
+
+
+def test_request_slot():
+    slot = http_pool.request_slot({'max_concurrent_requests': 2})
+
+    assert slot is http_pool.request_slot()
+
+    assert slot.acquire(False) is True
+    assert slot.acquire(False) is True
+    assert slot.acquire(False) is False
+
+    slot.release()
+    slot.release()
+
+
+def test_download_slot():
+    slot = http_pool.download_slot('https://cdn.example.invalid/a.tar.gz', {'max_concurrent_downloads_per_host': 1})
+
+    assert slot is http_pool.download_slot('https://cdn.example.invalid/b.tar.gz')
+    assert slot is not http_pool.download_slot('https://galaxy.example.invalid/a.tar.gz')
+
+    assert slot.acquire(False) is True
+    assert slot.acquire(False) is False
+
+    slot.release()
+
+
+def test_session_adapter_times_connect():
+    session = http_pool.get_session('https://galaxy.ansible.com/api/')
+    adapter = session.get_adapter('https://galaxy.ansible.com/api/')
+
+    assert isinstance(adapter, http_pool.TimedHTTPAdapter)
+    assert adapter.poolmanager.pool_classes_by_scheme['https'] is http_pool.TimedHTTPSConnectionPool
+
+
+def test_connect_time(mocker):
+    mocker.patch('urllib3.connection.HTTPConnection.connect', side_effect=lambda: time.sleep(0.01))
+
+    http_pool.reset_connect_time()
+    assert http_pool.connect_time() == 0.0
+
+    connection = http_pool.TimedHTTPConnection('galaxy.invalid', 80)
+    connection.connect()
+
+    assert http_pool.connect_time() >= 0.01
@@ -0,0 +1,85 @@
+import logging
+import os
+
+from ansible_galaxy import install_fingerprint
+
+log = logging.getLogger(__name__)
+
+
+def _install_collection(collections_path, namespace, name, install_info='version: 1.0.0\n'):
+    collection_path = os.path.join(collections_path, 'ansible_collections', namespace, name)
+    os.makedirs(os.path.join(collection_path, 'meta'))
+
+    with open(os.path.join(collection_path, 'meta', '.galaxy_install_info'), 'w') as info_fo:
+        info_fo.write(install_info)
+
+    return collection_path
+
+
+def test_inputs_digest(galaxy_context, tmpdir):
+    lockfile_path = tmpdir.join('collections_lockfile.yml')
+    lockfile_path.write('some_namespace.some_name: "==1.0.0"\n')
+
+    inputs = install_fingerprint.inputs_digest(galaxy_context,
+                                               repository_spec_strings=['some_namespace.other_name'],
+                                               input_file_paths=[lockfile_path.strpath])
+
+    assert inputs == install_fingerprint.inputs_digest(galaxy_context,
+                                                       repository_spec_strings=['some_namespace.other_name'],
+                                                       input_file_paths=[lockfile_path.strpath])
+    assert inputs != install_fingerprint.inputs_digest(galaxy_context,
+                                                       repository_spec_strings=['some_namespace.other_name'],
+                                                       input_file_paths=[lockfile_path.strpath],
+                                                       options={'no_deps': True})
+
+    lockfile_path.write('some_namespace.some_name: "==1.0.1"\n')
+
+    assert inputs != install_fingerprint.inputs_digest(galaxy_context,
+                                                       repository_spec_strings=['some_namespace.other_name'],
+                                                       input_file_paths=[lockfile_path.strpath])
+
+
+def test_inputs_digest_not_galaxy(galaxy_context, tmpdir):
+    artifact_path = tmpdir.join('some_namespace-some_name-1.0.0.tar.gz')
+    artifact_path.write('')
+
+    assert install_fingerprint.inputs_digest(galaxy_context,
+                                             repository_spec_strings=[artifact_path.strpath]) is None
+    assert install_fingerprint.inputs_digest(galaxy_context,
+                                             repository_spec_strings=['https://example.invalid/ns-n-1.0.0.tar.gz']) is None
+
+
+def test_save_matches(tmpdir):
+    collections_path = tmpdir.strpath
+    _install_collection(collections_path, 'some_namespace', 'some_name')
+
+    assert install_fingerprint.matches(collections_path, 'some_inputs') is False
+
+    assert install_fingerprint.save(collections_path, 'some_inputs') is True
+
+    assert install_fingerprint.matches(collections_path, 'some_inputs') is True
+    assert install_fingerprint.matches(collections_path, 'other_inputs') is False
+
+    # something else installed
+    _install_collection(collections_path, 'some_namespace', 'other_name')
+
+    assert install_fingerprint.matches(collections_path, 'some_inputs') is False
+
+
+def test_matches_reinstalled(tmpdir):
+    collections_path = tmpdir.strpath
+    collection_path = _install_collection(collections_path, 'some_namespace', 'some_name')
+
+    install_fingerprint.save(collections_path, 'some_inputs')
+
+    with open(os.path.join(collection_path, 'meta', '.galaxy_install_info'), 'w') as info_fo:
+        info_fo.write('version: 1.0.1\n')
+
+    assert install_fingerprint.matches(collections_path, 'some_inputs') is False
+
+
+def test_load_invalid(tmpdir):
+    tmpdir.join(install_fingerprint.FINGERPRINT_FILENAME).write('{not json')
+
+    assert install_fingerprint.load(tmpdir.strpath) is None
+    assert install_fingerprint.matches(tmpdir.strpath, 'some_inputs') is False
@@ -84,3 +84,33 @@ def test_save(tmpdir):
     assert reloaded['install_date_iso'] == install_datetime
 
 # TODO: test perms, etc
+
+
+yaml_data_artifact = u'''
+install_date: Tue Jul 17 14:41:59 2018
+install_date_iso: 2018-07-17 14:41:59.229716
+version: 0.1.0
+download_url: https://galaxy.example.com/download/ns-name-0.1.0.tar.gz
+artifact:
+  filename: ns-name-0.1.0.tar.gz
+  sha256: AAAAAAAA
+  size: 1234
+'''
+
+
+def test_load_artifact():
+    install_info_ = install_info.load(yaml_data_artifact)
+
+    assert install_info_.download_url == 'https://galaxy.example.com/download/ns-name-0.1.0.tar.gz'
+    assert install_info_.artifact == {'filename': 'ns-name-0.1.0.tar.gz',
+                                      'sha256': 'AAAAAAAA',
+                                      'size': 1234}
+
+
+def test_to_dict_version_strings_no_artifact():
+    install_info_ = install_info.load(yaml_data1)
+
+    data = install_info_.to_dict_version_strings()
+
+    assert 'download_url' not in data
+    assert 'artifact' not in data
@@ -0,0 +1,70 @@
+import json
+import logging
+
+import pytest
+import six
+
+from ansible_galaxy import exceptions
+from ansible_galaxy import install_plan
+from ansible_galaxy import requirements
+from ansible_galaxy.models.install_plan import InstallPlan, InstallPlanItem
+from ansible_galaxy.models.repository_spec import RepositorySpec
+
+log = logging.getLogger(__name__)
+
+PLAN_ENTRY = {'namespace': 'some_namespace',
+              'name': 'some_name',
+              'version': '1.2.3',
+              'download_url': 'http://cdn.example.com/some_namespace-some_name-1.2.3.tar.gz',
+              'filename': 'some_namespace-some_name-1.2.3.tar.gz',
+              'size': 1234,
+              'sha256': 'AAAAAAAA',
+              'deprecated': True}
+
+
+def test_save_load():
+    item = install_plan.item_from_dict(PLAN_ENTRY)
+    required_by = requirements.from_dependencies_dict({'some_namespace.some_name': '>=1.0.0'},
+                                                      repository_spec=RepositorySpec(namespace='ns',
+                                                                                     name='parent',
+                                                                                     version='2.0.0'))
+    plan = InstallPlan(items=[InstallPlanItem(requirement=item.requirement,
+                                              find_results=item.find_results,
+                                              required_by=required_by)])
+
+    buf = six.StringIO()
+    install_plan.save(plan, buf)
+
+    data = json.loads(buf.getvalue())
+    log.debug('data: %s', data)
+
+    assert data['format_version'] == install_plan.PLAN_FORMAT_VERSION
+    assert data['collections'][0]['required_by'] == [{'collection': 'ns.parent,2.0.0', 'version_spec': '>=1.0.0'}]
+
+    res = install_plan.load(buf.getvalue())
+
+    assert res.requirements == plan.requirements
+    assert str(res.items[0].requirement.requirement_spec.version_spec) == '==1.2.3'
+    assert str(res.items[0].version) == '1.2.3'
+    assert res.items[0].find_results['artifact'] == {'sha256': 'AAAAAAAA',
+                                                     'filename': 'some_namespace-some_name-1.2.3.tar.gz',
+                                                     'size': 1234}
+    assert res.items[0].find_results['custom']['collection_is_deprecated'] is True
+
+
+def test_load_bad_format_version():
+    with pytest.raises(exceptions.GalaxyClientError, match='format_version'):
+        install_plan.load('{"format_version": 99, "collections": []}')
+
+
+def test_load_missing_sha256():
+    entry = dict(PLAN_ENTRY)
+    del entry['sha256']
+
+    with pytest.raises(exceptions.GalaxyClientError, match='sha256'):
+        install_plan.load(json.dumps({'format_version': 1, 'collections': [entry]}))
+
+
+def test_load_not_json():
+    with pytest.raises(exceptions.GalaxyClientError, match='Error parsing install plan'):
+        install_plan.load('some_namespace.some_name: 1.0.0')
@@ -0,0 +1,58 @@
+import logging
+
+from ansible_galaxy import negative_cache
+
+log = logging.getLogger(__name__)
+
+SERVER_URL = 'https://galaxy.invalid'
+
+
+def test_remember_missing(tmpdir):
+    cache_config = {'path': tmpdir.strpath}
+
+    assert negative_cache.missing(SERVER_URL, 'ns', 'n', cache_config=cache_config) is None
+
+    ttl = negative_cache.remember_missing(SERVER_URL, 'ns', 'n', 'ns.n was not found', cache_config=cache_config)
+
+    assert ttl == negative_cache.DEFAULT_NEGATIVE_TTL
+    assert negative_cache.missing(SERVER_URL, 'ns', 'n', cache_config=cache_config) == 'ns.n was not found'
+
+    # per server
+    assert negative_cache.missing('https://other.invalid', 'ns', 'n', cache_config=cache_config) is None
+
+    # and on disk
+    negative_cache.clear()
+    assert negative_cache.missing(SERVER_URL, 'ns', 'n', cache_config=cache_config) == 'ns.n was not found'
+
+    negative_cache.forget(SERVER_URL, 'ns', 'n', cache_config=cache_config)
+    negative_cache.clear()
+
+    assert negative_cache.missing(SERVER_URL, 'ns', 'n', cache_config=cache_config) is None
+
+
+def test_remember_unsatisfiable():
+    negative_cache.remember_unsatisfiable(SERVER_URL, 'ns', 'n', '>=2.0.0', 'no match')
+
+    assert negative_cache.unsatisfiable(SERVER_URL, 'ns', 'n', '>=2.0.0') == 'no match'
+    assert negative_cache.unsatisfiable(SERVER_URL, 'ns', 'n', '>=1.0.0') is None
+    # an unsatisfiable spec does not mean the collection is missing
+    assert negative_cache.missing(SERVER_URL, 'ns', 'n') is None
+
+
+def test_remember_expired(mocker):
+    mock_time = mocker.patch('ansible_galaxy.negative_cache.time.time', return_value=1000)
+
+    negative_cache.remember_missing(SERVER_URL, 'ns', 'n', 'not found', cache_config={'negative_ttl': 60})
+
+    mock_time.return_value = 1059
+    assert negative_cache.missing(SERVER_URL, 'ns', 'n') == 'not found'
+
+    mock_time.return_value = 1061
+    assert negative_cache.missing(SERVER_URL, 'ns', 'n') is None
+
+
+def test_remember_ttl_zero(tmpdir):
+    cache_config = {'path': tmpdir.strpath, 'negative_ttl': 0}
+
+    assert negative_cache.remember_missing(SERVER_URL, 'ns', 'n', 'not found', cache_config=cache_config) == 0
+    assert negative_cache.missing(SERVER_URL, 'ns', 'n', cache_config=cache_config) is None
@@ -0,0 +1,112 @@
+import logging
+
+import pytest
+import requests
+
+from ansible_galaxy import redirect_cache
+
+log = logging.getLogger(__name__)
+
+
+def _response(status_code, headers=None, url=None, history=None):
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.headers.update(headers or {})
+    resp.url = url
+    resp.history = history or []
+    return resp
+
+
+@pytest.mark.parametrize("value,expected", [
+    (None, {}),
+    ('', {}),
+    ('no-store', {'no-store': None}),
+    ('public, max-age=600', {'public': None, 'max-age': '600'}),
+    ('Max-Age="60", private', {'max-age': '60', 'private': None}),
+])
+def test_parse_cache_control(value, expected):
+    assert redirect_cache.parse_cache_control(value) == expected
+
+
+@pytest.mark.parametrize("status_code,headers,expected", [
+    (302, {}, 0),
+    (307, {'Cache-Control': 'max-age=600'}, 600),
+    (302, {'Cache-Control': 'max-age=600', 'Age': '100'}, 500),
+    (302, {'Cache-Control': 'max-age=abc'}, 0),
+    (301, {}, redirect_cache.DEFAULT_PERMANENT_REDIRECT_TTL),
+    (308, {'Cache-Control': 'no-cache'}, 0),
+    (301, {'Cache-Control': 'max-age=600, no-store'}, 0),
+    (302, {'Date': 'Wed, 21 Oct 2015 07:28:00 GMT', 'Expires': 'Wed, 21 Oct 2015 08:28:00 GMT'}, 3600),
+    (301, {'Expires': '0'}, 0),
+])
+def test_redirect_lifetime(status_code, headers, expected):
+    assert redirect_cache.redirect_lifetime(_response(status_code, headers=headers)) == expected
+
+
+def test_remember_and_get():
+    url = 'https://galaxy.invalid/download/ns-n-1.0.0.tar.gz'
+    target_url = 'https://cdn.invalid/ns-n-1.0.0.tar.gz'
+
+    resp = _response(200, url=target_url,
+                     history=[_response(302, headers={'Cache-Control': 'max-age=600'})])
+
+    assert redirect_cache.remember(url, resp) == 600
+    assert redirect_cache.get(url) == target_url
+
+    redirect_cache.forget(url)
+
+    assert redirect_cache.get(url) is None
+
+
+def test_remember_shortest_lifetime_of_chain():
+    resp = _response(200, url='https://cdn.invalid/ns-n-1.0.0.tar.gz',
+                     history=[_response(301),
+                              _response(302, headers={'Cache-Control': 'max-age=60'})])
+
+    assert redirect_cache.remember('https://galaxy.invalid/download/ns-n-1.0.0.tar.gz', resp) == 60
+
+
+def test_remember_not_cacheable():
+    url = 'https://galaxy.invalid/download/ns-n-1.0.0.tar.gz'
+
+    resp = _response(200, url='https://cdn.invalid/ns-n-1.0.0.tar.gz',
+                     history=[_response(302)])
+
+    assert redirect_cache.remember(url, resp) == 0
+    assert redirect_cache.get(url) is None
+
+
+def test_remember_not_redirected():
+    url = 'https://galaxy.invalid/download/ns-n-1.0.0.tar.gz'
+
+    assert redirect_cache.remember(url, _response(200, url=url)) == 0
+    assert redirect_cache.get(url) is None
+
+
+def test_get_expired(mocker):
+    url = 'https://galaxy.invalid/download/ns-n-1.0.0.tar.gz'
+
+    resp = _response(200, url='https://cdn.invalid/ns-n-1.0.0.tar.gz',
+                     history=[_response(302, headers={'Cache-Control': 'max-age=60'})])
+
+    redirect_cache.remember(url, resp)
+
+    mocker.patch('ansible_galaxy.redirect_cache.time.time', return_value=10 ** 10)
+
+    assert redirect_cache.get(url) is None
+
+
+def test_disk_cache(tmpdir):
+    cache_config = {'path': tmpdir.join('cache').strpath}
+    url = 'https://galaxy.invalid/download/ns-n-1.0.0.tar.gz'
+    target_url = 'https://cdn.invalid/ns-n-1.0.0.tar.gz'
+
+    resp = _response(200, url=target_url, history=[_response(301)])
+
+    redirect_cache.remember(url, resp, cache_config=cache_config)
+
+    # a new process
+    redirect_cache.clear()
+
+    assert redirect_cache.get(url) is None
+    assert redirect_cache.get(url, cache_config=cache_config) == target_url
@@ -0,0 +1,94 @@
+import logging
+
+import pytest
+import semantic_version
+
+from ansible_galaxy import requirements
+from ansible_galaxy.models.repository_spec import FetchMethods, RepositorySpec
+from ansible_galaxy.models.requirement import Requirement
+from ansible_galaxy.models.requirement_spec import RequirementSpec
+
+log = logging.getLogger(__name__)
+
+
+def test_from_dependencies_dict():
+    parent = RepositorySpec(namespace='parent_ns', name='parent', version='1.0.0')
+
+    res = requirements.from_dependencies_dict({'some_ns.some_name': '>=1.0.0'}, repository_spec=parent)
+
+    assert len(res) == 1
+    assert res[0].requirement_spec.label == 'some_ns.some_name,>=1.0.0'
+    assert res[0].requirement_spec.fetch_method == FetchMethods.GALAXY_URL
+    assert res[0].repository_spec == parent
+
+
+def test_coalesce():
+    parent_a = RepositorySpec(namespace='ns', name='a', version='1.0.0')
+    parent_b = RepositorySpec(namespace='ns', name='b', version='2.0.0')
+
+    reqs = requirements.from_dependencies_dict({'ns.c': '>=1.0.0', 'ns.d': '*'}, repository_spec=parent_a) + \
+        requirements.from_dependencies_dict({'ns.c': '<2.0.0'}, repository_spec=parent_b) + \
+        requirements.from_dependencies_dict({'ns.c': '>=1.0.0'}, repository_spec=parent_a)
+
+    res = requirements.coalesce(reqs)
+
+    assert [(req.requirement_spec.label, len(required_by)) for req, required_by in res] == \
+        [('ns.c,>=1.0.0,<2.0.0', 2), ('ns.d,*', 1)]
+    assert [req.repository_spec for req in res[0][1]] == [parent_a, parent_b]
+
+
+def test_coalesce_any_version():
+    reqs = requirements.from_dependencies_dict({'ns.c': '*'}) + \
+        requirements.from_dependencies_dict({'ns.c': '==1.2.3'})
+
+    res = requirements.coalesce(reqs)
+
+    assert [req.requirement_spec.label for req, dummy in res] == ['ns.c,==1.2.3']
+
+
+def test_coalesce_same_parent_different_specs():
+    reqs = requirements.from_dependencies_dict({'ns.c': '>=1.0.0'}) + \
+        requirements.from_dependencies_dict({'ns.c': '!=1.5.0'})
+
+    res = requirements.coalesce(reqs)
+
+    assert [req.requirement_spec.label for req, dummy in res] == ['ns.c,>=1.0.0,!=1.5.0']
+
+
+def test_coalesce_different_sources():
+    local_file = Requirement(requirement_spec=RequirementSpec(namespace='ns', name='c',
+                                                              fetch_method=FetchMethods.LOCAL_FILE,
+                                                              src='/tmp/ns-c-1.0.0.tar.gz'))
+    reqs = requirements.from_dependencies_dict({'ns.c': '*'}) + [local_file]
+
+    res = requirements.coalesce(reqs)
+
+    assert [req.requirement_spec.fetch_method for req, dummy in res] == [FetchMethods.GALAXY_URL, FetchMethods.LOCAL_FILE]
+
+
+def test_coalesce_keeps_all_requirers():
+    parent_a = RepositorySpec(namespace='ns', name='a', version='1.0.0')
+    parent_b = RepositorySpec(namespace='ns', name='b', version='2.0.0')
+
+    reqs = requirements.from_dependencies_dict({'ns.c': '>=1.0.0'}, repository_spec=parent_a) + \
+        requirements.from_dependencies_dict({'ns.c': '<2.0.0'}, repository_spec=parent_b) + \
+        requirements.from_dependencies_dict({'ns.c': '!=1.5.0'})
+
+    res = requirements.coalesce(reqs)
+
+    assert len(res) == 1
+    assert res[0][0].repository_spec == parent_a
+    assert res[0][0].required_by == [parent_a, parent_b]
+
+
+@pytest.mark.skipif(not hasattr(semantic_version, 'NpmSpec'), reason='no semantic_version.NpmSpec')
+def test_coalesce_or_spec_not_combined():
+    or_requirement = Requirement(requirement_spec=RequirementSpec(namespace='ns', name='c',
+                                                                  version_spec=semantic_version.NpmSpec('>=1.0.0 || <0.5.0'),
+                                                                  fetch_method=FetchMethods.GALAXY_URL))
+    reqs = [or_requirement] + requirements.from_dependencies_dict({'ns.c': '!=1.5.0'})
+
+    res = requirements.coalesce(reqs)
+
+    assert [req.requirement_spec.label for req, dummy in res] == ['ns.c,>=1.0.0 || <0.5.0', 'ns.c,!=1.5.0']
+    assert [len(required_by) for dummy, required_by in res] == [1, 1]
@@ -0,0 +1,229 @@
+import logging
+
+import pytest
+
+from ansible_galaxy import exceptions
+from ansible_galaxy import negative_cache
+from ansible_galaxy import requirements
+from ansible_galaxy import resolver
+from ansible_galaxy.models.repository_spec import RepositorySpec
+
+log = logging.getLogger(__name__)
+
+API_URL = 'http://localhost:8000/api'
+
+
+def mock_galaxy(requests_mock, collections):
+    '''Mock the Galaxy API for collections, a dict of {'ns.name': {'version': {dependencies}}}'''
+    requests_mock.get('http://localhost:8000/api/',
+                      json={'current_version': 'v2'})
+
+    for label, versions in collections.items():
+        namespace, name = label.split('.')
+        collection_url = '%s/v2/collections/%s/%s/' % (API_URL, namespace, name)
+        versions_url = '%sversions/' % collection_url
+
+        requests_mock.get(collection_url, json={'versions_url': versions_url})
+        requests_mock.get(versions_url,
+                          json={'count': len(versions),
+                                'next': None,
+                                'previous': None,
+                                'results': [{'version': version,
+                                             'href': '%s%s/' % (versions_url, version)}
+                                            for version in versions]})
+
+        for version, dependencies in versions.items():
+            filename = '%s-%s-%s.tar.gz' % (namespace, name, version)
+            requests_mock.get('%s%s/' % (versions_url, version),
+                              json={'version': version,
+                                    'download_url': 'http://localhost:8000/download/%s' % filename,
+                                    'metadata': {'dependencies': dependencies},
+                                    'artifact': {'sha256': 'AAAAAAAA',
+                                                 'filename': filename,
+                                                 'size': 1234}})
+
+
+def reqs(dependencies):
+    return requirements.from_dependencies_dict(dependencies)
+
+
+def resolved(install_plan):
+    return [(item.label, str(item.version)) for item in install_plan.items]
+
+
+def test_resolve_newest(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {}, '1.1.0': {}, '2.0.0': {}}})
+
+    install_plan = resolver.resolve(galaxy_context, reqs({'ns.a': '<2.0.0'}))
+
+    assert resolved(install_plan) == [('ns.a', '1.1.0')]
+
+    item = install_plan.items[0]
+    assert str(item.requirement.requirement_spec.version_spec) == '==1.1.0'
+    assert item.find_results['custom']['download_url'] == 'http://localhost:8000/download/ns-a-1.1.0.tar.gz'
+    assert item.find_results['artifact']['filename'] == 'ns-a-1.1.0.tar.gz'
+
+
+def test_resolve_dependencies_first(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {'ns.b': '>=1.0.0'}},
+                                'ns.b': {'1.0.0': {'ns.c': '*'}},
+                                'ns.c': {'1.0.0': {}}})
+
+    install_plan = resolver.resolve(galaxy_context, reqs({'ns.a': '*'}))
+
+    assert resolved(install_plan) == [('ns.c', '1.0.0'), ('ns.b', '1.0.0'), ('ns.a', '1.0.0')]
+    assert [str(req.repository_spec) for req in install_plan.items[0].required_by] == ['ns.b,1.0.0']
+
+
+def test_resolve_backtracks(galaxy_context, requests_mock):
+    # the newest ns.a needs a ns.b that conflicts with the ns.b requested
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {'ns.b': '<2.0.0'},
+                                         '2.0.0': {'ns.b': '>=2.0.0'}},
+                                'ns.b': {'1.0.0': {}, '2.0.0': {}}})
+
+    install_plan = resolver.resolve(galaxy_context, reqs({'ns.a': '*', 'ns.b': '<2.0.0'}))
+
+    assert sorted(resolved(install_plan)) == [('ns.a', '1.0.0'), ('ns.b', '1.0.0')]
+
+
+def test_resolve_conflict_nothing_fetched(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {'ns.b': '>=2.0.0'}},
+                                'ns.b': {'1.0.0': {}, '2.0.0': {}}})
+
+    with pytest.raises(exceptions.GalaxyCouldNotFindAnswerForRequirement, match='ns.b'):
+        resolver.resolve(galaxy_context, reqs({'ns.a': '*', 'ns.b': '==1.0.0'}))
+
+    assert not [req for req in requests_mock.request_history if '/download/' in req.url]
+
+
+def test_resolve_missing_dependency_tries_older(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {}, '2.0.0': {'ns.missing': '*'}}})
+    requests_mock.get('%s/v2/collections/ns/missing/' % API_URL, status_code=404,
+                      json={'code': 'not_found', 'message': 'Not found.'})
+
+    install_plan = resolver.resolve(galaxy_context, reqs({'ns.a': '*'}))
+
+    assert resolved(install_plan) == [('ns.a', '1.0.0')]
+
+
+def test_resolve_no_deps(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {'ns.b': '*'}}})
+
+    install_plan = resolver.resolve(galaxy_context, reqs({'ns.a': '*'}), no_deps=True)
+
+    assert resolved(install_plan) == [('ns.a', '1.0.0')]
+
+
+def test_resolve_versions_fetched_once(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {'ns.c': '*'}},
+                                'ns.b': {'1.0.0': {'ns.c': '*'}},
+                                'ns.c': {'1.0.0': {}}})
+
+    resolver.resolve(galaxy_context, reqs({'ns.a': '*', 'ns.b': '*'}))
+
+    urls = [req.url for req in requests_mock.request_history]
+    assert urls.count('%s/v2/collections/ns/c/versions/' % API_URL) == 1
+
+
+def test_resolver_prefetch(galaxy_context, requests_mock, mocker):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {'ns.c': '*'}},
+                                'ns.b': {'1.0.0': {'ns.c': '*'}, '2.0.0': {'ns.d': '*'}},
+                                'ns.c': {'1.0.0': {'ns.d': '*'}},
+                                'ns.d': {'1.0.0': {}}})
+
+    map_bounded_spy = mocker.spy(resolver.concurrency, 'map_bounded')
+
+    root_requirements = reqs({'ns.a': '*', 'ns.b': '<2.0.0'})
+    collection_resolver = resolver.Resolver(galaxy_context)
+    collection_resolver.prefetch(root_requirements)
+
+    # each level of the dependency graph at once
+    levels = [sorted([resolver.requirement_label(req) for req in call[0][1]])
+              for call in map_bounded_spy.call_args_list]
+    assert levels == [['ns.a', 'ns.b'], ['ns.c'], ['ns.d']]
+
+    urls = [req.url for req in requests_mock.request_history]
+    assert '%s/v2/collections/ns/d/versions/1.0.0/' % API_URL in urls
+    # only the newest matching version is guessed
+    assert '%s/v2/collections/ns/b/versions/2.0.0/' % API_URL not in urls
+
+    call_count = requests_mock.call_count
+
+    install_plan = collection_resolver.resolve(root_requirements)
+
+    assert resolved(install_plan) == [('ns.d', '1.0.0'), ('ns.c', '1.0.0'), ('ns.a', '1.0.0'), ('ns.b', '1.0.0')]
+    assert requests_mock.call_count == call_count
+
+
+def test_resolve_unsatisfiable_remembered(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {}}})
+
+    for dummy in range(2):
+        with pytest.raises(exceptions.GalaxyCouldNotFindAnswerForRequirement, match='ns.a'):
+            resolver.resolve(galaxy_context, reqs({'ns.a': '>=2.0.0'}))
+
+    # the second resolve did not ask the server again
+    collection_url = '%s/v2/collections/ns/a/' % API_URL
+    assert [request.url for request in requests_mock.request_history].count(collection_url) == 1
+    assert negative_cache.unsatisfiable(galaxy_context.server['url'], 'ns', 'a', '>=2.0.0')
+
+    # other version specs are still looked up
+    install_plan = resolver.resolve(galaxy_context, reqs({'ns.a': '<2.0.0'}))
+    assert resolved(install_plan) == [('ns.a', '1.0.0')]
+
+
+def test_resolve_conflict_not_remembered_as_unsatisfiable(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {'ns.b': '<2.0.0'}},
+                                'ns.b': {'1.0.0': {}, '2.0.0': {}}})
+
+    with pytest.raises(exceptions.GalaxyCouldNotFindAnswerForRequirement):
+        resolver.resolve(galaxy_context, reqs({'ns.a': '*', 'ns.b': '>=2.0.0'}))
+
+    # each version spec matches something, just not both at once
+    assert not negative_cache.unsatisfiable(galaxy_context.server['url'], 'ns', 'b', '>=2.0.0')
+    assert not negative_cache.unsatisfiable(galaxy_context.server['url'], 'ns', 'b', '<2.0.0')
+
+
+def test_resolve_server_error_not_worked_around(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {}, '2.0.0': {}}})
+    requests_mock.get('%s/v2/collections/ns/a/versions/2.0.0/' % API_URL, status_code=503,
+                      json={'code': 'unavailable', 'message': 'Try again later.'})
+
+    # not a reason to pick the older version
+    with pytest.raises(exceptions.GalaxyRestAPIError):
+        resolver.resolve(galaxy_context, reqs({'ns.a': '*'}))
+
+
+def test_resolver_candidates_server_error_not_cached(galaxy_context, requests_mock):
+    mock_galaxy(requests_mock, {'ns.a': {'1.0.0': {}}})
+    collection_url = '%s/v2/collections/ns/a/' % API_URL
+    requests_mock.get(collection_url, status_code=429,
+                      json={'code': 'throttled', 'message': 'Request was throttled.'})
+
+    collection_resolver = resolver.Resolver(galaxy_context)
+    requirement = reqs({'ns.a': '*'})[0]
+
+    with pytest.raises(exceptions.GalaxyRestAPIError):
+        collection_resolver.candidates(requirement)
+
+    requests_mock.get(collection_url, json={'versions_url': '%sversions/' % collection_url})
+
+    assert [str(version) for version, dummy in collection_resolver.candidates(requirement).matching()] == ['1.0.0']
+
+
+@pytest.mark.parametrize('status_code,fatal', [(404, False), (400, False), (429, True), (500, True), (503, True)])
+def test_is_fatal_error(status_code, fatal, mocker):
+    response = mocker.Mock(status_code=status_code)
+
+    assert resolver.is_fatal_error(exceptions.GalaxyRestAPIError(response=response)) is fatal
+
+
+def test_required_by_blurb_all_requirers():
+    parent_a = RepositorySpec(namespace='ns', name='a', version='1.0.0')
+    parent_b = RepositorySpec(namespace='ns', name='b', version='2.0.0')
+
+    coalesced = requirements.coalesce(requirements.from_dependencies_dict({'ns.c': '>=1.0.0'}, repository_spec=parent_a) +
+                                      requirements.from_dependencies_dict({'ns.c': '<2.0.0'}, repository_spec=parent_b))
+
+    assert resolver._required_by_blurb(coalesced[0][0]) == \
+        'ns.c,>=1.0.0,<2.0.0 (required by %s, %s)' % (parent_a, parent_b)
@@ -1,5 +1,8 @@
+import gzip
 import io
+import json
 import logging
+import threading
 
 import pytest
 
@@ -7,9 +10,11 @@ import requests
 from six import text_type
 
 from ansible_galaxy import exceptions
+from ansible_galaxy import http_metrics
 from ansible_galaxy import multipart_form
 from ansible_galaxy.models.context import GalaxyContext
 from ansible_galaxy import rest_api
+from ansible_galaxy import retry
 
 log = logging.getLogger(__name__)
 
@@ -169,6 +174,84 @@ def test_galaxy_api_get_server_api_version_no_current_version(galaxy_context_exa
     log.debug('exc_info: %s', exc_info)
 
 
+def test_galaxy_api_get_server_api_version_probed_once(galaxy_context_example_invalid, requests_mock):
+    requests_mock.get('http://bogus.invalid:9443/api/',
+                      json={'current_version': 'v2'})
+    requests_mock.get('http://bogus.invalid:9443/api/v2/collections/ansible/k8s',
+                      json={'name': 'k8s'})
+
+    for dummy in range(3):
+        api = rest_api.GalaxyAPI(galaxy_context_example_invalid)
+        api.get_collection_detail('ansible', 'k8s')
+
+    api_requests = [req for req in requests_mock.request_history if req.path == '/api/']
+
+    assert len(api_requests) == 1
+
+
+def test_galaxy_api_get_server_api_version_disk_cache(galaxy_context_example_invalid, requests_mock, tmpdir):
+    galaxy_context_example_invalid.cache = {'path': tmpdir.join('cache').strpath}
+
+    requests_mock.get('http://bogus.invalid:9443/api/',
+                      json={'current_version': 'v2'})
+
+    api = rest_api.GalaxyAPI(galaxy_context_example_invalid)
+    res = api.get_server_api_version()
+
+    assert res == 'v2'
+    assert requests_mock.call_count == 1
+
+    # a new process would start with an empty in memory cache
+    rest_api.clear_server_api_versions()
+
+    api = rest_api.GalaxyAPI(galaxy_context_example_invalid)
+    res = api.get_server_api_version()
+
+    assert res == 'v2'
+    assert requests_mock.call_count == 1
+
+
+def test_galaxy_api_get_server_api_version_unsupported_not_cached(galaxy_context_example_invalid, requests_mock):
+    requests_mock.get('http://bogus.invalid:9443/api/',
+                      json={'current_version': 'v11'})
+
+    for dummy in range(2):
+        api = rest_api.GalaxyAPI(galaxy_context_example_invalid)
+        assert api.get_server_api_version() == 'v11'
+
+    assert requests_mock.call_count == 2
+
+
+def test_galaxy_api_get_server_api_version_per_server_lock(galaxy_context, monkeypatch):
+    slow_probe_started = threading.Event()
+    slow_probe_done = threading.Event()
+
+    def _get_server_api_version(self):
+        if 'slow' in self._api_server:
+            slow_probe_started.set()
+            slow_probe_done.wait(10)
+        return 'v2'
+
+    monkeypatch.setattr(rest_api.GalaxyAPI, '_get_server_api_version', _get_server_api_version)
+
+    def _api(url):
+        return rest_api.GalaxyAPI(GalaxyContext(collections_path=galaxy_context.collections_path,
+                                                server={'url': url, 'ignore_certs': False}))
+
+    slow_thread = threading.Thread(target=_api('http://slow.invalid').get_server_api_version)
+    slow_thread.start()
+
+    try:
+        assert slow_probe_started.wait(10)
+
+        # not held up by the probe of the slow server
+        assert _api('http://fast.invalid').get_server_api_version() == 'v2'
+        assert slow_thread.is_alive()
+    finally:
+        slow_probe_done.set()
+        slow_thread.join()
+
+
 def test_galaxy_api_properties(galaxy_api):
     log.debug('api_server: %s', galaxy_api.api_server)
     log.debug('validate_certs: %s', galaxy_api.rest_client.validate_certs)
@@ -222,6 +305,20 @@ def test_galaxy_api_publish_file_202(galaxy_api_mocked, requests_mock, tmpdir, f
     assert res == status_202_json
 
 
+def test_galaxy_api_publish_file_503_not_retried(galaxy_api_mocked, requests_mock, tmpdir, file_upload_form):
+    requests_mock.post('http://bogus.invalid:9443/api/v2/collections/',
+                       status_code=503,
+                       json={'code': 'error', 'message': 'Try again later.'})
+
+    publish_api_key = '1f107befb89e0863829264d5241111a'
+
+    with pytest.raises(exceptions.GalaxyPublishError):
+        galaxy_api_mocked.publish_file(form=file_upload_form, publish_api_key=publish_api_key)
+
+    # POSTs are not retried, only the GET of the api version was made
+    assert requests_mock.call_count == 2
+
+
 def test_galaxy_api_publish_file_conflict_409(galaxy_api_mocked, requests_mock, tmpdir, file_upload_form):
     err_409_conflict_json = {'code': 'conflict.collection_exists', 'message': 'Collection "testing-ansible_testing_content-4.0.4" already exists.'}
 
@@ -362,6 +459,119 @@ def test_get_object(galaxy_api_mocked, requests_mock):
     assert data['stuff'] == [3, 4, 5]
 
 
+def test_get_object_retry(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v3/unicorns/sparkleland/magestic/versions/1.0.0/'
+
+    requests_mock.get(url, [{'status_code': 429, 'headers': {'Retry-After': '1'}},
+                            {'exc': requests.exceptions.ConnectTimeout('too slow')},
+                            {'status_code': 200, 'json': {'stuff': [3, 4, 5]}}])
+
+    data = galaxy_api_mocked.get_object(href=url)
+
+    assert data['stuff'] == [3, 4, 5]
+    assert retry.retry_counts() == {retry.METADATA: 2}
+
+
+def test_get_object_retries_exhausted(galaxy_context_example_invalid, requests_mock):
+    galaxy_context_example_invalid.http = {'retries': {'metadata': {'max_retries': 1}}}
+
+    requests_mock.get('http://bogus.invalid:9443/api/',
+                      json={'current_version': 'v2'})
+
+    url = 'http://bogus.invalid:9443/api/v3/unicorns/sparkleland/magestic/versions/1.0.0/'
+
+    requests_mock.get(url, status_code=500, json={'code': 'error', 'message': 'Server error.'})
+
+    api = rest_api.GalaxyAPI(galaxy_context_example_invalid)
+
+    with pytest.raises(exceptions.GalaxyRestAPIError, match='.*500 Server Error.*'):
+        api.get_object(href=url)
+
+    assert retry.retry_counts() == {retry.METADATA: 1}
+
+
+def test_get_object_memo(galaxy_api_mocked, galaxy_context_example_invalid, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v3/unicorns/sparkleland/magestic/versions/1.0.0/'
+
+    requests_mock.get(url,
+                      status_code=200,
+                      json={'stuff': [3, 4, 5]})
+
+    data = galaxy_api_mocked.get_object(href=url)
+
+    # another GalaxyAPI for the same context uses the same results
+    other_api = rest_api.GalaxyAPI(galaxy_context_example_invalid)
+    other_data = other_api.get_object(href=url)
+
+    assert data == other_data == {'stuff': [3, 4, 5]}
+
+    url_requests = [request for request in requests_mock.request_history if request.url == url]
+    assert len(url_requests) == 1
+
+
+def test_get_objects_coalesced(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v3/unicorns/sparkleland/magestic/versions/1.0.0/'
+
+    requests_mock.get(url,
+                      status_code=200,
+                      json={'stuff': [3, 4, 5]})
+
+    results = galaxy_api_mocked.get_objects([url] * 6)
+
+    assert results == [{'stuff': [3, 4, 5]}] * 6
+
+    url_requests = [request for request in requests_mock.request_history if request.url == url]
+    assert len(url_requests) == 1
+
+
+def test_get_object_memo_error_not_remembered(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v3/unicorns/sparkleland/magestic/versions/1.0.0/'
+
+    requests_mock.get(url, [{'status_code': 404, 'json': {'code': 'not_found', 'message': 'Not found.'}},
+                            {'status_code': 200, 'json': {'stuff': [3, 4, 5]}}])
+
+    with pytest.raises(exceptions.GalaxyRestAPIError):
+        galaxy_api_mocked.get_object(href=url)
+
+    assert galaxy_api_mocked.get_object(href=url) == {'stuff': [3, 4, 5]}
+
+
+def test_get_object_metrics(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/'
+
+    requests_mock.get(url, [{'status_code': 503},
+                            {'status_code': 200, 'text': '{"name": "k8s"}'}])
+
+    galaxy_api_mocked.get_object(href=url)
+
+    request_record = http_metrics.records()[-1]
+
+    log.debug('request_record: %s', request_record)
+
+    assert request_record['url'] == url
+    assert request_record['endpoint'] == 'GET http://bogus.invalid:9443/api/v2/collections/{namespace}/{name}/'
+    assert request_record['status'] == 200
+    assert request_record['retries'] == 1
+    assert request_record['bytes_in'] == len('{"name": "k8s"}')
+    assert request_record['cache'] is None
+
+
+def test_get_object_metrics_compressed_bytes_in(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/'
+    body = json.dumps({'name': 'k8s', 'description': 'k8s ' * 100}).encode('utf-8')
+    compressed = io.BytesIO()
+    with gzip.GzipFile(fileobj=compressed, mode='wb') as gzip_file:
+        gzip_file.write(body)
+    compressed_body = compressed.getvalue()
+
+    requests_mock.get(url, content=compressed_body, headers={'Content-Encoding': 'gzip'})
+
+    assert galaxy_api_mocked.get_object(href=url)['name'] == 'k8s'
+
+    # the bytes received, not the size of the decompressed body
+    assert http_metrics.records()[-1]['bytes_in'] == len(compressed_body)
+
+
 def test_get_object_list(galaxy_api_mocked, requests_mock):
     url = 'http://bogus.invalid:9443/api/v3/unicorns/sparkleland/magestic/'
 
@@ -736,3 +946,255 @@ def test_galaxy_api_get_collection_detail_SSLError(mocker, galaxy_api, requests_
         galaxy_api.get_collection_detail('some-test-namespace', 'some-test-name')
 
     log.debug('exc_info: %s', exc_info)
+
+
+@pytest.fixture
+def galaxy_api_metadata_cache(galaxy_context_example_invalid, requests_mock, tmpdir):
+    galaxy_context_example_invalid.cache = {'path': tmpdir.join('cache').strpath,
+                                            'metadata_max_age': 300}
+
+    requests_mock.get('http://bogus.invalid:9443/api/',
+                      json={'current_version': 'v2'})
+
+    api = rest_api.GalaxyAPI(galaxy_context_example_invalid)
+    api.get_server_api_version()
+
+    return api
+
+
+def test_get_object_metadata_cache_hit(galaxy_api_metadata_cache, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/'
+
+    requests_mock.get(url,
+                      json={'name': 'k8s'},
+                      headers={'ETag': '"abc123"'})
+
+    data = galaxy_api_metadata_cache.get_object(href=url)
+    assert data == {'name': 'k8s'}
+
+    call_count = requests_mock.call_count
+
+    # a new run
+    galaxy_api_metadata_cache.galaxy_context.api_memo.clear()
+
+    data = galaxy_api_metadata_cache.get_object(href=url)
+
+    assert data == {'name': 'k8s'}
+    assert requests_mock.call_count == call_count
+
+    assert [request_record['cache'] for request_record in http_metrics.records()] == ['miss', 'miss', 'hit']
+
+
+def test_get_object_metadata_cache_revalidate_304(galaxy_api_metadata_cache, requests_mock, mocker):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/'
+
+    requests_mock.get(url,
+                      json={'name': 'k8s'},
+                      headers={'ETag': '"abc123"',
+                               'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+
+    galaxy_api_metadata_cache.get_object(href=url)
+
+    galaxy_api_metadata_cache.galaxy_context.api_memo.clear()
+    mocker.patch.object(galaxy_api_metadata_cache.metadata_cache, 'is_expired', return_value=True)
+
+    requests_mock.get(url, status_code=304, reason='Not Modified')
+
+    data = galaxy_api_metadata_cache.get_object(href=url)
+
+    assert data == {'name': 'k8s'}
+
+    last_request = requests_mock.request_history[-1]
+    assert last_request.headers['If-None-Match'] == '"abc123"'
+    assert last_request.headers['If-Modified-Since'] == 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+
+def test_get_object_metadata_cache_revalidate_changed(galaxy_api_metadata_cache, requests_mock, mocker):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/'
+
+    requests_mock.get(url,
+                      json={'name': 'k8s'},
+                      headers={'ETag': '"abc123"'})
+
+    galaxy_api_metadata_cache.get_object(href=url)
+
+    galaxy_api_metadata_cache.galaxy_context.api_memo.clear()
+    mocker.patch.object(galaxy_api_metadata_cache.metadata_cache, 'is_expired', return_value=True)
+
+    requests_mock.get(url,
+                      json={'name': 'k8s', 'deprecated': True},
+                      headers={'ETag': '"def456"'})
+
+    data = galaxy_api_metadata_cache.get_object(href=url)
+
+    assert data == {'name': 'k8s', 'deprecated': True}
+    assert galaxy_api_metadata_cache.metadata_cache.get_item(url)['value']['etag'] == '"def456"'
+
+
+def test_get_object_metadata_cache_no_store(galaxy_api_metadata_cache, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/'
+
+    requests_mock.get(url,
+                      json={'name': 'k8s'},
+                      headers={'Cache-Control': 'no-store'})
+
+    galaxy_api_metadata_cache.get_object(href=url)
+
+    assert galaxy_api_metadata_cache.metadata_cache.get_item(url) is None
+
+
+@pytest.mark.parametrize("data,expected", [
+    ({}, []),
+    ({'count': 2, 'next': None, 'results': [1, 2]}, []),
+    # no 'page' param to build other urls from
+    ({'count': 4, 'next': 'http://bogus.invalid:9443/api/v2/things/?cursor=abc', 'results': [1, 2]}, []),
+    ({'count': 5, 'next': 'http://bogus.invalid:9443/api/v2/things/?page=2', 'results': [1, 2]},
+     ['http://bogus.invalid:9443/api/v2/things/?page=2',
+      'http://bogus.invalid:9443/api/v2/things/?page=3']),
+    ({'count': 6, 'next': 'http://bogus.invalid:9443/api/v2/things/?page=3&page_size=2', 'results': [3, 4]},
+     ['http://bogus.invalid:9443/api/v2/things/?page=3&page_size=2']),
+])
+def test_page_urls_from_page(data, expected):
+    res = rest_api.page_urls_from_page(data)
+
+    assert res == expected
+
+
+def test_get_object_paginated_parallel_pages(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/versions/'
+
+    requests_mock.get(url,
+                      json={'count': 5,
+                            'next': url + '?page=2',
+                            'results': [{'version': '1.0.0'}, {'version': '1.0.1'}]})
+    requests_mock.get(url + '?page=2',
+                      json={'count': 5,
+                            'next': url + '?page=3',
+                            'results': [{'version': '1.0.2'}, {'version': '1.0.3'}]})
+    requests_mock.get(url + '?page=3',
+                      json={'count': 5,
+                            'next': None,
+                            'results': [{'version': '1.0.4'}]})
+
+    data = galaxy_api_mocked.get_object(href=url)
+
+    assert [x['version'] for x in data] == ['1.0.0', '1.0.1', '1.0.2', '1.0.3', '1.0.4']
+
+
+def test_get_object_paginated_more_pages_than_count(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/versions/'
+
+    # a version was published after the first page was fetched
+    requests_mock.get(url,
+                      json={'count': 3,
+                            'next': url + '?page=2',
+                            'results': [{'version': '1.0.0'}]})
+    requests_mock.get(url + '?page=2',
+                      json={'count': 4,
+                            'next': url + '?page=3',
+                            'results': [{'version': '1.0.1'}]})
+    requests_mock.get(url + '?page=3',
+                      json={'count': 4,
+                            'next': url + '?page=4',
+                            'results': [{'version': '1.0.2'}]})
+    requests_mock.get(url + '?page=4',
+                      json={'count': 4,
+                            'next': None,
+                            'results': [{'version': '1.0.3'}]})
+
+    data = galaxy_api_mocked.get_object(href=url)
+
+    assert [x['version'] for x in data] == ['1.0.0', '1.0.1', '1.0.2', '1.0.3']
+
+
+def test_get_object_paginated_fewer_pages_than_count(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/versions/'
+
+    # a version was removed after the first page was fetched
+    requests_mock.get(url,
+                      json={'count': 4,
+                            'next': url + '?page=2',
+                            'results': [{'version': '1.0.0'}]})
+    requests_mock.get(url + '?page=2',
+                      json={'count': 3,
+                            'next': url + '?page=3',
+                            'results': [{'version': '1.0.1'}]})
+    requests_mock.get(url + '?page=3',
+                      json={'count': 3,
+                            'next': None,
+                            'results': [{'version': '1.0.2'}]})
+    requests_mock.get(url + '?page=4',
+                      status_code=404,
+                      json={'code': 'not_found', 'message': 'Invalid page.'})
+
+    data = galaxy_api_mocked.get_object(href=url)
+
+    assert [x['version'] for x in data] == ['1.0.0', '1.0.1', '1.0.2']
+
+
+def test_get_object_paginated_page_error_follows_next(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/versions/'
+
+    requests_mock.get(url,
+                      json={'count': 3,
+                            'next': url + '?page=2',
+                            'results': [{'version': '1.0.0'}]})
+    # fails once, and works when page 1's 'next' is followed
+    requests_mock.get(url + '?page=2',
+                      [{'status_code': 404, 'json': {'code': 'not_found', 'message': 'Invalid page.'}},
+                       {'json': {'count': 3, 'next': url + '?page=3', 'results': [{'version': '1.0.1'}]}}])
+    requests_mock.get(url + '?page=3',
+                      json={'count': 3,
+                            'next': None,
+                            'results': [{'version': '1.0.2'}]})
+
+    data = galaxy_api_mocked.get_object(href=url)
+
+    assert [x['version'] for x in data] == ['1.0.0', '1.0.1', '1.0.2']
+
+
+def test_get_object_paginated_next_only(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/versions/'
+
+    requests_mock.get(url,
+                      json={'next': url + '?cursor=b',
+                            'results': [{'version': '1.0.0'}]})
+    requests_mock.get(url + '?cursor=b',
+                      json={'next': url + '?cursor=c',
+                            'results': [{'version': '1.0.1'}]})
+    requests_mock.get(url + '?cursor=c',
+                      json={'next': None,
+                            'results': [{'version': '1.0.2'}]})
+
+    data = galaxy_api_mocked.get_object(href=url)
+
+    assert [x['version'] for x in data] == ['1.0.0', '1.0.1', '1.0.2']
+
+
+def test_get_objects(galaxy_api_mocked, requests_mock):
+    urls = ['http://bogus.invalid:9443/api/v2/collections/ansible/k8s/',
+            'http://bogus.invalid:9443/api/v2/collections/ansible/ntp/',
+            'http://bogus.invalid:9443/api/v2/collections/ansible/foo/']
+
+    for url in urls:
+        requests_mock.get(url,
+                          json={'href': url})
+
+    res = galaxy_api_mocked.get_objects(urls)
+
+    assert [x['href'] for x in res] == urls
+
+
+def test_get_objects_error(galaxy_api_mocked, requests_mock):
+    url = 'http://bogus.invalid:9443/api/v2/collections/ansible/k8s/'
+    not_found_url = 'http://bogus.invalid:9443/api/v2/collections/ansible/not_found/'
+
+    requests_mock.get(url,
+                      json={'href': url})
+    requests_mock.get(not_found_url,
+                      status_code=404,
+                      json={'code': 'not_found',
+                            'message': 'Not found.'})
+
+    with pytest.raises(exceptions.GalaxyRestAPIError):
+        galaxy_api_mocked.get_objects([url, not_found_url])
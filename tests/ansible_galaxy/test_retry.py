@@ -0,0 +1,135 @@
+import io
+import logging
+
+import pytest
+import requests
+
+from ansible_galaxy import retry
+
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize("value,expected", [
+    (None, None),
+    ('', None),
+    ('120', 120.0),
+    (' 1.5 ', 1.5),
+    ('-3', 0.0),
+    ('not a date', None),
+    # a date in the past means now
+    ('Wed, 21 Oct 2015 07:28:00 GMT', 0.0),
+])
+def test_parse_retry_after(value, expected):
+    assert retry.parse_retry_after(value) == expected
+
+
+def test_retry_policy_from_http_config():
+    http_config = {'retries': {'artifact': {'max_retries': 7,
+                                            'max_elapsed': 1000}}}
+
+    policy = retry.RetryPolicy.from_http_config(http_config, retry.ARTIFACT)
+
+    log.debug('policy: %r', policy)
+
+    assert policy.max_retries == 7
+    assert policy.max_elapsed == 1000
+    assert policy.backoff_factor == retry.DEFAULT_POLICIES[retry.ARTIFACT]['backoff_factor']
+
+
+def test_retry_policy_from_http_config_empty():
+    policy = retry.RetryPolicy.from_http_config(None, retry.METADATA)
+
+    assert policy.max_retries == retry.DEFAULT_POLICIES[retry.METADATA]['max_retries']
+
+
+def test_retry_policy_backoff():
+    policy = retry.RetryPolicy(backoff_factor=1, max_backoff=5)
+
+    for retry_number in range(10):
+        backoff = policy.backoff(retry_number)
+        assert 0 <= backoff <= min(5, 2 ** retry_number)
+
+
+def test_retry_policy_delay():
+    policy = retry.RetryPolicy(max_retries=2, backoff_factor=1, max_backoff=5, max_elapsed=10)
+
+    assert policy.delay(0, 0, retry_after=3) == 3
+    # out of retries
+    assert policy.delay(2, 0) is None
+    # out of time
+    assert policy.delay(0, 8, retry_after=3) is None
+
+
+def _response(status_code, headers=None):
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.headers.update(headers or {})
+    resp.raw = io.BytesIO(b'')
+    return resp
+
+
+def test_retry_policy_call_retries_status(mocker):
+    responses = [_response(503, {'Retry-After': '2'}), _response(429), _response(200)]
+    func = mocker.Mock(side_effect=responses)
+
+    policy = retry.RetryPolicy(max_retries=3)
+    mock_sleep = mocker.patch.object(policy, 'sleep')
+
+    res = policy.call(func, 'some request')
+
+    assert res.status_code == 200
+    assert func.call_count == 3
+    assert mock_sleep.call_count == 2
+    # Retry-After is used instead of the backoff
+    assert mock_sleep.call_args_list[0] == mocker.call(2.0)
+    assert retry.retry_counts() == {retry.METADATA: 2}
+
+
+def test_retry_policy_call_returns_last_response(mocker):
+    func = mocker.Mock(return_value=_response(500))
+
+    policy = retry.RetryPolicy(max_retries=2)
+
+    res = policy.call(func, 'some request')
+
+    assert res.status_code == 500
+    assert func.call_count == 3
+
+
+def test_retry_policy_call_retries_exception(mocker):
+    func = mocker.Mock(side_effect=[requests.exceptions.ConnectionError('connection reset'),
+                                    requests.exceptions.ConnectionError('connection reset'),
+                                    'some_result'])
+
+    policy = retry.RetryPolicy(request_class=retry.ARTIFACT, max_retries=2)
+
+    assert policy.call(func, 'some request') == 'some_result'
+    assert retry.retry_counts() == {retry.ARTIFACT: 2}
+
+
+def test_retry_policy_call_raises_after_retries(mocker):
+    func = mocker.Mock(side_effect=requests.exceptions.Timeout('too slow'))
+
+    policy = retry.RetryPolicy(max_retries=1)
+
+    with pytest.raises(requests.exceptions.Timeout):
+        policy.call(func, 'some request')
+
+    assert func.call_count == 2
+
+
+@pytest.mark.parametrize("exc", [
+    requests.exceptions.SSLError('bad cert'),
+    requests.exceptions.InvalidURL('bad url'),
+    requests.exceptions.HTTPError('404 Client Error', response=_response(404)),
+])
+def test_retry_policy_call_does_not_retry(mocker, exc):
+    func = mocker.Mock(side_effect=exc)
+
+    policy = retry.RetryPolicy(max_retries=3)
+
+    with pytest.raises(type(exc)):
+        policy.call(func, 'some request')
+
+    assert func.call_count == 1
+    assert retry.retry_counts() == {}
@@ -0,0 +1,102 @@
+import logging
+
+import pytest
+import semantic_version
+
+from ansible_galaxy import version_index
+from ansible_galaxy.version_index import VersionIndex
+
+log = logging.getLogger(__name__)
+
+COLLECTION_VERSIONS = [{'version': '1.0.0', 'href': '/versions/1.0.0/'},
+                       {'version': '2.0.0-beta.1', 'href': '/versions/2.0.0-beta.1/'},
+                       {'version': '10.1.0', 'href': '/versions/10.1.0/'},
+                       {'version': '1.10.0', 'href': '/versions/1.10.0/'},
+                       {'version': '2.0.0', 'href': '/versions/2.0.0/'},
+                       {'version': '1.2.0', 'href': '/versions/1.2.0/'}]
+
+
+@pytest.fixture
+def index():
+    return VersionIndex.from_collection_versions(COLLECTION_VERSIONS)
+
+
+def spec(spec_string):
+    return semantic_version.Spec(spec_string)
+
+
+def test_version_index_sorted(index):
+    assert [str(version) for version in index.versions] == \
+        ['1.0.0', '1.2.0', '1.10.0', '2.0.0-beta.1', '2.0.0', '10.1.0']
+    assert [str(version) for version, dummy in index] == \
+        ['10.1.0', '2.0.0', '2.0.0-beta.1', '1.10.0', '1.2.0', '1.0.0']
+    assert len(index) == 6
+
+
+def test_version_index_invalid_versions_skipped():
+    index = VersionIndex([('1.0.0', 'a'), ('not_a_version', 'b'), ('1.0', 'c')])
+
+    assert [str(version) for version in index.versions] == ['1.0.0']
+
+
+@pytest.mark.parametrize("spec_string,expected", [
+    ('*', '10.1.0'),
+    ('==1.2.0', '1.2.0'),
+    ('1.2.0', '1.2.0'),
+    ('==1.3.0', None),
+    ('>=1.0.0,<2.0.0', '1.10.0'),
+    ('<2.0.0', '1.10.0'),
+    ('<=2.0.0', '2.0.0'),
+    ('>2.0.0', '10.1.0'),
+    ('>10.1.0', None),
+    ('!=10.1.0', '2.0.0'),
+    ('~1.2', '1.2.0'),
+    ('==2.0.0-beta.1', '2.0.0-beta.1'),
+])
+def test_version_index_select(index, spec_string, expected):
+    res = index.select(spec(spec_string))
+
+    # the same answer as a linear semantic_version select
+    assert res == spec(spec_string).select(index.versions)
+    assert (str(res) if res else None) == expected
+
+
+def test_version_index_matching(index):
+    res = index.matching(spec('>=1.2.0'), spec('<2.0.0'))
+
+    assert [(str(version), cv['href']) for version, cv in res] == \
+        [('1.10.0', '/versions/1.10.0/'), ('1.2.0', '/versions/1.2.0/')]
+
+
+def test_version_index_get(index):
+    assert index.get('1.10.0') == {'version': '1.10.0', 'href': '/versions/1.10.0/'}
+    assert index.get(semantic_version.Version('2.0.0'))['href'] == '/versions/2.0.0/'
+    assert index.get('3.0.0') is None
+    assert index.get('3.0.0', {}) == {}
+
+
+def test_version_index_get_all_duplicates():
+    index = VersionIndex([('1.0.0', '1.0.0'), ('1.0.0', 'v1.0.0'), ('1.1.0', '1.1.0')])
+
+    assert index.get_all('1.0.0') == ['1.0.0', 'v1.0.0']
+
+
+def test_version_index_build_metadata():
+    index = VersionIndex([('1.0.0+build2', 'b2'), ('1.0.0', 'none'), ('1.0.0+build1', 'b1')])
+
+    assert index.get('1.0.0+build1') == 'b1'
+    assert index.get('1.0.0') == 'none'
+    assert index.select(spec('==1.0.0')) is not None
+
+
+@pytest.mark.parametrize("spec_string,expected", [
+    ('*', (None, None)),
+    ('==1.0.0', ('1.0.0', '1.0.0')),
+    ('>=1.0.0,<2.0.0', ('1.0.0', '2.0.0')),
+    ('>1.0.0,>=1.5.0,<=3.0.0,<2.0.0', ('1.5.0', '2.0.0')),
+    ('~1.0', (None, None)),
+])
+def test_spec_bounds(spec_string, expected):
+    lowest, highest = version_index.spec_bounds(spec(spec_string))
+
+    assert (str(lowest) if lowest else None, str(highest) if highest else None) == expected
@@ -0,0 +1,168 @@
+import logging
+import threading
+
+import pytest
+
+from ansible_galaxy.utils import concurrency
+
+log = logging.getLogger(__name__)
+
+
+def test_map_bounded():
+    res = concurrency.map_bounded(lambda x: x * 2, [3, 1, 2], max_workers=3)
+
+    assert res == [6, 2, 4]
+
+
+def test_map_bounded_empty():
+    res = concurrency.map_bounded(lambda x: x * 2, [], max_workers=3)
+
+    assert res == []
+
+
+def test_map_bounded_one_worker_same_thread():
+    thread_names = concurrency.map_bounded(lambda x: threading.current_thread().name, [1, 2, 3], max_workers=1)
+
+    assert set(thread_names) == set([threading.current_thread().name])
+
+
+def test_map_bounded_exception():
+    def some_func(x):
+        if x == 2:
+            raise ValueError('2 is not allowed')
+        return x
+
+    with pytest.raises(ValueError, match='2 is not allowed'):
+        concurrency.map_bounded(some_func, [1, 2, 3], max_workers=2)
+
+
+def test_imap_completed():
+    first_done = threading.Event()
+
+    def some_func(x):
+        # the first item can not finish until another one has
+        if x == 0:
+            first_done.wait(5)
+        else:
+            first_done.set()
+        return x * 2
+
+    res = list(concurrency.imap_completed(some_func, [0, 1], max_workers=2))
+
+    assert res == [(1, 2), (0, 0)]
+
+
+def test_imap_completed_one_worker_in_order():
+    res = list(concurrency.imap_completed(lambda x: x * 2, [3, 1, 2], max_workers=1))
+
+    assert res == [(0, 6), (1, 2), (2, 4)]
+
+
+def test_imap_completed_exception():
+    def some_func(x):
+        if x == 2:
+            raise ValueError('2 is not allowed')
+        return x
+
+    with pytest.raises(ValueError, match='2 is not allowed'):
+        list(concurrency.imap_completed(some_func, [1, 2, 3], max_workers=2))
+
+
+def test_coalescing_memo():
+    memo = concurrency.CoalescingMemo()
+    calls = []
+
+    def some_func():
+        calls.append(1)
+        return 'some_result'
+
+    assert memo.get('some_key', some_func) == 'some_result'
+    assert memo.get('some_key', some_func) == 'some_result'
+    assert 'some_key' in memo
+    assert len(calls) == 1
+
+    memo.clear()
+
+    assert memo.get('some_key', some_func) == 'some_result'
+    assert len(calls) == 2
+
+
+def test_coalescing_memo_in_flight():
+    memo = concurrency.CoalescingMemo()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_func():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'some_result'
+
+    def get_when_in_flight(dummy):
+        started.wait()
+        return memo.get('some_key', slow_func)
+
+    owner = threading.Thread(target=memo.get, args=('some_key', slow_func))
+    owner.start()
+
+    started.wait()
+    # let the waiters block on the in flight call, then finish it
+    timer = threading.Timer(0.1, release.set)
+    timer.start()
+
+    results = concurrency.map_bounded(get_when_in_flight, range(4), max_workers=4)
+
+    owner.join()
+    timer.join()
+
+    assert results == ['some_result'] * 4
+    assert len(calls) == 1
+
+
+def test_coalescing_memo_exception_not_remembered():
+    memo = concurrency.CoalescingMemo()
+
+    def broken_func():
+        raise ValueError('broken')
+
+    with pytest.raises(ValueError, match='broken'):
+        memo.get('some_key', broken_func)
+
+    assert 'some_key' not in memo
+    assert memo.get('some_key', lambda: 'some_result') == 'some_result'
+
+
+def test_coalescing_memo_base_exception_raised_to_waiters():
+    memo = concurrency.CoalescingMemo()
+    started = threading.Event()
+    release = threading.Event()
+    owner_errors = []
+
+    def interrupted_func():
+        started.set()
+        release.wait()
+        raise KeyboardInterrupt()
+
+    def owner_get():
+        try:
+            memo.get('some_key', interrupted_func)
+        except BaseException as exc:
+            owner_errors.append(exc)
+
+    owner = threading.Thread(target=owner_get)
+    owner.start()
+
+    started.wait()
+    timer = threading.Timer(0.1, release.set)
+    timer.start()
+
+    # not None, as if it were the result
+    with pytest.raises(KeyboardInterrupt):
+        memo.get('some_key', lambda: 'some_result')
+
+    owner.join()
+    timer.join()
+
+    assert [type(exc) for exc in owner_errors] == [KeyboardInterrupt]
+    assert 'some_key' not in memo
@@ -111,3 +111,37 @@ def test_publish_no_args(mazer_args_for_test):
     cli.parse()
     with pytest.raises(cli_exceptions.CliOptionsError, match="you must specify a path"):
         cli.run()
+
+
+def test_install_from_plan_with_plan_only(mazer_args_for_test):
+    cli = galaxy.GalaxyCLI(args=mazer_args_for_test + ['install', '--from-plan', 'plan.json', '--plan-only', 'other.json'])
+    with pytest.raises(cli_exceptions.CliOptionsError, match='mutually exclusive'):
+        cli.parse()
+
+
+def test_install_from_plan_with_specs(mazer_args_for_test):
+    cli = galaxy.GalaxyCLI(args=mazer_args_for_test + ['install', '--from-plan', 'plan.json', 'some_namespace.some_name'])
+    with pytest.raises(cli_exceptions.CliOptionsError, match='--from-plan'):
+        cli.parse()
+
+
+def test_cache_unknown_subcommand(mazer_args_for_test):
+    cli = galaxy.GalaxyCLI(args=mazer_args_for_test + ['cache', 'frob'])
+    cli.parse()
+    with pytest.raises(cli_exceptions.CliOptionsError, match='unknown cache command "frob"'):
+        cli.run()
+
+
+@pytest.mark.parametrize("configured_spool_path,expected_spool_path", [
+    (None, '/tmp/some_collections/.mazer_spool'),
+    ('/tmp/some_spool', '/tmp/some_spool/.mazer_spool'),
+])
+def test_galaxy_context_spool_path(mazer_args_for_test, configured_spool_path, expected_spool_path):
+    cli = galaxy.GalaxyCLI(args=mazer_args_for_test + ['install', '-C', '/tmp/some_collections'])
+    cli.parse()
+
+    cli_config = galaxy.config.Config.from_dict({'server': {'url': 'http://galaxy.invalid'},
+                                                 'spool_path': configured_spool_path})
+    galaxy_context = cli._get_galaxy_context(cli.options, cli_config)
+
+    assert galaxy_context.spool_path == expected_spool_path
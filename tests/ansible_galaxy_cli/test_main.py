@@ -1,3 +1,4 @@
+import json
 import logging
 
 from ansible_galaxy_cli import main
@@ -13,3 +14,13 @@ def test_main_no_args():
 def test_main_list_no_args():
     res = main.main(['mazer', 'list'])
     log.debug('res: %s', res)
+
+
+def test_main_list_stats(capsys):
+    res = main.main(['mazer', 'list', '--stats'])
+    log.debug('res: %s', res)
+
+    stats = json.loads(capsys.readouterr().err)
+
+    assert stats['requests'] == 0
+    assert 'latency' in stats
@@ -32,3 +32,37 @@ def galaxy_context(tmpdir):
     from ansible_galaxy.models.context import GalaxyContext
 
     return GalaxyContext(server=server, collections_path=collections_path.strpath)
+
+
+@pytest.fixture(autouse=True)
+def reset_http_pool():
+    '''Dont share pooled http sessions, cached server info, redirects and lookup failures, request metrics, or other per process state between tests'''
+    from ansible_galaxy import disk_cache
+    from ansible_galaxy import download_spool
+    from ansible_galaxy import http_metrics
+    from ansible_galaxy import http_pool
+    from ansible_galaxy import negative_cache
+    from ansible_galaxy import redirect_cache
+    from ansible_galaxy import rest_api
+
+    yield
+
+    http_pool.close_all()
+    rest_api.clear_server_api_versions()
+    http_metrics.reset()
+    redirect_cache.clear()
+    negative_cache.clear()
+    download_spool.clear_pruned()
+    disk_cache.clear_sizes()
+
+
+@pytest.fixture(autouse=True)
+def no_retry_sleep(monkeypatch):
+    '''Retry failed requests without waiting, and start each test with no retries counted'''
+    from ansible_galaxy import retry
+
+    monkeypatch.setattr('ansible_galaxy.retry.RetryPolicy.sleep', lambda self, seconds: None)
+
+    yield
+
+    retry.reset_retry_counts()